@@ -0,0 +1,199 @@
+"""asv benchmarks timing every synthesis stage over record length, bpm and sampling rate
+
+Run ``asv run`` to record results for the checked out commit and ``asv continuous master HEAD`` (or ``make bench``)
+to compare against a baseline. Stages too slow for long records leave those lengths out of their params.
+"""
+import os
+import tempfile
+
+import numpy as np
+
+from pypda.api import sample, sample_test
+from pypda.api.plot import plot_record
+from pypda.api.sample_test import sample_parameters
+from pypda.hmm import HMM
+from pypda.pulse_model import PulseModelRaw
+from pypda.pulse_wave import PulseWave
+from pypda.wavelets import TriangGaussian, kernel_cache, overlap_add
+from pypda.resampling import resample_cache
+
+LENGTHS = [10, 600, 3600, 86400]
+BPMS = [65, 120]
+SAMPLING_RATES = [49.8, 250]
+
+
+class RecordSuite:
+    """Beat parameters of one seeded record, shared by the stage benchmarks"""
+    params = (LENGTHS, BPMS, SAMPLING_RATES)
+    param_names = ["length", "bpm", "sampling_rate"]
+    timeout = 1800
+
+    def setup(self, length, bpm, sampling_rate):
+        np.random.seed(0)
+        self.wave = PulseWave(parameters=sample_parameters(), bpm=bpm, length=length, sampling_rate=sampling_rate)
+        self.state, self.beats = self.wave.hmm.sample()
+        kernel_cache.clear()
+        resample_cache.clear()
+
+
+class TriangGaussianSuite(RecordSuite):
+    def setup(self, length, bpm, sampling_rate):
+        super().setup(length, bpm, sampling_rate)
+        self.wavelets = [(a, tm, gm, gs) for b in self.beats for a, tm, gm, gs in
+                         zip(b["pulse_amplitudes"], b["triangle_m"], b["gaussian_m"], b["gaussian_std"])]
+
+    def _waveforms(self):
+        kernel_cache.clear()
+        return [TriangGaussian(amplitude=a, triang_m=tm, gaussian_m=gm, gaussian_std=gs).waveform
+                for a, tm, gm, gs in self.wavelets]
+
+    def time_waveform(self, *args):
+        self._waveforms()
+
+    def peakmem_waveform(self, *args):
+        self._waveforms()
+
+
+class PulseModelRawSuite(RecordSuite):
+    def _waveforms(self):
+        return [PulseModelRaw(**b).waveform for b in self.beats]
+
+    def time_waveform(self, *args):
+        self._waveforms()
+
+    def peakmem_waveform(self, *args):
+        self._waveforms()
+
+
+class _ShiftedPulsesSuite(RecordSuite):
+    """The record's beats as PulseModelRaw objects shifted to their positions"""
+
+    def setup(self, length, bpm, sampling_rate):
+        super().setup(length, bpm, sampling_rate)
+        self.pulses = [PulseModelRaw(**b) for b in self.beats]
+        offset = 0
+        for p in self.pulses:
+            p.shift(offset)
+            offset += len(p.data)
+
+
+class WaveformSumSuite(_ShiftedPulsesSuite):
+    def time_overlap_add(self, *args):
+        overlap_add(self.pulses)
+
+    def peakmem_overlap_add(self, *args):
+        overlap_add(self.pulses)
+
+
+class PairwiseSumSuite(_ShiftedPulsesSuite):
+    """Pairwise sum is quadratic in the number of beats, so only short records"""
+    params = ([length for length in LENGTHS if length <= 600], BPMS, SAMPLING_RATES)
+
+    def time_sum(self, *args):
+        sum(self.pulses)
+
+    def peakmem_sum(self, *args):
+        sum(self.pulses)
+
+
+class HMMSuite(RecordSuite):
+    def time_sample(self, *args):
+        self.wave.hmm.sample()
+
+    def peakmem_sample(self, *args):
+        self.wave.hmm.sample()
+
+    def time_sample_columnar(self, *args):
+        self.wave.hmm.sample(columnar=True)
+
+    def peakmem_sample_columnar(self, *args):
+        self.wave.hmm.sample(columnar=True)
+
+    def time_sample_states(self, *args):
+        self.wave.hmm.sample_states()
+
+
+class InferenceSuite:
+    """Forward-backward and Viterbi decoding of one chain of per-beat features, T = 1e5 beats is about a day"""
+    params = ([1000, 10000, 100000],)
+    param_names = ["beats"]
+    timeout = 600
+
+    def setup(self, beats):
+        self.hmm = HMM(parameters=sample_parameters(), time_steps=beats, rng=0)
+        x, s = self.hmm.sample_states()
+        self.log_emission = self.hmm.log_emissions(features=self.hmm.sample_features(x, s))
+
+    def time_forward_backward(self, beats):
+        self.hmm.forward_backward(self.log_emission)
+
+    def peakmem_forward_backward(self, beats):
+        self.hmm.forward_backward(self.log_emission)
+
+    def time_viterbi(self, beats):
+        self.hmm.viterbi(self.log_emission)
+
+
+class PulseWaveSuite:
+    params = (LENGTHS, BPMS, SAMPLING_RATES, list(PulseWave.ENGINES))
+    param_names = ["length", "bpm", "sampling_rate", "engine"]
+    timeout = 1800
+
+    def setup(self, length, bpm, sampling_rate, engine):
+        np.random.seed(0)
+        self.wave = PulseWave(parameters=sample_parameters(), bpm=bpm, length=length, sampling_rate=sampling_rate,
+                              engine=engine)
+
+    def time_sample(self, *args):
+        self.wave.sample()
+
+    def peakmem_sample(self, *args):
+        self.wave.sample()
+
+
+class ThreadedBatchSuite:
+    """sample_batch rendering groups of records in a thread pool, compare timings across threads"""
+    params = ([1, 2, 4, 8], list(PulseWave.ENGINES))
+    param_names = ["threads", "engine"]
+    timeout = 600
+
+    def setup(self, threads, engine):
+        self.wave = PulseWave(parameters=sample_parameters(), sampling_rate=250, engine=engine, rng=0)
+
+    def time_sample_batch(self, threads, engine):
+        self.wave.sample_batch(64, threads=threads)
+
+
+class PlotSuite:
+    """Decimated plot of a 250 Hz record, should stay flat over record length"""
+    params = (LENGTHS,)
+    param_names = ["length"]
+    timeout = 600
+
+    def setup(self, length):
+        self.plot_dir = tempfile.mkdtemp()
+        self.x = np.cumsum(np.random.default_rng(0).standard_normal(length * 250))
+        self.y = self.x > 0
+
+    def time_plot_record(self, length):
+        plot_record(os.path.join(self.plot_dir, "record.png"), (0, length), self.x, self.y)
+
+    def peakmem_plot_record(self, length):
+        plot_record(os.path.join(self.plot_dir, "record.png"), (0, length), self.x, self.y)
+
+
+class ApiSuite(RecordSuite):
+    def setup(self, length, bpm, sampling_rate):
+        self.plot_dir = tempfile.mkdtemp()
+
+    def time_sample(self, length, bpm, sampling_rate):
+        sample(plot_dir=self.plot_dir, length=length, bpm=bpm, sampling_rate=sampling_rate)
+
+    def peakmem_sample(self, length, bpm, sampling_rate):
+        sample(plot_dir=self.plot_dir, length=length, bpm=bpm, sampling_rate=sampling_rate)
+
+    def time_sample_test(self, length, bpm, sampling_rate):
+        sample_test(plot_dir=self.plot_dir, length=length, bpm=bpm, sampling_rate=sampling_rate)
+
+    def peakmem_sample_test(self, length, bpm, sampling_rate):
+        sample_test(plot_dir=self.plot_dir, length=length, bpm=bpm, sampling_rate=sampling_rate)
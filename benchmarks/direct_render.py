@@ -0,0 +1,30 @@
+"""Speed and agreement of the "direct" and "fft" rendering engines against the "object" (resample + cubic spline) engine
+
+Usage: python benchmarks/direct_render.py [n] [length] [sampling_rate]
+"""
+import sys
+import time
+
+import numpy as np
+
+from pypda.api.sample_test import sample_parameters
+from pypda.pulse_wave import PulseWave
+
+
+def main(n=64, length=10, sampling_rate=90):
+    results = {}
+    for engine in PulseWave.ENGINES:
+        wave = PulseWave(parameters=sample_parameters(), length=length, sampling_rate=sampling_rate, engine=engine)
+        np.random.seed(0)
+        start = time.perf_counter()
+        results[engine] = wave.sample_batch(n)
+        print(f"{engine:>6}: {n / (time.perf_counter() - start):10.1f} records/sec")
+    x, y, _ = results["object"]
+    for engine in PulseWave.ENGINES[1:]:
+        error = np.abs(results[engine][0] - x)
+        print(f"max |x_{engine} - x_object| = {error.max():.4f} mmHg, mean = {error.mean():.5f} mmHg, "
+              f"label agreement = {np.mean(results[engine][1] == y):.5f}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) if i < 2 else float(a) for i, a in enumerate(sys.argv[1:])))
@@ -0,0 +1,35 @@
+"""Beats/sec and fit quality of pypda.fitting on synthetic raw beats, in this process and across a process pool
+
+Usage: python benchmarks/fitting.py [records] [length] [workers]
+"""
+import sys
+import time
+
+import numpy as np
+
+from pypda.api.sample_test import sample_parameters
+from pypda.fitting import fit_beats, fit_records
+from pypda.pulse_wave import PulseWave
+
+
+def main(records=4, length=600, workers=2):
+    wave = PulseWave(parameters=sample_parameters(), length=length, rng=0)
+    _, _, p, _ = wave.draw(records)
+    raw, raw_length = p.render()
+    beats = [r[:n] for r, n in zip(raw, raw_length)]
+    per_record = len(beats) // records
+    split = [beats[i * per_record:(i + 1) * per_record] for i in range(records)]
+
+    fit = fit_beats(split[0])
+    print(f"one record: {fit.summary()}")
+    error = np.abs(fit.parameters.pulse_amplitudes - p.pulse_amplitudes[:per_record])
+    print(f"amplitude error: median {np.median(error):.4f}, 95% {np.percentile(error, 95):.4f} mmHg")
+    for w in (1, workers):
+        start = time.perf_counter()
+        fits = fit_records(split, workers=w)
+        print(f"{w} workers: {len(beats) / (time.perf_counter() - start):8.1f} beats/sec, "
+              f"median R2 {np.median(np.concatenate([f.r2 for f in fits])):.6f}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,58 @@
+"""Import time of pyPDA entry points, measured with ``python -X importtime``
+
+Every target runs in a fresh interpreter. The script fails (exit code 1) when a target pulls in a module it should
+only import lazily, or when its cumulative import time exceeds --budget-ms.
+
+Usage: python benchmarks/importtime.py [--budget-ms MS]
+"""
+import argparse
+import subprocess
+import sys
+
+HEAVY = ("matplotlib", "sklearn", "scipy", "numpy")
+TARGETS = {
+    "import pypda": (["-c", "import pypda"], HEAVY),
+    "import pypda.cli": (["-c", "import pypda.cli"], HEAVY),
+    "pypda --help": (["-m", "pypda.cli", "--help"], HEAVY),
+    "import pypda.api": (["-c", "import pypda.api"], HEAVY),
+    "import pypda.pulse_wave": (["-c", "import pypda.pulse_wave"], ("matplotlib", "sklearn", "scipy")),
+}
+
+
+def importtime(args):
+    """Run python -X importtime with args
+
+    :return: (total cumulative microseconds of top level imports, set of imported module names)
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime"] + args, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    total, modules = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+        if not name.startswith("  "):  # top level import, its cumulative time includes its children
+            total += int(cumulative)
+    return total, modules
+
+
+def check(budget_ms=None):
+    failures = []
+    for target, (args, forbidden) in TARGETS.items():
+        total, modules = importtime(args)
+        leaked = sorted(m for m in modules if m.split(".")[0] in forbidden)
+        print(f"{target:<26} {total / 1000:8.1f} ms  {len(modules):4d} modules")
+        if leaked:
+            failures.append(f"{target} imports {', '.join(leaked[:5])}{' ...' if len(leaked) > 5 else ''}")
+        if budget_ms is not None and total / 1000 > budget_ms:
+            failures.append(f"{target} takes {total / 1000:.1f} ms > {budget_ms} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=None, help="maximum cumulative import time per target")
+    sys.exit(0 if check(parser.parse_args().budget_ms) else 1)
@@ -0,0 +1,39 @@
+"""Records/sec a consumer receives from ProducerPool against pickling results back from a process pool
+
+Usage: python benchmarks/producer.py [batches] [batch_size] [max_workers]
+"""
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from pypda.api.sample_test import sample_parameters
+from pypda.producer import ProducerPool
+from pypda.pulse_wave import PulseWave
+
+_wave = PulseWave(parameters=sample_parameters(), bpm=65, length=10, sampling_rate=90)
+
+
+def _batch(n):
+    return _wave.sample_batch(n)
+
+
+def main(batches=64, batch_size=64, max_workers=4):
+    for workers in range(1, max_workers + 1):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            start = time.perf_counter()
+            for x, y, t in pool.map(_batch, [batch_size] * batches):
+                x.sum()
+            pickled = batches * batch_size / (time.perf_counter() - start)
+        with ProducerPool(_wave, workers=workers, batch_size=batch_size, depth=2 * workers) as pool:
+            start = time.perf_counter()
+            for x, y, t in islice(pool, batches):
+                x.sum()
+            shared = batches * batch_size / (time.perf_counter() - start)
+            metrics = pool.metrics()
+        print(f"{workers} workers: process pool {pickled:8.1f} records/sec, producer pool {shared:8.1f} records/sec, "
+              f"consumer stall {metrics['consumer_stall']:.2f} s, producer stall {metrics['producer_stall']:.2f} s")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,27 @@
+"""Records/sec of PulseWave.sample_batch against a loop of PulseWave.sample
+
+Usage: python benchmarks/sample_batch.py [n]
+"""
+import sys
+import time
+
+from pypda.api.sample_test import sample_parameters
+from pypda.pulse_wave import PulseWave
+
+
+def throughput(func, n):
+    start = time.perf_counter()
+    func(n)
+    return n / (time.perf_counter() - start)
+
+
+def main(n=256):
+    wave = PulseWave(parameters=sample_parameters(), bpm=65, length=10, sampling_rate=90)
+    loop = throughput(lambda k: [wave.sample() for _ in range(k)], n)
+    batch = throughput(wave.sample_batch, n)
+    print(f"loop : {loop:10.1f} records/sec")
+    print(f"batch: {batch:10.1f} records/sec ({batch / loop:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,35 @@
+"""Records/sec of PulseWave.sample_batch over the number of rendering threads
+
+Reports whether the interpreter runs with the GIL; on free-threaded builds (python3.13t and later) the pure Python
+parts of rendering overlap too, with the GIL only the parts numpy and scipy run without it do.
+
+Usage: python benchmarks/threads.py [records] [max_threads]
+"""
+import os
+import sys
+import time
+
+from pypda.api.sample_test import sample_parameters
+from pypda.pulse_wave import PulseWave
+
+
+def main(records=256, max_threads=None):
+    max_threads = max_threads or os.cpu_count()
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}, {os.cpu_count()} CPUs")
+    for engine in PulseWave.ENGINES:
+        wave = PulseWave(parameters=sample_parameters(), bpm=65, length=10, sampling_rate=250, engine=engine, rng=0)
+        wave.sample_batch(8)  # warm the kernel and operator caches
+        baseline = None
+        threads = 1
+        while threads <= max_threads:
+            start = time.perf_counter()
+            wave.sample_batch(records, threads=threads)
+            rate = records / (time.perf_counter() - start)
+            baseline = baseline or rate
+            print(f"{engine:>6} engine, {threads:2d} threads: {rate:8.1f} records/sec ({rate / baseline:.2f}x)")
+            threads *= 2
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -1,2 +1,4 @@
-from .plot import plot_waveform
+from .plot import plot_waveform, plot_record, plot_dataset
 from .sample_test import sample_test, sample
+from .stream import stream
+from .serve import serve
@@ -1,24 +1,147 @@
+import json
 import os
 
-from matplotlib import pyplot as plt
 import logging
 logger = logging.getLogger("pypda")
 
-def plot_waveform(plot_dir, t, wave, x, y):
-    plt.figure(figsize=(wave.beats, 6))
-    plt.subplot(2, 1, 1)
-    plt.title(f"Pulse Model")
-    plt.ylabel("Blood Pressure (mmHg)")
-    plt.xlabel("Time (Second)")
-    plt.grid()
-    plt.plot(t, x)
-    plt.xlim([0, max(t)])
-    plt.subplot(2, 1, 2)
-    plt.plot(t, y)
-    plt.ylabel("Abnormality")
-    plt.yticks([0, 1])
-    plt.xlim([0, max(t)])
-    plt.tight_layout()
-    output_plot = os.path.join(plot_dir, "sample_test.png")
-    plt.savefig(output_plot)
+MAX_WIDTH = 40  # inches of a decimated plot, however long the record
+_CHUNK = 1 << 20  # samples reduced at a time by envelope
+
+
+def _time_at(t, n: int, i):
+    """Times of the samples i of an n samples record, t being its time axis or (first, last) of one"""
+    import numpy as np
+    if np.ndim(t) == 1 and len(t) == n:
+        return np.asarray(t)[i]
+    return t[0] + np.asarray(i) * (t[1] - t[0]) / max(n - 1, 1)
+
+
+def envelope(t, x, columns: int):
+    """Min/max of x over columns equal slices, all a line plot that many pixels wide can show
+
+    Reads x a chunk at a time, so memory-mapped records are never loaded whole.
+
+    :param t: (L,) uniformly spaced time axis, or (first, last) of one
+    :param x: (L,) samples
+    :param columns: number of slices, usually the plot width in pixels
+    :return: (t, low, high) of every slice, t at its first sample; x itself if it has no more than 2 * columns samples
+    """
+    import numpy as np
+    n = len(x)
+    if n <= 2 * columns:
+        values = np.asarray(x)
+        return _time_at(t, n, np.arange(n)), values, values
+    starts = np.unique(np.linspace(0, n, columns, endpoint=False).astype(int))
+    low, high = np.empty(len(starts)), np.empty(len(starts))
+    step = max(_CHUNK // (n // len(starts)), 1)  # columns per chunk
+    for a in range(0, len(starts), step):
+        lo, hi = starts[a], starts[a + step] if a + step < len(starts) else n
+        chunk = np.asarray(x[lo:hi], dtype=float)
+        low[a:a + step] = np.minimum.reduceat(chunk, starts[a:a + step] - lo)
+        high[a:a + step] = np.maximum.reduceat(chunk, starts[a:a + step] - lo)
+    return _time_at(t, n, starts), low, high
+
+
+def _plot_envelope(ax, t, x, columns):
+    import numpy as np
+    t, low, high = envelope(t, x, columns)
+    if low is high:
+        ax.plot(t, low)
+    else:  # a vertical stroke per column, what the full resolution line rasterizes to
+        ax.plot(np.repeat(t, 2), np.stack((low, high), axis=1).ravel())
+
+
+def plot_record(output_plot, t, x, y, width=20, height=6, dpi=100, decimate=True):
+    """Plot waveform x and labels y over time t to output_plot with the Agg backend
+
+    :param t: (L,) time axis in seconds, or (first, last) of a uniformly spaced one when decimating
+    :param width: in inches
+    :param height: in inches
+    :param dpi:
+    :param decimate: plot the min/max envelope at the figure's pixel width instead of every sample, the rendering time
+                     then depends on the image size only
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(width, height), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax_x, ax_y = fig.subplots(2, 1)
+    columns = int(width * dpi)
+    ax_x.set_title("Pulse Model")
+    ax_x.set_ylabel("Blood Pressure (mmHg)")
+    ax_x.set_xlabel("Time (Second)")
+    ax_x.grid()
+    if decimate:
+        _plot_envelope(ax_x, t, x, columns)
+        _plot_envelope(ax_y, t, y, columns)
+        end = t[-1]
+    else:
+        ax_x.plot(t, x)
+        ax_y.plot(t, y)
+        end = max(t)
+    ax_x.set_xlim([0, end])
+    ax_y.set_ylabel("Abnormality")
+    ax_y.set_yticks([0, 1])
+    ax_y.set_xlim([0, end])
+    fig.tight_layout()
+    fig.savefig(output_plot)
     logger.debug(f"waveform plot saved to {output_plot}")
+
+
+def plot_waveform(plot_dir, t, wave, x, y, decimate=False):
+    """Plot a sampled record to plot_dir/sample_test.png, one inch per beat or at most MAX_WIDTH inches decimated"""
+    width = min(wave.beats, MAX_WIDTH) if decimate else wave.beats
+    plot_record(os.path.join(plot_dir, "sample_test.png"), t, x, y, width=width, decimate=decimate)
+
+
+def _plot_records(source, first, count, plot_dir, width, height, dpi):
+    """Plot the first count records of an IndexedDataset or an .npz shard, numbered from first"""
+    import numpy as np
+    if isinstance(source, str):
+        with np.load(source) as shard:
+            records = list(zip(shard["x"][:count], shard["y"][:count], shard["t"][:count]))
+    else:
+        records = source[:count]
+    paths = []
+    for i, (x, y, t) in enumerate(records):
+        paths.append(os.path.join(plot_dir, f"record_{first + i:06d}.png"))
+        plot_record(paths[-1], t, x, y, width=width, height=height, dpi=dpi)
+    return paths
+
+
+def plot_dataset(dataset_dir, plot_dir, workers=1, n=None, width=20, height=6, dpi=100, chunk=64):
+    """Decimated plots of the records of a dataset written by :func:`pypda.dataset.generate_dataset`
+
+    Records are plotted by worker processes to plot_dir/record_000000.png, ...
+
+    :param workers: number of worker processes, 1 plots in this process
+    :param n: plot only the first n records
+    :param chunk: records handed to a worker at a time, "indexed" format only (npz shards go whole)
+    :return: paths of the plots in record order
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from pypda.indexed import IndexedDataset
+
+    os.makedirs(plot_dir, exist_ok=True)
+    with open(os.path.join(dataset_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    n = manifest["records"] if n is None else min(n, manifest["records"])
+    tasks = []
+    if manifest["format"] == "indexed":
+        dataset = IndexedDataset(dataset_dir)
+        tasks = [(dataset[a:min(a + chunk, n)], a, chunk) for a in range(0, n, chunk)]
+    else:
+        first = 0
+        for shard in manifest["shards"]:
+            if first >= n:
+                break
+            tasks.append((os.path.join(dataset_dir, shard["file"]), first, n - first))
+            first += shard["records"]
+    settings = (plot_dir, width, height, dpi)
+    if workers == 1:
+        paths = [p for task in tasks for p in _plot_records(*task, *settings)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_plot_records, *task, *settings) for task in tasks]
+            paths = [p for future in futures for p in future.result()]
+    return paths
@@ -4,18 +4,29 @@ logger = logging.getLogger("pypda")
 from pypda.api import plot_waveform
 
 
-def sample_test(plot_dir='plot', length=10, bpm=65, sampling_rate=49.8, png=False):
+def sample_test(plot_dir='plot', length=10, bpm=65, sampling_rate=49.8, png=False, decimate=False):
     """
 
     :param plot_dir:
     :param length: in seconds
     :param sampling_rate: in Hz
     :param png:
+    :param decimate: plot the min/max envelope of long records, see :func:`pypda.api.plot.plot_record`
     :return:
     """
     from pypda.pulse_wave import PulseWave
     import os
     os.makedirs(plot_dir, exist_ok=True)
+    p = sample_test_parameters()
+    wave = PulseWave(parameters=p, bpm=bpm, length=length, sampling_rate=sampling_rate)
+    x, y, t = wave.sample()
+    if png:
+        plot_waveform(plot_dir, t, wave, x, y, decimate=decimate)
+    return x, y, t
+
+
+def sample_test_parameters():
+    """Parameters used by :func:`sample_test`"""
     from pypda.parameters import PulseWaveParameters
     p = PulseWaveParameters()
 
@@ -37,25 +48,32 @@ def sample_test(plot_dir='plot', length=10, bpm=65, sampling_rate=49.8, png=Fals
     p.abnormal.scale = (10, 20, .2, .2, .2, .2, .2, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1)
     logger.debug(f"Parameters for normal =\n{p.normal}")
     logger.debug(f"Parameters for abnormal =\n{p.abnormal}")
-    wave = PulseWave(parameters=p, bpm=bpm, length=length, sampling_rate=sampling_rate)
-    x, y, t = wave.sample()
-    if png:
-        plot_waveform(plot_dir, t, wave, x, y)
-    return x, y, t
+    return p
 
 
-def sample(plot_dir='plot', length=10, bpm=65, sampling_rate=49.8, png=False):
+def sample(plot_dir='plot', length=10, bpm=65, sampling_rate=49.8, png=False, decimate=False):
     """
 
     :param plot_dir:
     :param length: in seconds
     :param sampling_rate: in Hz
     :param png:
+    :param decimate: plot the min/max envelope of long records, see :func:`pypda.api.plot.plot_record`
     :return:
     """
     from pypda.pulse_wave import PulseWave
     import os
     os.makedirs(plot_dir, exist_ok=True)
+    p = sample_parameters()
+    wave = PulseWave(parameters=p, bpm=bpm, length=length, sampling_rate=sampling_rate)
+    x, y, t = wave.sample()
+    if png:
+        plot_waveform(plot_dir, t, wave, x, y, decimate=decimate)
+    return x, y, t
+
+
+def sample_parameters():
+    """Parameters used by :func:`sample`"""
     from pypda.parameters import PulseWaveParameters
     p = PulseWaveParameters()
 
@@ -73,8 +91,4 @@ def sample(plot_dir='plot', length=10, bpm=65, sampling_rate=49.8, png=False):
     p.abnormal.scale = (10, 20, .2, .2, .2, .2, .2, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1)
     logger.debug(f"Parameters for normal =\n{p.normal}")
     logger.debug(f"Parameters for abnormal =\n{p.abnormal}")
-    wave = PulseWave(parameters=p, bpm=bpm, length=length, sampling_rate=sampling_rate)
-    x, y, t = wave.sample()
-    if png:
-        plot_waveform(plot_dir, t, wave, x, y)
-    return x, y, t
+    return p
@@ -0,0 +1,40 @@
+import logging
+
+logger = logging.getLogger("pypda")
+
+
+def serve(host="127.0.0.1", port=8765, n_channels=100, chunk_seconds=1.0, bpm=65, sampling_rate=49.8,
+          preset="sample", queue_chunks=8, duration=None, report_seconds=5.0, report=None):
+    """Serve n_channels independent pulse waveforms over TCP, see :class:`pypda.server.PulseServer`
+
+    :param host:
+    :param port: TCP port
+    :param n_channels: number of simulated patients
+    :param chunk_seconds: length of each chunk in seconds
+    :param bpm:
+    :param sampling_rate: in Hz
+    :param preset: "sample" or "sample-test" parameters
+    :param queue_chunks: frames buffered per client before the oldest is dropped
+    :param duration: seconds to serve, None serves until interrupted
+    :param report_seconds: interval between metric reports
+    :param report: callable(metrics) receiving the reports, defaults to logging them
+    :return: the final metrics
+    """
+    import asyncio
+    from pypda.api.sample_test import sample_parameters, sample_test_parameters
+    from pypda.pulse_wave import PulseWave
+    from pypda.server import PulseServer
+
+    if report is None:
+        def report(metrics):
+            logger.info(", ".join(f"{k}={v:.3g}" for k, v in metrics.items()))
+
+    parameters = {"sample": sample_parameters, "sample-test": sample_test_parameters}[preset]()
+    wave = PulseWave(parameters=parameters, bpm=bpm, sampling_rate=sampling_rate)
+    server = PulseServer(wave, n_channels=n_channels, chunk_seconds=chunk_seconds, host=host, port=port,
+                         queue_chunks=queue_chunks)
+    try:  # on Ctrl-C asyncio.run cancels server.run, which closes the clients, before it closes the loop
+        asyncio.run(server.run(duration=duration, report=report, report_seconds=report_seconds))
+    except KeyboardInterrupt:
+        logger.debug("server interrupted")
+    return server.metrics()
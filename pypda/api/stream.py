@@ -0,0 +1,38 @@
+import logging
+from itertools import islice
+
+logger = logging.getLogger("pypda")
+
+
+def stream(output, chunk_seconds=1.0, bpm=65, sampling_rate=49.8, preset="sample", binary=False, chunks=0):
+    """Write an endless pulse waveform to a binary file object
+
+    :param output: writable binary file object, e.g. stdout or an opened FIFO
+    :param chunk_seconds: length of each chunk in seconds
+    :param bpm:
+    :param sampling_rate: in Hz
+    :param preset: "sample" or "sample-test" parameters
+    :param binary: write little-endian float32 (t, x, y) rows instead of CSV lines
+    :param chunks: number of chunks to write, 0 writes forever
+    :return: number of chunks written
+    """
+    import numpy as np
+    from pypda.api.sample_test import sample_parameters, sample_test_parameters
+    from pypda.pulse_wave import PulseWave
+
+    parameters = {"sample": sample_parameters, "sample-test": sample_test_parameters}[preset]()
+    wave = PulseWave(parameters=parameters, bpm=bpm, sampling_rate=sampling_rate)
+    written = 0
+    try:
+        for x, y, t in islice(wave.stream(chunk_seconds=chunk_seconds), chunks or None):
+            rows = np.column_stack((t, x, y))
+            if binary:
+                output.write(rows.astype("<f4").tobytes())
+            else:
+                np.savetxt(output, rows, fmt=("%.4f", "%.6f", "%d"), delimiter=",")
+            output.flush()
+            written += 1
+    except BrokenPipeError:
+        logger.debug("stream consumer went away")
+    logger.debug(f"{written} chunks of {chunk_seconds} s written")
+    return written
@@ -72,10 +72,19 @@ def pulse(plot_dir='plot', png=False):
 @click.option('--bpm', default=65, help='BPM')
 @click.option('--sampling-rate', default=49.8, help='Sampling rate Hz')
 @click.option('--png/--no-png', default=False)
-def sample(plot_dir='plot', length=10, bpm=65, sampling_rate=90, png=False):
+@click.option('--decimate/--no-decimate', default=False, help='Plot the min/max envelope, for long records')
+@click.option('--profile/--no-profile', default=False, help='Print time and allocations per synthesis stage')
+def sample(plot_dir='plot', length=10, bpm=65, sampling_rate=90, png=False, decimate=False, profile=False):
     from pypda.api import sample
+    from pypda.profiling import Profiler
 
-    return sample(plot_dir=plot_dir, length=length, bpm=bpm, sampling_rate=sampling_rate, png=png)
+    kwargs = dict(plot_dir=plot_dir, length=length, bpm=bpm, sampling_rate=sampling_rate, png=png, decimate=decimate)
+    if not profile:
+        return sample(**kwargs)
+    with Profiler() as profiler:
+        result = sample(**kwargs)
+    click.echo(profiler.table(), err=True)
+    return result
 
 
 @cli.command()  # @cli, not @click!
@@ -84,10 +93,128 @@ def sample(plot_dir='plot', length=10, bpm=65, sampling_rate=90, png=False):
 @click.option('--bpm', default=65, help='BPM')
 @click.option('--sampling-rate', default=49.8, help='Sampling rate Hz')
 @click.option('--png/--no-png', default=False)
-def sample_test(plot_dir='plot', length=10, bpm=65, sampling_rate=90, png=False):
+@click.option('--decimate/--no-decimate', default=False, help='Plot the min/max envelope, for long records')
+@click.option('--profile/--no-profile', default=False, help='Print time and allocations per synthesis stage')
+def sample_test(plot_dir='plot', length=10, bpm=65, sampling_rate=90, png=False, decimate=False, profile=False):
     from pypda.api import sample_test
+    from pypda.profiling import Profiler
 
-    return sample_test(plot_dir=plot_dir, length=length, bpm=bpm, sampling_rate=sampling_rate, png=png)
+    kwargs = dict(plot_dir=plot_dir, length=length, bpm=bpm, sampling_rate=sampling_rate, png=png, decimate=decimate)
+    if not profile:
+        return sample_test(**kwargs)
+    with Profiler() as profiler:
+        result = sample_test(**kwargs)
+    click.echo(profiler.table(), err=True)
+    return result
+
+
+@cli.command()  # @cli, not @click!
+@click.option('--chunk-seconds', default=1.0, help='Length of each chunk in seconds')
+@click.option('--bpm', default=65, help='BPM')
+@click.option('--sampling-rate', default=49.8, help='Sampling rate Hz')
+@click.option('--preset', type=click.Choice(['sample', 'sample-test']), default='sample', help='Parameter preset')
+@click.option('--output', default='-', help='Output file or FIFO, - for stdout')
+@click.option('--binary/--csv', default=False, help='Write float32 (t, x, y) rows instead of CSV')
+@click.option('--chunks', default=0, help='Number of chunks to write, 0 streams forever')
+def stream(chunk_seconds=1.0, bpm=65, sampling_rate=49.8, preset='sample', output='-', binary=False, chunks=0):
+    from pypda.api import stream
+
+    with click.open_file(output, 'wb') as f:
+        stream(f, chunk_seconds=chunk_seconds, bpm=bpm, sampling_rate=sampling_rate, preset=preset, binary=binary,
+               chunks=chunks)
+
+
+@cli.command()  # @cli, not @click!
+@click.option('--host', default='127.0.0.1', help='Address to listen on')
+@click.option('--port', default=8765, help='TCP port')
+@click.option('--channels', default=100, help='Number of independent patient channels')
+@click.option('--chunk-seconds', default=1.0, help='Length of each chunk in seconds')
+@click.option('--bpm', default=65, help='BPM')
+@click.option('--sampling-rate', default=49.8, help='Sampling rate Hz')
+@click.option('--preset', type=click.Choice(['sample', 'sample-test']), default='sample', help='Parameter preset')
+@click.option('--queue-chunks', default=8, help='Chunks buffered per client before the oldest is dropped')
+@click.option('--duration', default=0.0, help='Seconds to serve, 0 serves until interrupted')
+@click.option('--report-seconds', default=5.0, help='Interval between throughput and lag reports')
+def serve(host='127.0.0.1', port=8765, channels=100, chunk_seconds=1.0, bpm=65, sampling_rate=49.8, preset='sample',
+          queue_chunks=8, duration=0.0, report_seconds=5.0):
+    from pypda.api import serve
+
+    def report(metrics):
+        click.echo(f"{metrics['clients']} clients, {metrics['samples_per_second']:.0f} samples/sec, "
+                   f"load {metrics['load']:.2f}, lag {metrics['lag'] * 1000:.1f} ms "
+                   f"(max {metrics['max_lag'] * 1000:.1f} ms), {metrics['dropped']} chunks dropped", err=True)
+
+    serve(host=host, port=port, n_channels=channels, chunk_seconds=chunk_seconds, bpm=bpm, sampling_rate=sampling_rate,
+          preset=preset, queue_chunks=queue_chunks, duration=duration or None, report_seconds=report_seconds,
+          report=report)
+
+
+@cli.command()  # @cli, not @click!
+@click.option('--output-dir', default='dataset', help='Dataset output directory')
+@click.option('--n', default=1000, help='Number of records')
+@click.option('--workers', default=1, help='Number of worker processes')
+@click.option('--shard-size', default=1000, help='Records per shard')
+@click.option('--seed', default=0, help='Root seed, output does not depend on --workers')
+@click.option('--length', default=10, help='Length of the sample in seconds')
+@click.option('--bpm', default=65, help='BPM')
+@click.option('--sampling-rate', default=49.8, help='Sampling rate Hz')
+@click.option('--preset', type=click.Choice(['sample', 'sample-test']), default='sample', help='Parameter preset')
+@click.option('--format', 'format_', type=click.Choice(['npz', 'indexed']), default='npz',
+              help='.npz shards or one memory-mapped indexed dataset')
+@click.option('--beats/--no-beats', default=False, help='Also store per-beat HMM states and parameters (indexed)')
+def dataset(output_dir='dataset', n=1000, workers=1, shard_size=1000, seed=0, length=10, bpm=65, sampling_rate=49.8,
+            preset='sample', format_='npz', beats=False):
+    from pypda.dataset import generate_dataset
+
+    def progress(done, total, rate):
+        click.echo(f"{done}/{total} records, {rate:.1f} records/sec", err=True)
+
+    generate_dataset(output_dir, n, workers=workers, shard_size=shard_size, seed=seed, length=length, bpm=bpm,
+                     sampling_rate=sampling_rate, preset=preset, progress=progress, format=format_, beats=beats)
+
+
+@cli.command()  # @cli, not @click!
+@click.option('--output-dir', default='recording', help='Recording output directory')
+@click.option('--length', default=3600.0, help='Length of the recording in seconds')
+@click.option('--bpm', default=65, help='BPM')
+@click.option('--sampling-rate', default=250.0, help='Sampling rate Hz')
+@click.option('--preset', type=click.Choice(['sample', 'sample-test']), default='sample', help='Parameter preset')
+@click.option('--chunk-seconds', default=60.0, help='Seconds synthesized at a time, bounds the memory use')
+@click.option('--seed', default=None, type=int, help='Seed of the random number generator')
+def record(output_dir='recording', length=3600.0, bpm=65, sampling_rate=250.0, preset='sample', chunk_seconds=60.0,
+           seed=None):
+    from pypda.api.sample_test import sample_parameters, sample_test_parameters
+    from pypda.pulse_wave import PulseWave
+    from pypda.recording import generate_recording
+
+    parameters = {"sample": sample_parameters, "sample-test": sample_test_parameters}[preset]()
+    wave = PulseWave(parameters=parameters, bpm=bpm, length=length, sampling_rate=sampling_rate, rng=seed)
+    settings = generate_recording(wave, output_dir, chunk_seconds=chunk_seconds)
+    click.echo(f"{settings['samples']} samples of {settings['beats']} beats written to {output_dir}", err=True)
+
+
+@cli.command()  # @cli, not @click!
+@click.option('--input-dir', default='dataset', help='Dataset or recording directory')
+@click.option('--plot-dir', default='plot', help='Plot output directory')
+@click.option('--workers', default=1, help='Number of worker processes plotting dataset records')
+@click.option('--n', default=None, type=int, help='Plot only the first n dataset records')
+@click.option('--width', default=20.0, help='Figure width in inches')
+@click.option('--dpi', default=100, help='Figure resolution')
+def plot(input_dir='dataset', plot_dir='plot', workers=1, n=None, width=20.0, dpi=100):
+    """Decimated plots of every record of a dataset, or of a recording"""
+    import os
+    from pypda.api import plot_dataset, plot_record
+
+    if not os.path.exists(os.path.join(input_dir, "recording.json")):
+        paths = plot_dataset(input_dir, plot_dir, workers=workers, n=n, width=width, dpi=dpi)
+        click.echo(f"{len(paths)} records plotted to {plot_dir}", err=True)
+        return
+    from pypda.recording import load_recording
+    recording = load_recording(input_dir)
+    os.makedirs(plot_dir, exist_ok=True)
+    plot_record(os.path.join(plot_dir, "recording.png"), (0, recording["length"]), recording["x"], recording["y"],
+                width=width, dpi=dpi)
+    click.echo(f"recording plotted to {plot_dir}", err=True)
 
 
 if __name__ == "__main__":
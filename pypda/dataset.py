@@ -0,0 +1,126 @@
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import pypda
+
+PRESETS = ("sample", "sample-test")
+FORMATS = ("npz", "indexed")
+_wave = None  # per process PulseWave, created once by _init_worker
+
+
+def _init_worker(preset, bpm, length, sampling_rate):
+    global _wave
+    from pypda.api.sample_test import sample_parameters, sample_test_parameters
+    from pypda.pulse_wave import PulseWave
+
+    parameters = {"sample": sample_parameters, "sample-test": sample_test_parameters}[preset]()
+    _wave = PulseWave(parameters=parameters, bpm=bpm, length=length, sampling_rate=sampling_rate)
+
+
+def _generate_shard(target, records, seed_sequence, batch_size=256, beats=False):
+    """Generate one shard, returning (records, seconds)
+
+    :param target: path of a .npz file, an :class:`pypda.indexed.IndexedWriter` to extend, or the directory of a new
+                   indexed dataset, which keeps worker processes from sending arrays back to the parent
+    :param beats: also store (state, severity, BeatParameters), indexed targets only
+    """
+    from pypda.indexed import IndexedWriter
+
+    start = time.perf_counter()
+    _wave.rng = seed_sequence
+    parts = []
+    for done in range(0, records, batch_size):
+        state, severity, p, t_start = _wave.draw(min(batch_size, records - done))
+        parts.append(_wave.render(state, severity, p, t_start) + ((state, severity, p) if beats else ()))
+    if isinstance(target, str) and target.endswith(".npz"):
+        x, y, t = (np.concatenate(p) for p in list(zip(*parts))[:3])
+        np.savez(target, x=x, y=y, t=t)
+    else:
+        writer = IndexedWriter(target) if isinstance(target, str) else target
+        for batch in parts:
+            writer.extend(*batch)
+        if writer is not target:
+            writer.close()
+    return records, time.perf_counter() - start
+
+
+def generate_dataset(output_dir, n, workers=1, shard_size=1000, seed=0, length=10, bpm=65, sampling_rate=49.8,
+                     preset="sample", progress=None, format="npz", beats=False):
+    """Generate n records into .npz shards of x, y, t or one indexed dataset, plus a manifest.json
+
+    Shard i is seeded from ``SeedSequence(seed).spawn(n_shards)[i]``, so the output depends on seed, n and shard_size
+    but not on the number of workers or the format.
+
+    :param output_dir: directory receiving shard_00000.npz, ... or the :mod:`pypda.indexed` files, and manifest.json
+    :param n: number of records
+    :param workers: number of worker processes, 1 generates in this process
+    :param shard_size: records per shard
+    :param seed: root seed
+    :param length: in seconds
+    :param bpm:
+    :param sampling_rate: in Hz
+    :param preset: "sample" or "sample-test" parameters
+    :param progress: optional callable(records_done, n, records_per_second) called after each shard
+    :param format: "npz" shards or one "indexed" dataset, read with :class:`pypda.indexed.IndexedDataset`
+    :param beats: store the per-beat HMM states and parameters too, "indexed" format only
+    :return: the manifest as a dict
+    """
+    from pypda.indexed import IndexedWriter
+
+    assert preset in PRESETS, f"preset={preset} must be one of {PRESETS}"
+    assert format in FORMATS, f"format={format} must be one of {FORMATS}"
+    assert format == "indexed" or not beats, "beats are only stored in the indexed format"
+    os.makedirs(output_dir, exist_ok=True)
+    sizes = [min(shard_size, n - i) for i in range(0, n, shard_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if format == "npz":
+        shards = [{"file": f"shard_{i:05d}.npz", "records": size} for i, size in enumerate(sizes)]
+        paths = [os.path.join(output_dir, s["file"]) for s in shards]
+    else:  # workers write each shard as a small indexed dataset, merged in order and removed by this process
+        shards = [{"first": i * shard_size, "records": size} for i, size in enumerate(sizes)]
+        paths = [os.path.join(output_dir, f".shard_{i:05d}") for i in range(len(sizes))]
+    settings = (preset, bpm, length, sampling_rate)
+    manifest = {"version": pypda.__version__, "format": format, "seed": seed, "records": n, "shard_size": shard_size,
+                "preset": preset, "bpm": bpm, "length": length, "sampling_rate": sampling_rate, "shards": shards}
+    writer = IndexedWriter(output_dir, attrs=manifest) if format == "indexed" else None
+    finished = set()  # shards on disk ahead of the next one to merge
+    next_shard = 0
+
+    start = time.perf_counter()
+    done = 0
+
+    def _report(shard, result):
+        nonlocal done, next_shard
+        records, _ = result
+        if writer is not None and workers > 1:
+            finished.add(shard)
+            while next_shard in finished:
+                finished.remove(next_shard)
+                writer.merge(paths[next_shard])
+                shutil.rmtree(paths[next_shard])
+                next_shard += 1
+        done += records
+        if progress is not None:
+            progress(done, n, done / (time.perf_counter() - start))
+
+    if workers == 1:
+        _init_worker(*settings)
+        for i, task in enumerate(zip(paths if writer is None else [writer] * len(sizes), sizes, seeds)):
+            _report(i, _generate_shard(*task, beats=beats))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=settings) as pool:
+            futures = {pool.submit(_generate_shard, *task, beats=beats): i
+                       for i, task in enumerate(zip(paths, sizes, seeds))}
+            for future in as_completed(futures):
+                _report(futures[future], future.result())
+
+    if writer is not None:
+        writer.close()
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
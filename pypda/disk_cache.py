@@ -0,0 +1,192 @@
+"""Content-addressed on-disk cache of generated arrays.
+
+An entry is a tuple of arrays saved as ``<directory>/<key[:2]>/<key>.npz``, where key is the sha256 of everything that
+determines the arrays plus the pyPDA version, see :meth:`DiskCache.key`. Entries are written to a temporary file and
+moved in place with ``os.replace``, so processes sharing a directory only ever see complete entries; two processes
+missing the same key both generate it and the last one wins. Reading an entry touches its mtime, and writes evict the
+least recently used entries once the directory holds more than ``max_bytes``.
+
+The directory is only scanned when an instance first writes, when its running total of the entry sizes passes
+``max_bytes`` and every ``RESCAN_WRITES`` writes, which picks up what other processes wrote and evicted meanwhile.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+import pypda
+
+TMP_MAX_AGE = 3600  # seconds after which a leftover temporary file of a crashed writer is removed
+RESCAN_WRITES = 256  # writes after which the running size total is refreshed from the directory
+
+
+def _update(h, obj):
+    """Feed a canonical, type tagged encoding of obj to the hash h"""
+    if isinstance(obj, (np.ndarray, np.generic)):
+        obj = np.ascontiguousarray(obj)
+        h.update(f"a{obj.dtype.str}{obj.shape}".encode())
+        h.update(obj.tobytes())
+    elif isinstance(obj, dict):
+        h.update(f"d{len(obj)}".encode())
+        for k in sorted(obj):
+            _update(h, k)
+            _update(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"l{len(obj)}".encode())
+        for item in obj:
+            _update(h, item)
+    elif obj is None or isinstance(obj, (bool, int, float, str)):
+        h.update(f"{type(obj).__name__}:{obj!r};".encode())
+    else:
+        raise TypeError(f"cannot hash {type(obj).__name__} into a cache key")
+
+
+class DiskCache:
+    """Size-bounded LRU cache of array tuples in a directory shared by processes, with hit/miss/eviction counters
+
+    Counters are per instance, i.e. per process.
+    """
+
+    def __init__(self, directory, max_bytes=1 << 30):
+        """
+
+        :param directory: cache directory, created if needed
+        :param max_bytes: total size of the entries kept, None for unbounded
+        """
+        assert max_bytes is None or max_bytes > 0, f"max_bytes={max_bytes} must be positive or None (unbounded)"
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._bytes = None  # running total of the entry sizes, None until the directory is scanned
+        self._writes = 0
+
+    @staticmethod
+    def key(*parts) -> str:
+        """sha256 hex digest of the pyPDA version and parts: arrays, scalars, strings, None and dicts/lists of them"""
+        h = hashlib.sha256()
+        _update(h, ("pypda", pypda.__version__) + parts)
+        return h.hexdigest()
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.npz")
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key: str, factory) -> tuple:
+        """Return the arrays cached under key, calling factory() to create and store them on a miss
+
+        :param factory: returns a tuple of arrays
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as entry:
+                value = tuple(entry[f"arr_{i}"] for i in range(len(entry.files)))
+        except (OSError, ValueError, EOFError, zipfile.BadZipFile):  # missing, evicted meanwhile or unreadable
+            pass
+        else:
+            try:
+                os.utime(path)
+            except OSError:  # evicted since it was read
+                pass
+            self._count("hits")
+            return value
+        self._count("misses")
+        value = tuple(factory())
+        size = self._write(path, value)
+        if self.max_bytes is not None:
+            self._account(size)
+        return value
+
+    def _account(self, size):
+        """Add a written entry to the running total, evicting once it passes max_bytes"""
+        with self._lock:
+            self._writes += 1
+            rescan = self._bytes is None or self._writes % RESCAN_WRITES == 0
+            if not rescan:
+                self._bytes += size
+        if rescan:
+            self._bytes = sum(size for _, size, _ in self._entries())
+        if self._bytes > self.max_bytes:
+            self.evict(self.max_bytes)
+
+    def _write(self, path, value) -> int:
+        """Atomically write an entry, returning its size"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, *value)
+                size = f.tell()
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return size
+
+    def _entries(self) -> list:
+        """(mtime, size, path) of every entry, and removes stale temporary files on the way"""
+        entries = []
+        now = time.time()
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for f in os.scandir(shard.path):
+                try:
+                    stat = f.stat()
+                    if f.name.endswith(".npz"):
+                        entries.append((stat.st_mtime, stat.st_size, f.path))
+                    elif f.name.endswith(".tmp") and now - stat.st_mtime > TMP_MAX_AGE:
+                        os.remove(f.path)
+                except FileNotFoundError:  # removed by another process
+                    pass
+        return entries
+
+    def evict(self, max_bytes: int):
+        """Remove least recently used entries until the entries take at most max_bytes"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                self._count("evictions")
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._bytes = total
+
+    def clear(self):
+        """Remove all entries and reset the counters"""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+            self._bytes = None
+
+    def info(self) -> dict:
+        entries = self._entries()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries), "max_bytes": self.max_bytes}
+
+    def __getstate__(self):  # worker processes get their own lock and counters
+        return {"directory": self.directory, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({', '.join(f'{k}={v}' for k, v in self.info().items())})"
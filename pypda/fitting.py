@@ -0,0 +1,355 @@
+"""Fit PDA beat parameters to recorded beats, the inverse of :func:`pypda.synthesis.render_beats`.
+
+Every wavelet is fitted with continuous parameters: amplitude ``a``, center ``c``, triangle half width ``h`` and
+gaussian std ``s``. Its shape is the continuous form of :class:`pypda.wavelets.TriangGaussian`, ``triang(2 h)`` or,
+sampled half a sample off, ``triang(2 h - 1)``, convolved with an untruncated ``gaussian(m, s)``::
+
+    a * sqrt(2 pi) * s / h * (R(x - c + h) - 2 R(x - c) + R(x - c - h)),   R(u) = u Phi(u / s) + s phi(u / s)
+
+which matches the sampled kernel as long as ``gaussian_m`` spans a few stds, so residuals and Jacobians are closed
+form. The beats of a block are fitted together by a batched Levenberg-Marquardt working on (beats, samples, parameters)
+Jacobians, every beat starting from the last beat of the previous block. The result is rounded to the integer
+``triangle_m`` / ``delta_time`` of :class:`pypda.hmm.BeatParameters`; ``gaussian_m`` only truncates the gaussian, it
+cannot be told from the data and is kept fixed.
+
+Rounding moves wavelets by up to half a sample, and the renderer starts the first wavelet at sample 0 and makes the
+raw beat as long as its last wavelet reaches. The wavelets are therefore sorted by onset, so that ``delta_time`` is
+never negative, placed where the renderer will put them, moved back to end within the beat and the last one stretched
+to end with it, and baseline, amplitudes and stds are fitted again to the exactly rendered wavelets with that integer
+geometry held fixed.
+"""
+import time
+
+import numpy as np
+
+from pypda.hmm import BeatParameters
+
+DEFAULT_BEAT = {"pulse_amplitudes": (8, 3, 4, 2, 1), "delta_time": (10, 10, 10, 10),
+                "triangle_m": (20, 20, 20, 20, 20), "gaussian_m": (16, 16, 16, 16, 16),
+                "gaussian_std": (2, 2, 2, 2, 2)}  # PulseModelRaw defaults
+
+
+def wavelet_model(x, amplitude, center, half_width, std, jac=False):
+    """Continuous TriangGaussian wavelets at positions x, all arguments broadcast
+
+    :return: values, and with jac the derivatives by amplitude, center, half_width and std as a second tuple
+    """
+    from scipy.special import ndtr
+    k = np.sqrt(2 * np.pi)
+    u = x - center
+    z = ((u + half_width) / std, u / std, (u - half_width) / std)
+    pdf = [np.exp(-zi ** 2 / 2) / k for zi in z]
+    cdf = [ndtr(zi) for zi in z]
+    ramp = [(u + d) * c + std * p for d, c, p in zip((half_width, 0, -half_width), cdf, pdf)]
+    second = ramp[0] - 2 * ramp[1] + ramp[2]
+    gain = k * std / half_width
+    value = amplitude * gain * second
+    if not jac:
+        return value
+    return value, (gain * second,
+                   -amplitude * gain * (cdf[0] - 2 * cdf[1] + cdf[2]),
+                   amplitude * gain * (cdf[0] - cdf[2] - second / half_width),
+                   amplitude * (k * second / half_width + gain * (pdf[0] - 2 * pdf[1] + pdf[2])))
+
+
+class BeatFit:
+    """Result of :func:`fit_beats`
+
+    ``parameters`` are the fitted :class:`pypda.hmm.BeatParameters`; ``baseline``, ``amplitude``, ``center``,
+    ``half_width`` and ``std`` the continuous (B,) and (B, C) parameters they were rounded from, ``r2`` and ``rmse``
+    the per-beat quality of ``parameters`` rendered and resampled to the beats' lengths, ``continuous_r2`` and
+    ``continuous_rmse`` that of the continuous fit, ``seconds`` the time it took and ``iterations`` the
+    Levenberg-Marquardt iterations summed over blocks.
+    """
+
+    def __init__(self, parameters, baseline, amplitude, center, half_width, std, r2, rmse, continuous_r2,
+                 continuous_rmse, seconds, iterations):
+        self.parameters = parameters
+        self.baseline = baseline
+        self.amplitude = amplitude
+        self.center = center
+        self.half_width = half_width
+        self.std = std
+        self.r2 = r2
+        self.rmse = rmse
+        self.continuous_r2 = continuous_r2
+        self.continuous_rmse = continuous_rmse
+        self.seconds = seconds
+        self.iterations = iterations
+
+    def __len__(self):
+        return len(self.r2)
+
+    @property
+    def beats_per_second(self) -> float:
+        return len(self) / self.seconds if self.seconds else float("inf")
+
+    def summary(self) -> dict:
+        return {"beats": len(self), "beats_per_second": self.beats_per_second, "median_r2": float(np.median(self.r2)),
+                "min_r2": float(np.min(self.r2)), "median_rmse": float(np.median(self.rmse)),
+                "continuous_min_r2": float(np.min(self.continuous_r2)), "iterations": self.iterations}
+
+
+def split_beats(x: np.ndarray, onsets) -> list:
+    """Beats of record x between consecutive onsets (sample indices)"""
+    onsets = np.asarray(onsets, dtype=int)
+    return [x[a:b] for a, b in zip(onsets[:-1], onsets[1:])]
+
+
+def _initial(beat: dict, gaussian_m: int):
+    """Continuous (center, half_width, std) of a PulseModelRaw parameter dict as (3, C), and its raw length"""
+    tm = np.asarray(beat["triangle_m"], dtype=float)
+    onset = np.concatenate(([0], np.cumsum(beat["delta_time"])))
+    center = onset + (tm + gaussian_m - 2) / 2
+    shape = np.stack((center, np.ceil(tm / 2), np.asarray(beat["gaussian_std"], dtype=float)))
+    return shape, (onset + tm + gaussian_m - 1).max()
+
+
+def _model(x, mask, theta, components, jac=False):
+    """Beats at positions x (B, L) for (B, 1 + 4 C) parameters, zero where mask is False, and their Jacobian"""
+    p = theta[:, None, :]
+    a, c, h, s = (p[..., 1 + i * components:1 + (i + 1) * components] for i in range(4))
+    out = wavelet_model(x[..., None], a, c, h, s, jac=jac)
+    if not jac:
+        return (out.sum(axis=-1) + theta[:, :1]) * mask
+    value, derivatives = out
+    jacobian = np.concatenate((np.ones(x.shape + (1,)),) + derivatives, axis=-1) * mask[..., None]
+    return (value.sum(axis=-1) + theta[:, :1]) * mask, jacobian
+
+
+def _quality(model, beats):
+    """(r2, rmse) of every beat against its model"""
+    ss_res = np.array([np.sum((m - b) ** 2) for m, b in zip(model, beats)])
+    ss_tot = np.array([np.sum((b - np.mean(b)) ** 2) for b in beats])
+    return 1 - ss_res / np.maximum(ss_tot, 1e-300), np.sqrt(ss_res / np.array([len(b) for b in beats]))
+
+
+def _grid(beats):
+    """Sample positions (B, L), mask of the samples inside each beat and the zero padded beats"""
+    lengths = np.array([len(b) for b in beats])
+    x = np.broadcast_to(np.arange(lengths.max(), dtype=float), (len(beats), lengths.max()))
+    mask = x < lengths[:, None]
+    y = np.zeros(x.shape)
+    y[mask] = np.concatenate(beats)
+    return x, mask, y, lengths
+
+
+def _linear(design, mask, y):
+    """Least squares baseline and amplitudes for (B, L, C) unit wavelets"""
+    design = np.concatenate((np.ones(y.shape + (1,)), design), axis=-1) * mask[..., None]
+    gram = design.transpose(0, 2, 1) @ design
+    gram += 1e-9 * np.trace(gram, axis1=1, axis2=2)[:, None, None] * np.eye(design.shape[-1])
+    return np.linalg.solve(gram, (design.transpose(0, 2, 1) @ y[..., None]))[..., 0]
+
+
+def _levenberg_marquardt(model, y, theta, lower, upper, max_iter, tol):
+    """Batched Levenberg-Marquardt, every beat with its own damping accepting or rejecting its own steps
+
+    Steps are projected onto the bounds.
+
+    :param model: ``model(theta, rows, jac)`` returning the values of beats rows for their (rows, P) parameters
+                  theta, with jac also their (rows, L, P) Jacobian
+    :return: the fitted (B, P) parameters and the iterations run until the last beat converged
+    """
+    theta = np.clip(theta, lower, upper)
+    damping = np.full(len(theta), 1e-3)
+    residual = model(theta, np.arange(len(theta)), False) - y
+    cost = np.sum(residual ** 2, axis=1)
+    active = np.arange(len(theta))  # beats still converging
+    iteration = 0
+    while len(active) and iteration < max_iter:
+        iteration += 1
+        ya, ta = y[active], theta[active]
+        _, jacobian = model(ta, active, True)
+        gradient = np.einsum("blp,bl->bp", jacobian, residual[active])
+        hessian = jacobian.transpose(0, 2, 1) @ jacobian
+        diagonal = np.diagonal(hessian, axis1=1, axis2=2) + 1e-12
+        step = np.linalg.solve(hessian + damping[active, None, None] * diagonal[:, None, :] * np.eye(ta.shape[1]),
+                               -gradient[..., None])[..., 0]
+        candidate = np.clip(ta + step, lower[active], upper[active])
+        candidate_residual = model(candidate, active, False) - ya
+        candidate_cost = np.sum(candidate_residual ** 2, axis=1)
+        better = candidate_cost < cost[active]
+        improvement = (cost[active] - candidate_cost) / np.maximum(cost[active], 1e-300)
+        accepted = active[better]
+        theta[accepted], residual[accepted], cost[accepted] = \
+            candidate[better], candidate_residual[better], candidate_cost[better]
+        damping[active] = np.where(better, damping[active] / 3, damping[active] * 4)
+        done = (better & (improvement < tol)) | (damping[active] > 1e10) | (cost[active] < 1e-24)
+        active = active[~done]
+    return theta, iteration
+
+
+def _fit_block(beats, shape, max_iter, tol):
+    """Fit the continuous wavelets of one block of beats starting from the (B, 3, C) shapes
+
+    :return: (B, 1 + 4 C) parameters baseline, amplitudes, centers, half widths and stds, and the iterations run
+    """
+    x, mask, y, lengths = _grid(beats)
+    n_beats, _, components = shape.shape
+    length = lengths[:, None].astype(float)
+    lower = np.concatenate((np.full((n_beats, 1), -np.inf), np.zeros((n_beats, components)),
+                            np.broadcast_to(-length / 2, (n_beats, components)),
+                            np.full((n_beats, components), 0.5), np.full((n_beats, components), 0.25)), axis=1)
+    upper = np.concatenate((np.full((n_beats, 1 + components), np.inf),
+                            np.broadcast_to(1.5 * length, (n_beats, components)),
+                            np.broadcast_to(length, (n_beats, components)),
+                            np.broadcast_to(length, (n_beats, components))), axis=1)
+
+    # baseline and amplitudes are linear given the shape, start from their least squares solution
+    linear = _linear(wavelet_model(x[..., None], 1.0, *(shape[:, None, i] for i in range(3))), mask, y)
+    theta = np.concatenate((linear, shape.reshape(n_beats, -1)), axis=1)
+    return _levenberg_marquardt(lambda t, rows, jac: _model(x[rows], mask[rows], t, components, jac=jac),
+                                y, theta, lower, upper, max_iter, tol)
+
+
+def _layout(position, triangle_m, gaussian_m, length):
+    """What the rendered wavelets of fixed positions and triangle widths share whatever their stds
+
+    :return: (n_fft, triangle spectra (B, C, n_fft // 2 + 1), (B, length, C) indices into the kernels and whether
+             they fall inside them)
+    """
+    from scipy import fft
+    from pypda.synthesis import triang_windows
+
+    width = int(triangle_m.max()) + gaussian_m - 1
+    n_fft = fft.next_fast_len(width, real=True)
+    triangle = fft.rfft(triang_windows(triangle_m.ravel(), int(triangle_m.max())), n_fft, axis=-1)
+    offset = np.arange(length)[None, :, None] - position[:, None, :]  # sample within every kernel
+    inside = (offset >= 0) & (offset < (triangle_m + gaussian_m - 1)[:, None, :])
+    return n_fft, triangle.reshape(triangle_m.shape + (-1,)), np.clip(offset, 0, width - 1), inside
+
+
+def _rendered_wavelets(n_fft, triangle, index, inside, gaussian_m, std, jac=False):
+    """Unit wavelets (B, L, C) exactly as :func:`pypda.synthesis.render_beats` places them, see :func:`_layout`, and
+    with jac their derivatives by the (B, C) stds"""
+    from scipy import fft
+    from pypda.synthesis import gaussian_windows
+
+    gaussian = gaussian_windows(np.full(std.size, gaussian_m), std.ravel(), gaussian_m)
+    windows = (gaussian,)
+    if jac:
+        n = np.arange(gaussian_m) - (gaussian_m - 1) / 2.0
+        windows += (gaussian * n ** 2 / std.reshape(-1, 1) ** 3,)
+    out = []
+    for w in windows:
+        spectrum = triangle * fft.rfft(w, n_fft, axis=-1).reshape(triangle.shape)
+        kernel = fft.irfft(spectrum, n_fft, axis=-1)[..., :index.max() + 1].transpose(0, 2, 1)
+        out.append(np.where(inside, np.take_along_axis(kernel, index, axis=1), 0.0))
+    return tuple(out) if jac else out[0]
+
+
+def _refine_block(beats, position, triangle_m, gaussian_m, std, max_iter, tol):
+    """Fit baseline, amplitudes and stds of one block for fixed integer positions and triangle widths
+
+    :return: (B, 1 + 2 C) parameters baseline, amplitudes and stds, and the iterations run
+    """
+    x, mask, y, lengths = _grid(beats)
+    n_beats, components = std.shape
+    length = x.shape[1]
+    n_fft, triangle, index, inside = _layout(position, triangle_m, gaussian_m, length)
+
+    def model(theta, rows, jac):
+        a, s = theta[:, 1:1 + components], theta[:, 1 + components:]
+        wavelets = _rendered_wavelets(n_fft, triangle[rows], index[rows], inside[rows], gaussian_m, s, jac=jac)
+        if not jac:
+            return (theta[:, :1] + np.einsum("blc,bc->bl", wavelets, a)) * mask[rows]
+        wavelets, by_std = wavelets
+        value = (theta[:, :1] + np.einsum("blc,bc->bl", wavelets, a)) * mask[rows]
+        jacobian = np.concatenate((np.ones((len(rows), length, 1)), wavelets, by_std * a[:, None, :]), axis=-1)
+        return value, jacobian * mask[rows, :, None]
+
+    lower = np.concatenate((np.full((n_beats, 1), -np.inf), np.zeros((n_beats, components)),
+                            np.full((n_beats, components), 0.25)), axis=1)
+    upper = np.concatenate((np.full((n_beats, 1 + components), np.inf),
+                            np.broadcast_to(lengths[:, None].astype(float), (n_beats, components))), axis=1)
+    std = np.clip(std, 0.25, None)
+    linear = _linear(_rendered_wavelets(n_fft, triangle, index, inside, gaussian_m, std), mask, y)
+    return _levenberg_marquardt(model, y, np.concatenate((linear, std), axis=1), lower, upper, max_iter, tol)
+
+
+def fit_beats(beats, initial=None, gaussian_m=16, block_beats=256, max_iter=100, tol=1e-6) -> BeatFit:
+    """Fit PulseModelRaw parameters to every beat of a record
+
+    Beats are fitted on their own sample grid, so the result has ``samples = len(beat)`` and describes raw beats of
+    about that length. Resample beats to a common length first to fit on the raw grid of :func:`render_beats`.
+
+    :param beats: sequence of 1-D beats, e.g. :func:`split_beats` of a record
+    :param initial: PulseModelRaw parameter dict the first block starts from, stretched to every beat's length,
+                    default :data:`DEFAULT_BEAT`
+    :param gaussian_m: gaussian window length of every wavelet
+    :param block_beats: beats fitted at once, every block starting from the last beat of the previous one
+    :param max_iter: Levenberg-Marquardt iterations per block and pass
+    :param tol: a beat has converged once a step reduces its squared error by less than this relative amount
+    """
+    from pypda.synthesis import resample_beats
+    start = time.perf_counter()
+    shape, template_length = _initial(DEFAULT_BEAT if initial is None else initial, gaussian_m)
+    lengths = np.array([len(b) for b in beats])
+    parameters, iterations = [], 0
+    for lo in range(0, len(beats), block_beats):
+        block = beats[lo:lo + block_beats]
+        scale = lengths[lo:lo + len(block), None, None] / template_length  # stretch the shape to every beat
+        theta, n = _fit_block(block, shape[None] * scale, max_iter, tol)
+        parameters.append(theta)
+        iterations += n
+        shape, template_length = theta[-1, 1:].reshape(4, -1)[1:], lengths[lo + len(block) - 1]
+    parameters = np.concatenate(parameters)
+    baseline = parameters[:, 0]
+    amplitude, center, half_width, std = parameters[:, 1:].reshape(len(parameters), 4, -1).transpose(1, 0, 2)
+    continuous_r2, continuous_rmse = _quality(
+        [baseline[i] + wavelet_model(np.arange(len(b))[:, None], amplitude[i], center[i], half_width[i],
+                                     std[i]).sum(axis=1) for i, b in enumerate(beats)], beats)
+
+    # integer geometry as the renderer lays it out, wavelets in onset order
+    order = np.argsort(center - half_width, axis=1, kind="stable")
+    sorted_center, sorted_half_width, sorted_std = (np.take_along_axis(v, order, axis=1)
+                                                    for v in (center, half_width, std))
+    # triang(2 h) and triang(2 h - 1) sample the same triangle, the one whose onset falls on a sample fits
+    longest = np.maximum(lengths - gaussian_m + 1, 1)[:, None]
+    even = np.maximum(np.round(sorted_half_width), 1) * 2
+    onset = sorted_center - (even + gaussian_m - 2) / 2
+    odd = np.abs(onset + 0.5 - np.round(onset + 0.5)) < np.abs(onset - np.round(onset))
+    triangle_m = np.clip(even - odd, 1, longest).astype(int)
+    onset = sorted_center - (triangle_m + gaussian_m - 2) / 2
+    position = np.maximum.accumulate(np.maximum(np.round(onset), 0).astype(int), axis=1)
+    position[:, 0] = 0  # where the renderer starts every beat
+    position = np.minimum(position, lengths[:, None] - (triangle_m + gaussian_m - 1))  # end within the beat
+    position = np.maximum(np.minimum.accumulate(position[:, ::-1], axis=1)[:, ::-1], 0)
+    end = position + triangle_m + gaussian_m - 1
+    rows, last = np.arange(len(beats)), np.argmax(end, axis=1)
+    triangle_m[rows, last] = np.maximum(triangle_m[rows, last] + lengths - end.max(axis=1), 1)
+    refined = []
+    for lo in range(0, len(beats), block_beats):
+        part = slice(lo, lo + block_beats)
+        theta, n = _refine_block(beats[part], position[part], triangle_m[part], gaussian_m, sorted_std[part],
+                                 max_iter, tol)
+        refined.append(theta)
+        iterations += n
+    refined = np.concatenate(refined)
+    components = amplitude.shape[1]
+    fitted = BeatParameters(samples=lengths, baseline=refined[:, 0], pulse_amplitudes=refined[:, 1:1 + components],
+                            delta_time=np.diff(position, axis=1), triangle_m=triangle_m,
+                            gaussian_m=np.full_like(triangle_m, gaussian_m), gaussian_std=refined[:, 1 + components:])
+
+    raw, raw_length = fitted.render()
+    r2, rmse = _quality(np.split(resample_beats(raw, raw_length, lengths), np.cumsum(lengths)[:-1]), beats)
+    return BeatFit(fitted, baseline, amplitude, center, half_width, std, r2=r2, rmse=rmse,
+                   continuous_r2=continuous_r2, continuous_rmse=continuous_rmse, seconds=time.perf_counter() - start,
+                   iterations=iterations)
+
+
+def fit_records(records, workers=1, **kwargs) -> list:
+    """:func:`fit_beats` of every record, records fitted in parallel by a process pool
+
+    :param records: sequence of records, each a sequence of beats
+    :param workers: number of worker processes, 1 fits in this process
+    :param kwargs: passed to :func:`fit_beats`
+    :return: one :class:`BeatFit` per record
+    """
+    if workers == 1:
+        return [fit_beats(beats, **kwargs) for beats in records]
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(partial(fit_beats, **kwargs), records))
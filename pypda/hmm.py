@@ -1,46 +1,88 @@
-import random
-from itertools import product
 from typing import Union, Iterable
 
 import numpy as np
 
 from pypda.parameters import PulseWaveParameters
+from pypda.rng import generator
 
 
 class CPT:
-    def __init__(self, n_variables=3, states=2, definition="P(A|B,C)"):
+    """Conditional probability table P(A|B,C,...) stored as a dense array indexed [a, b, c, ...]
+
+    Entries are unnormalized weights; :attr:`probabilities` normalizes them over the first (sampled) variable.
+    """
+
+    def __init__(self, n_variables=3, states=2, definition="P(A|B,C)", cardinality=None, rng=None):
+        """
+
+        :param n_variables: number of variables, including the sampled one
+        :param states: number of states of every variable, unless cardinality is given
+        :param definition: human readable description
+        :param cardinality: number of states of each variable, the sampled one first
+        :param rng: seed or np.random.Generator, None draws from the global numpy RNG, see :mod:`pypda.rng`
+        """
+        self.rng = generator(rng)
         self.n = n_variables
-        self.k = states
+        self.cardinality = tuple(cardinality) if cardinality is not None else (states,) * n_variables
+        assert len(self.cardinality) == self.n, f"cardinality={self.cardinality} must have length {self.n}"
+        self.k = self.cardinality[0]
         self.definition = definition
-        cpt_init_data = np.random.rand(states ** n_variables)
-        self._cpt = {}
-        for i, row in enumerate(product(range(self.k), repeat=self.n)):
-            self._cpt[row] = cpt_init_data[i]
+        self._cpt = self.rng.random(self.cardinality)
+        self._cumulative = None
 
     def __getitem__(self, item):
         return self._cpt[item]
 
     def __setitem__(self, key, value):
         self._cpt[key] = value
+        self._cumulative = None
+
+    @property
+    def probabilities(self) -> np.ndarray:
+        return self._cpt / self._cpt.sum(axis=0, keepdims=True)
+
+    @property
+    def cumulative(self) -> np.ndarray:
+        """Cumulative probabilities along the sampled variable, last entry is exactly 1"""
+        if self._cumulative is None:
+            self._cumulative = np.cumsum(self.probabilities, axis=0)
+            self._cumulative[-1] = 1
+        return self._cumulative
+
+    def sample(self, *conditions, u=None) -> np.ndarray:
+        """Draw one state per entry of the broadcast condition arrays
+
+        :param conditions: state index arrays of the conditioning variables
+        :param u: optional pre-drawn uniforms with the broadcast shape of conditions
+        :return: int array of sampled states
+        """
+        cumulative = self.cumulative[(slice(None),) + tuple(np.asarray(c, dtype=int) for c in conditions)]
+        if u is None:
+            u = self.rng.random(cumulative.shape[1:])
+        return (u[None] >= cumulative).sum(axis=0)
 
     def sample_conditioned(self, *conditions: Union[Iterable, int]) -> int:
-        try:
-            sample_weights = [self._cpt[tuple([ki] + list(int(c) for c in conditions))] for ki in range(self.k)]
-        except TypeError:  # conditions not iterable
-            sample_weights = [self._cpt[ki, conditions] for ki in range(self.k)]
-        return int(random.choices(range(self.k), weights=sample_weights)[0])
+        return int(self.sample(*(int(c) for c in conditions)))
 
 
 class HMM:
 
-    def __init__(self, parameters: "PulseWaveParameters", time_steps=100):
+    def __init__(self, parameters: "PulseWaveParameters", time_steps=100, rng=None):
+        """
+
+        :param parameters:
+        :param time_steps: default number of beats T
+        :param rng: seed or np.random.Generator shared with the CPTs, None draws from the global numpy RNG
+        """
+        self._rng = generator(rng)
         self.SEVERITY_STEPS = 3
         self.prior_normal = 0.99
         self.p = parameters  # type:PulseWaveParameters
         self.output_features = len(self.p.normal)
 
         self.T = time_steps
-        self.cpt_n_transistion = CPT(n_variables=3, states=2, definition="P(n_{t+1}|n_{t}, s_{t-1}")
+        self.cpt_n_transistion = CPT(n_variables=3, cardinality=(2, 2, self.SEVERITY_STEPS),
+                                     definition="P(n_{t+1}|n_{t}, s_{t-1}", rng=self._rng)
 
         self.cpt_n_transistion[0, 0, 0] = 0.99
         self.cpt_n_transistion[1, 0, 0] = 0.01
@@ -56,7 +98,8 @@ class HMM:
         self.cpt_n_transistion[0, 1, 2] = 0.4
         self.cpt_n_transistion[1, 1, 2] = 0.6
 
-        self.cpt_n_s_emission = CPT(n_variables=2, states=self.SEVERITY_STEPS, definition="P(s_{t}|n_{t}")
+        self.cpt_n_s_emission = CPT(n_variables=2, cardinality=(self.SEVERITY_STEPS, 2), definition="P(s_{t}|n_{t}",
+                                    rng=self._rng)
         self.cpt_n_s_emission[0, 0] = 0.6
         self.cpt_n_s_emission[1, 0] = 0.2
         self.cpt_n_s_emission[2, 0] = 0.1
@@ -65,38 +108,201 @@ class HMM:
         self.cpt_n_s_emission[1, 1] = 0.3
         self.cpt_n_s_emission[2, 1] = 0.15
 
-    def sample(self):
-        from sklearn.datasets import make_gaussian_quantiles
-        features_n, severity_n = make_gaussian_quantiles(mean=None, cov=1.0, n_samples=10 * self.T,
-                                                         n_features=self.output_features, n_classes=self.SEVERITY_STEPS,
-                                                         shuffle=True, random_state=None)
-        features_n = [features_n[severity_n == s, :] for s in range(self.SEVERITY_STEPS)]
-        features_a, severity_a = make_gaussian_quantiles(mean=None, cov=1.0, n_samples=10 * self.T,
-                                                         n_features=self.output_features, n_classes=self.SEVERITY_STEPS,
-                                                         shuffle=True, random_state=None)
-        features_a = [features_a[severity_a == s, :] for s in range(self.SEVERITY_STEPS)]
-        x = np.zeros(self.T).astype(int)
-        s = np.zeros(self.T).astype(int)
-        y = [{} for _ in range(self.T)]
-        for i in range(self.T):
-            if i == 0:
-                x[0] = random.choices([0, 1], weights=[self.prior_normal, 1 - self.prior_normal])[0]
-            else:
-                x[i] = self.cpt_n_transistion.sample_conditioned(x[i - 1], s[i - 1])
-            s[i] = self.cpt_n_s_emission.sample_conditioned(x[i])
-
-            if x[i]:  # abnormal
-                _idx = np.random.choice(range(features_a[s[i]].shape[0]))
-                features = features_a[s[i]][_idx, :] * self.p.abnormal.scale + self.p.normal.mean
-            else:  # normal
-                _idx = np.random.choice(range(features_n[s[i]].shape[0]))
-                features = features_a[s[i]][_idx, :] * self.p.normal.scale + self.p.normal.mean
-            y[i]['samples'] = int(features[0])
-            y[i]['baseline'] = features[1]
-
-            y[i]['pulse_amplitudes'] = features[2:7]
-            y[i]['delta_time'] = features[7:11].astype(int)
-            y[i]['triangle_m'] = features[11:16].astype(int)
-            y[i]['gaussian_m'] = features[16:21].astype(int)
-            y[i]['gaussian_std'] = features[21:26]
-        return x, y
+    @property
+    def rng(self):
+        return self._rng
+
+    @rng.setter
+    def rng(self, rng):
+        """Draw from rng (a seed or Generator, None for the global numpy RNG) from now on, CPTs included"""
+        self._rng = generator(rng)
+        self.cpt_n_transistion.rng = self.cpt_n_s_emission.rng = self._rng
+
+    @property
+    def n_joint_states(self):
+        return 2 * self.SEVERITY_STEPS
+
+    @property
+    def initial_distribution(self) -> np.ndarray:
+        """P(n_0, s_0) over the joint state z = n * SEVERITY_STEPS + s"""
+        prior = np.array([self.prior_normal, 1 - self.prior_normal])
+        return (prior[:, None] * self.cpt_n_s_emission.probabilities.T).ravel()
+
+    @property
+    def transition_matrix(self) -> np.ndarray:
+        """P(z_t|z_{t-1}) over the joint state z = n * SEVERITY_STEPS + s, rows indexed by z_{t-1}"""
+        transition = self.cpt_n_transistion.probabilities  # [n_t, n_{t-1}, s_{t-1}]
+        emission = self.cpt_n_s_emission.probabilities  # [s_t, n_t]
+        joint = transition[:, :, :, None] * emission.T[:, None, None, :]  # [n_t, n_{t-1}, s_{t-1}, s_t]
+        return joint.transpose(1, 2, 0, 3).reshape(self.n_joint_states, self.n_joint_states)
+
+    def sample_states(self, n_chains=1, initial=None, time_steps=None):
+        """Sample independent chains of the coupled normal-state/severity process
+
+        Uniforms for all steps are drawn up front and turned into a next-state table (T, n_chains, K) with one
+        vectorized cumulative-probability lookup, so each step only gathers from that table.
+
+        :param n_chains: number of chains
+        :param initial: optional (x, s) of shape (n_chains,) the chains continue from, instead of starting from the
+                        prior
+        :param time_steps: number of steps, defaults to T
+        :return: (x, s), int arrays of shape (n_chains, time_steps) holding the normal state and the severity
+        """
+        time_steps = self.T if time_steps is None else time_steps
+        u = self.rng.random((time_steps, n_chains))
+        cumulative = np.cumsum(self.transition_matrix, axis=1)
+        cumulative[:, -1] = 1
+        next_state = (u[:, :, None, None] >= cumulative).sum(axis=-1)
+        chains = np.arange(n_chains)
+        z = np.empty((n_chains, time_steps), dtype=int)
+        if initial is None:
+            prior = np.cumsum(self.initial_distribution)
+            prior[-1] = 1
+            z[:, 0] = np.searchsorted(prior, u[0], side="right")
+        else:
+            z[:, 0] = next_state[0, chains, np.asarray(initial[0]) * self.SEVERITY_STEPS + np.asarray(initial[1])]
+        for i in range(1, time_steps):
+            z[:, i] = next_state[i, chains, z[:, i - 1]]
+        return np.divmod(z, self.SEVERITY_STEPS)
+
+    def sample_severity_features(self, s: np.ndarray) -> np.ndarray:
+        """Standard normal feature vectors conditioned on their severity shell
+
+        Severity ``k`` selects the ``k``-th of ``SEVERITY_STEPS`` equally likely chi-square quantile shells of the
+        squared norm, the same classes ``sklearn.datasets.make_gaussian_quantiles`` assigns. Every row is drawn
+        directly: a uniform direction scaled by a radius from the inverse chi-square CDF restricted to the shell.
+
+        :param s: int array of severities
+        :return: array of shape s.shape + (output_features,)
+        """
+        from scipy.special import chdtri
+        s = np.asarray(s)
+        direction = self.rng.standard_normal(s.shape + (self.output_features,))
+        direction /= np.linalg.norm(direction, axis=-1, keepdims=True)
+        quantile = (s + self.rng.random(s.shape)) / self.SEVERITY_STEPS
+        radius = np.sqrt(chdtri(self.output_features, 1 - quantile))
+        return direction * radius[..., None]
+
+    def sample_features(self, x: np.ndarray, s: np.ndarray) -> np.ndarray:
+        """Denormalized per-beat features for normal states x and severities s"""
+        z = self.sample_severity_features(s)
+        abnormal = np.asarray(x, dtype=bool)[..., None]  # abnormal beats keep the normal means
+        return np.where(abnormal, self.p.abnormal.denormalize(z, self.p.normal.mean), self.p.normal.denormalize(z))
+
+    def log_emissions(self, severity=None, features=None) -> np.ndarray:
+        """log P(observations|z) of every beat over the joint state z = n * SEVERITY_STEPS + s
+
+        Observed severities rule out the other severities. Observed features are scored with the density
+        :meth:`sample_features` draws from: a standard normal restricted to the severity's chi-square shell, scaled by
+        the normal or abnormal scale.
+
+        :param severity: optional (batch, T) observed severities
+        :param features: optional (batch, T, output_features) per-beat features, e.g. ``beats.npy`` of a recording
+        :return: (batch, T, K)
+        """
+        from scipy.special import chdtr
+        assert severity is not None or features is not None, "at least one of severity and features must be given"
+        shape = np.shape(severity) if features is None else np.shape(features)[:-1]
+        log_emission = np.zeros(shape + (self.n_joint_states,))
+        per_state = log_emission.reshape(shape + (2, self.SEVERITY_STEPS))
+        severities = np.arange(self.SEVERITY_STEPS)
+        if severity is not None:
+            per_state[np.broadcast_to(np.asarray(severity)[..., None, None] != severities, per_state.shape)] = -np.inf
+        if features is not None:
+            for n, p in enumerate((self.p.normal, self.p.abnormal)):
+                r2 = np.sum(((np.asarray(features) - self.p.normal.mean) / p.scale) ** 2, axis=-1)
+                shell = np.minimum((chdtr(self.output_features, r2) * self.SEVERITY_STEPS).astype(int),
+                                   self.SEVERITY_STEPS - 1)
+                density = (-0.5 * r2 - 0.5 * self.output_features * np.log(2 * np.pi) - np.sum(np.log(p.scale))
+                           + np.log(self.SEVERITY_STEPS))
+                per_state[..., n, :] += np.where(shell[..., None] == severities, density[..., None], -np.inf)
+        return log_emission
+
+    def forward_backward(self, log_emission: np.ndarray, block=None):
+        """Log likelihood and posterior marginals of (batch, T, K) log emissions, see :mod:`pypda.inference`
+
+        :return: (log_likelihood (batch,), posterior (batch, T, 2, SEVERITY_STEPS)) where
+                 ``posterior[:, t, n, s] = P(n_t = n, s_t = s|observations)``
+        """
+        from pypda.inference import forward_backward
+        with np.errstate(divide="ignore"):
+            log_likelihood, log_posterior = forward_backward(np.log(self.initial_distribution),
+                                                             np.log(self.transition_matrix), log_emission, block)
+        return log_likelihood, np.exp(log_posterior).reshape(log_posterior.shape[:-1] + (2, self.SEVERITY_STEPS))
+
+    def viterbi(self, log_emission: np.ndarray, block=None):
+        """Most probable normal-state and severity sequences for (batch, T, K) log emissions
+
+        :return: (x, s, log_probability) with x and s of shape (batch, T) as returned by :meth:`sample_states`
+        """
+        from pypda.inference import viterbi
+        with np.errstate(divide="ignore"):
+            z, log_probability = viterbi(np.log(self.initial_distribution), np.log(self.transition_matrix),
+                                         log_emission, block)
+        x, s = np.divmod(z, self.SEVERITY_STEPS)
+        return x, s, log_probability
+
+    def sample(self, columnar=False):
+        """Sample one chain of T beats
+
+        :param columnar: return the beat parameters as one :class:`BeatParameters` record of arrays instead of a
+                         list of T per-beat dicts
+        :return: (x, beats) where x holds the normal state of every beat
+        """
+        x, s = self.sample_states()
+        x, s = x[0], s[0]
+        parameters = BeatParameters.from_features(self.sample_features(x, s))
+        if columnar:
+            return x, parameters
+        return x, list(parameters)
+
+
+class BeatParameters:
+    """PulseModelRaw parameters of many beats, one array per keyword (structure of arrays)
+
+    The leading dimensions of every field index the beats, e.g. ``pulse_amplitudes`` has shape (T, 5). Indexing with
+    an integer gives the keyword dict of one beat, any other index gives a new record.
+    """
+    FIELDS = ("samples", "baseline", "pulse_amplitudes", "delta_time", "triangle_m", "gaussian_m", "gaussian_std")
+
+    def __init__(self, samples, baseline, pulse_amplitudes, delta_time, triangle_m, gaussian_m, gaussian_std):
+        self.samples = samples
+        self.baseline = baseline
+        self.pulse_amplitudes = pulse_amplitudes
+        self.delta_time = delta_time
+        self.triangle_m = triangle_m
+        self.gaussian_m = gaussian_m
+        self.gaussian_std = gaussian_std
+
+    @classmethod
+    def from_features(cls, features: np.ndarray) -> "BeatParameters":
+        """Split (..., 26) feature arrays as drawn by :meth:`HMM.sample_features`"""
+        return cls(samples=features[..., 0].astype(int),
+                   baseline=features[..., 1],
+                   pulse_amplitudes=features[..., 2:7],
+                   delta_time=features[..., 7:11].astype(int),
+                   triangle_m=features[..., 11:16].astype(int),
+                   gaussian_m=features[..., 16:21].astype(int),
+                   gaussian_std=features[..., 21:26])
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return {k: getattr(self, k)[item] for k in self.FIELDS}
+        return BeatParameters(**{k: getattr(self, k)[item] for k in self.FIELDS})
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def reshape(self, *shape) -> "BeatParameters":
+        """Reshape the beat dimensions, e.g. ``reshape(-1)`` flattens (n, T) chains into one sequence"""
+        return BeatParameters(**{k: getattr(self, k).reshape(shape + getattr(self, k).shape[self.samples.ndim:])
+                                 for k in self.FIELDS})
+
+    def render(self):
+        """Raw beats of the (flat) record, see :func:`pypda.synthesis.render_beats`"""
+        from pypda.synthesis import render_beats
+        return render_beats(self.baseline, self.pulse_amplitudes, self.delta_time, self.triangle_m, self.gaussian_m,
+                            self.gaussian_std)
@@ -0,0 +1,246 @@
+"""Memory-mapped dataset of variable length records with an offset index.
+
+A dataset is a directory of flat binary arrays described by ``meta.json``:
+
+* ``x.bin`` and ``y.bin`` hold the samples and boolean labels of all records back to back,
+* ``index.bin`` holds one :data:`INDEX_DTYPE` row per record: where its samples and beats start, how many there are
+  and its time axis ``t = start + arange(length) * step``,
+* optionally ``state.bin``, ``severity.bin`` and one ``beats.<field>.bin`` per :class:`pypda.hmm.BeatParameters` field
+  hold the per-beat HMM output of all records back to back.
+
+:class:`IndexedDataset` maps the files read-only, so records are array views and worker processes sharing a dataset
+share the page cache instead of copying it.
+"""
+import copy
+import json
+import os
+import shutil
+
+import numpy as np
+from numpy.lib.format import descr_to_dtype, dtype_to_descr
+
+from pypda.hmm import BeatParameters
+
+FORMAT_VERSION = 1
+INDEX_DTYPE = np.dtype([("offset", "<i8"), ("length", "<i8"), ("start", "<f8"), ("step", "<f8"),
+                        ("beat_offset", "<i8"), ("beats", "<i8")])
+
+
+def _descr(descr):
+    """Undo the JSON round trip of a dtype descr, which turns the (name, type) tuples of a structured one into lists"""
+    return descr if isinstance(descr, str) else [tuple(field) for field in descr]
+
+
+class IndexedWriter:
+    """Append records to a new dataset directory, see :mod:`pypda.indexed`
+
+    Records are written through to disk as they are appended; ``meta.json`` is written by :meth:`close`, so an
+    unfinished dataset cannot be opened.
+    """
+
+    def __init__(self, directory, x_dtype="<f8", attrs=None):
+        """
+
+        :param directory: output directory, created if needed
+        :param x_dtype: dtype x is stored with, e.g. "<f4" halves the size
+        :param attrs: optional JSON serializable dict stored in meta.json, e.g. synthesis settings
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.attrs = {} if attrs is None else attrs
+        self.dtypes = {"index": INDEX_DTYPE, "x": np.dtype(x_dtype), "y": np.dtype(bool)}
+        self.shapes = {}  # trailing dimensions of the per-beat parameter arrays
+        self.index = []
+        self.samples = 0
+        self.beats = None  # number of beats written, None until known whether beats are stored
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _file(self, name):
+        if name not in self._files:
+            self._files[name] = open(os.path.join(self.directory, f"{name}.bin"), "wb")
+        return self._files[name]
+
+    def _write(self, name, array):
+        self._file(name).write(np.ascontiguousarray(array, dtype=self.dtypes[name]).tobytes())
+
+    def append(self, x, y, t, state=None, severity=None, beats: "BeatParameters" = None):
+        """Append one record
+
+        :param x: (L,) waveform
+        :param y: (L,) labels
+        :param t: (L,) uniformly spaced time axis
+        :param state: optional (B,) normal states of the record's beats, requires severity and beats
+        :param severity: optional (B,) severities
+        :param beats: optional parameters of the B beats
+        """
+        has_beats = beats is not None
+        if self.beats is None:
+            self.beats = 0 if has_beats else -1
+            if has_beats:
+                self.dtypes.update(state=np.dtype("i1"), severity=np.dtype("i1"))
+                for k in BeatParameters.FIELDS:
+                    self.dtypes[f"beats.{k}"] = getattr(beats, k).dtype.newbyteorder("<")
+                    self.shapes[f"beats.{k}"] = getattr(beats, k).shape[1:]
+        assert has_beats == (self.beats >= 0), "either every record or no record must come with its beats"
+        assert len(x) == len(y) == len(t), "x, y and t must have the same length"
+
+        n_beats = len(beats) if has_beats else 0
+        step = float(t[1] - t[0]) if len(t) > 1 else 0.0
+        self.index.append((self.samples, len(x), float(t[0]) if len(t) else 0.0, step, max(self.beats, 0), n_beats))
+        self._write("x", x)
+        self._write("y", y)
+        self.samples += len(x)
+        if has_beats:
+            self._write("state", state)
+            self._write("severity", severity)
+            for k in BeatParameters.FIELDS:
+                self._write(f"beats.{k}", getattr(beats, k))
+            self.beats += n_beats
+
+    def extend(self, x, y, t, state=None, severity=None, beats: "BeatParameters" = None):
+        """Append records stacked along the first axis, beats as (n, B) arrays and a flat n * B BeatParameters"""
+        n = len(x)
+        per_record = None if beats is None else len(beats) // n
+        for i in range(n):
+            if beats is None:
+                self.append(x[i], y[i], t[i])
+            else:
+                self.append(x[i], y[i], t[i], state[i], severity[i], beats[i * per_record:(i + 1) * per_record])
+
+    def merge(self, directory):
+        """Append all records of the closed dataset in directory, copying its files instead of loading its arrays"""
+        source = IndexedDataset(directory)
+        if not len(source):
+            return
+        dtypes = {name: descr_to_dtype(_descr(spec["dtype"])) for name, spec in source.meta["arrays"].items()}
+        if self.beats is None:
+            self.beats = 0 if source.has_beats else -1
+            self.dtypes.update((name, dtype) for name, dtype in dtypes.items() if name not in ("index", "x", "y"))
+            self.shapes.update((name, tuple(spec["shape"][1:])) for name, spec in source.meta["arrays"].items()
+                               if name.startswith("beats."))
+        assert source.has_beats == (self.beats >= 0), "either every record or no record must come with its beats"
+        assert dtypes == self.dtypes, "merged datasets must store their arrays with the same dtypes"
+
+        index = np.array(source.index)
+        index["offset"] += self.samples
+        index["beat_offset"] += max(self.beats, 0)
+        self.index.extend(index.tolist())
+        for name in self.dtypes:
+            if name != "index":
+                with open(os.path.join(directory, f"{name}.bin"), "rb") as f:
+                    shutil.copyfileobj(f, self._file(name))
+        self.samples += source.meta["samples"]
+        if self.beats >= 0:
+            self.beats += source.meta["beats"]
+
+    def close(self):
+        self._write("index", np.array(self.index, dtype=INDEX_DTYPE))
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        arrays = {}
+        for name, dtype in self.dtypes.items():
+            path = os.path.join(self.directory, f"{name}.bin")
+            if not os.path.exists(path):  # no records appended
+                open(path, "wb").close()
+            rows = {"index": len(self.index), "x": self.samples, "y": self.samples}.get(name, max(self.beats or 0, 0))
+            arrays[name] = {"dtype": dtype_to_descr(dtype), "shape": [rows] + list(self.shapes.get(name, ()))}
+        meta = {"version": FORMAT_VERSION, "records": len(self.index), "samples": self.samples,
+                "beats": max(self.beats or 0, 0), "arrays": arrays, "attrs": self.attrs}
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+
+class IndexedDataset:
+    """Random access reader of a dataset written by :class:`IndexedWriter`
+
+    ``dataset[i]`` returns ``(x, y, t)`` of record i, where x and y are read-only views into the mapped files and t is
+    computed from the index. ``dataset[a:b]`` and ``dataset[[i, j, ...]]`` return datasets over the selected records.
+    Both are O(1) in the dataset size. Pickling keeps only the path and the selection, so a dataset handed to worker
+    processes maps the files again there instead of copying them.
+    """
+
+    def __init__(self, directory, records=None):
+        """
+
+        :param directory: dataset directory
+        :param records: optional selection of record numbers, a range or an int array
+        """
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        assert self.meta["version"] <= FORMAT_VERSION, f"dataset format {self.meta['version']} is newer than this pypda"
+        self.records = range(self.meta["records"]) if records is None else records
+        self._arrays = None
+
+    @property
+    def attrs(self) -> dict:
+        return self.meta["attrs"]
+
+    @property
+    def has_beats(self) -> bool:
+        return "state" in self.meta["arrays"]
+
+    def _array(self, name) -> np.ndarray:
+        if self._arrays is None:
+            self._arrays = {}
+        if name not in self._arrays:
+            spec = self.meta["arrays"][name]
+            dtype = descr_to_dtype(_descr(spec["dtype"]))
+            if spec["shape"][0]:
+                self._arrays[name] = np.memmap(os.path.join(self.directory, f"{name}.bin"), dtype=dtype, mode="r",
+                                               shape=tuple(spec["shape"]))
+            else:
+                self._arrays[name] = np.empty(spec["shape"], dtype=dtype)
+        return self._arrays[name]
+
+    @property
+    def index(self) -> np.ndarray:
+        """Index rows of the selected records"""
+        if isinstance(self.records, range):  # basic slicing keeps this a view
+            r = self.records
+            return self._array("index")[slice(r.start, r.stop if r.stop >= 0 else None, r.step)]
+        return self._array("index")[self.records]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            row = self._array("index")[self.records[item]]
+            lo, hi = int(row["offset"]), int(row["offset"] + row["length"])
+            t = row["start"] + np.arange(row["length"]) * row["step"]
+            return self._array("x")[lo:hi], self._array("y")[lo:hi], t
+        if isinstance(item, slice) and isinstance(self.records, range):
+            return self._select(self.records[item])
+        return self._select(np.asarray(self.records)[item])
+
+    def _select(self, records) -> "IndexedDataset":
+        subset = copy.copy(self)  # shares meta and the mapped arrays
+        subset.records = records
+        return subset
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def beats(self, item: int):
+        """Per-beat HMM output of record item
+
+        :return: (state, severity, BeatParameters) views into the mapped files
+        """
+        assert self.has_beats, "dataset was written without beats"
+        row = self._array("index")[self.records[item]]
+        lo, hi = int(row["beat_offset"]), int(row["beat_offset"] + row["beats"])
+        return (self._array("state")[lo:hi], self._array("severity")[lo:hi],
+                BeatParameters(**{k: self._array(f"beats.{k}")[lo:hi] for k in BeatParameters.FIELDS}))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_arrays"] = None
+        return state
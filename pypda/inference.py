@@ -0,0 +1,148 @@
+"""Log-space forward-backward and Viterbi over (batch, T, K) log emissions of a K state chain.
+
+The recursions are split into blocks of ``block`` steps. Every block is first scanned on its own from each of the K
+states it can be entered from, all blocks in one numpy operation per step, then the blocks are chained through their
+(K, K) transfer matrices and the per-step values assembled from the entering ones. The default block is ``sqrt(T)``;
+temporaries hold (batch, T, K, K) values.
+
+Blocking is a deliberate trade-off: it costs O(T K^3) arithmetic instead of the O(T K^2) of the plain recursion, in
+exchange for about ``block + T / block`` numpy calls instead of T. For the six joint states of :class:`pypda.hmm.HMM`
+the per-call overhead dominates, so the extra factor K is cheaper. ``block=1`` runs the plain O(T K^2) recursion, one
+numpy call per step, which is the better choice for chains with many states.
+"""
+import numpy as np
+
+
+def _logsumexp(a, axis):
+    peak = np.max(a, axis=axis, keepdims=True)
+    peak = np.where(np.isfinite(peak), peak, 0)
+    with np.errstate(divide="ignore"):
+        return np.log(np.sum(np.exp(a - peak), axis=axis)) + np.squeeze(peak, axis=axis)
+
+
+def _blocks(log_emission, block):
+    """Steps 1..T-1 of (batch, T, K) padded with log(1) emissions to (batch, blocks, block, K)"""
+    batch, steps, k = log_emission.shape
+    block = max(int(np.sqrt(steps)), 1) if block is None else block
+    n_blocks = max(-(-(steps - 1) // block), 1)
+    padded = np.zeros((batch, n_blocks * block, k))
+    padded[:, :steps - 1] = log_emission[:, 1:]
+    return padded.reshape(batch, n_blocks, block, k), block
+
+
+def _scan(log_initial, log_transition, log_emission, block, viterbi):
+    """Forward messages, and for viterbi the entering state and backpointers, of every step
+
+    :return: (messages (batch, T, K), entering (batch, T - 1, K) or None, backpointers (batch, blocks, block, K, K)
+             indexed [entering state, step, state] or None, block)
+    """
+    reduce = (lambda a, axis: np.max(a, axis=axis)) if viterbi else _logsumexp
+    batch, steps, k = log_emission.shape
+    emission, block = _blocks(log_emission, block)
+    n_blocks = emission.shape[1]
+
+    # local[b, i, l, j]: best or total log probability of reaching state j at step l of block b from state i
+    local = np.empty((batch, n_blocks, k, block, k))
+    local[:, :, :, 0] = log_transition + emission[:, :, None, 0]
+    pointers = np.empty((batch, n_blocks, k, block, k), dtype=np.int8) if viterbi else None
+    if viterbi:
+        pointers[:, :, :, 0] = np.arange(k)[:, None]
+    for step in range(1, block):
+        candidates = local[:, :, :, step - 1, :, None] + log_transition
+        local[:, :, :, step] = reduce(candidates, axis=-2) + emission[:, :, None, step]
+        if viterbi:
+            pointers[:, :, :, step] = np.argmax(candidates, axis=-2)
+
+    # messages entering every block, chained through the blocks' transfer matrices
+    entering = np.empty((batch, n_blocks, k))
+    entering[:, 0] = log_initial + log_emission[:, 0]
+    for b in range(1, n_blocks):
+        entering[:, b] = reduce(entering[:, b - 1, :, None] + local[:, b - 1, :, -1], axis=-2)
+
+    candidates = entering[:, :, :, None, None] + local  # [batch, block, entering, step, state]
+    messages = np.concatenate((entering[:, :1], reduce(candidates, axis=2).reshape(batch, -1, k)[:, :steps - 1]),
+                              axis=1)
+    if not viterbi:
+        return messages, None, None, block
+    best_entry = np.argmax(candidates, axis=2).reshape(batch, -1, k)[:, :steps - 1]
+    return messages, best_entry, pointers, block
+
+
+def forward(log_initial, log_transition, log_emission, block=None) -> np.ndarray:
+    """Forward messages ``log P(e_0..e_t, z_t)``
+
+    :param log_initial: (K,) log P(z_0)
+    :param log_transition: (K, K) log P(z_t|z_{t-1}) indexed [z_{t-1}, z_t]
+    :param log_emission: (batch, T, K) log P(e_t|z_t)
+    :param block: steps per block, default sqrt(T)
+    :return: (batch, T, K)
+    """
+    return _scan(np.asarray(log_initial), np.asarray(log_transition), np.asarray(log_emission, dtype=float), block,
+                 viterbi=False)[0]
+
+
+def backward(log_transition, log_emission, block=None) -> np.ndarray:
+    """Backward messages ``log P(e_{t+1}..e_{T-1}|z_t)``, the forward recursion run on the reversed chain
+
+    :return: (batch, T, K)
+    """
+    log_emission = np.asarray(log_emission, dtype=float)
+    log_transition = np.asarray(log_transition)
+    # reversed[:, t] = log P(e_t..e_{T-1}|z_t), one more transition step gives the message of step t - 1
+    reversed_ = forward(np.zeros(log_emission.shape[-1]), log_transition.T, log_emission[:, ::-1], block)[:, ::-1]
+    beta = np.zeros(log_emission.shape)
+    beta[:, :-1] = _logsumexp(log_transition + reversed_[:, 1:, None, :], axis=-1)
+    return beta
+
+
+def forward_backward(log_initial, log_transition, log_emission, block=None):
+    """Log likelihood and posterior marginals
+
+    :return: (log_likelihood (batch,), log_posterior (batch, T, K)) where
+             ``log_posterior[:, t, k] = log P(z_t = k|e_0..e_{T-1})``
+    """
+    alpha = forward(log_initial, log_transition, log_emission, block)
+    beta = backward(log_transition, log_emission, block)
+    log_likelihood = _logsumexp(alpha[:, -1], axis=-1)
+    return log_likelihood, alpha + beta - log_likelihood[:, None, None]
+
+
+def viterbi(log_initial, log_transition, log_emission, block=None):
+    """Most probable state sequence
+
+    :return: (path (batch, T) int, log_probability (batch,)) of the path jointly with the emissions
+    """
+    log_emission = np.asarray(log_emission, dtype=float)
+    batch, steps, k = log_emission.shape
+    delta, entry, pointers, block = _scan(np.asarray(log_initial), np.asarray(log_transition), log_emission, block,
+                                          viterbi=True)
+    rows = np.arange(batch)
+    path = np.empty((batch, steps), dtype=int)
+    path[:, -1] = np.argmax(delta[:, -1], axis=-1)
+    if steps == 1:
+        return path, delta[rows, 0, path[:, 0]]
+
+    # the state every block is entered from and left in, walking the blocks backwards
+    n_blocks = pointers.shape[1]
+    last = (steps - 2) % block  # step of the final state within the last block
+    exit_state = np.empty((batch, n_blocks), dtype=int)
+    entry_state = np.empty((batch, n_blocks), dtype=int)
+    exit_state[:, -1] = path[:, -1]
+    for b in range(n_blocks - 1, -1, -1):
+        step = 1 + b * block + (last if b == n_blocks - 1 else block - 1)
+        entry_state[:, b] = entry[rows, step - 1, exit_state[:, b]]
+        if b:
+            exit_state[:, b - 1] = entry_state[:, b]
+    path[:, 0] = entry_state[:, 0]
+
+    # backtrack inside all blocks at once
+    blocks = np.arange(n_blocks)
+    state = exit_state.copy()
+    local = np.empty((batch, n_blocks, block), dtype=int)
+    for step in range(block - 1, -1, -1):
+        if step == last:
+            state[:, -1] = exit_state[:, -1]
+        local[:, :, step] = state
+        state = pointers[rows[:, None], blocks, entry_state, step, state]
+    path[:, 1:] = local.reshape(batch, -1)[:, :steps - 1]
+    return path, delta[rows, -1, path[:, -1]]
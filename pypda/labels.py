@@ -0,0 +1,51 @@
+"""Beat labels kept as run-length encoded events, expanded to per-sample labels only on demand.
+
+An event table is a structured array of :data:`EVENT_DTYPE` rows ``(onset, offset, state, severity)`` in seconds,
+sorted and non-overlapping, with ``state`` 1 for abnormal beats.
+"""
+import numpy as np
+
+EVENT_DTYPE = np.dtype([("onset", "f8"), ("offset", "f8"), ("state", "i1"), ("severity", "i1")])
+
+
+def beat_events(boundaries: np.ndarray, state: np.ndarray, severity: np.ndarray, start=0.0, end=np.inf) -> np.ndarray:
+    """One event per run of consecutive beats with equal state and severity
+
+    Beat ``j`` spans ``[boundaries[j], boundaries[j + 1])``. Events are clipped to ``[start, end]`` and shifted so that
+    ``start`` becomes 0.
+
+    :param boundaries: (B + 1,) beat boundaries in seconds, increasing
+    :param state: (B,) normal state of every beat
+    :param severity: (B,) severity of every beat
+    """
+    state = np.asarray(state)
+    severity = np.asarray(severity)
+    first = np.flatnonzero(np.concatenate(([True], (state[1:] != state[:-1]) | (severity[1:] != severity[:-1]))))
+    events = np.empty(len(first), dtype=EVENT_DTYPE)
+    events["onset"] = boundaries[first]
+    events["offset"] = boundaries[np.append(first[1:], len(state))]
+    events["state"] = state[first]
+    events["severity"] = severity[first]
+    events = events[(events["offset"] > start) & (events["onset"] < end)]
+    events["onset"] = np.maximum(events["onset"], start) - start
+    events["offset"] = np.minimum(events["offset"], end) - start
+    return events
+
+
+def event_index(events: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """Index of the event covering each time in t, -1 before the first onset"""
+    return np.searchsorted(events["onset"], t, side="right") - 1
+
+
+def dense_labels(events: np.ndarray, t: np.ndarray, field=None) -> np.ndarray:
+    """Per-sample labels at times t
+
+    :param field: None for the boolean abnormal label, or "state" / "severity" for the integer values
+    :return: array shaped like t, False / 0 where no event covers a sample
+    """
+    values = events["state"] > 0 if field is None else events[field]
+    if not len(events):
+        return np.zeros(np.shape(t), dtype=values.dtype)
+    index = event_index(events, t)
+    covered = (index >= 0) & (t <= events["offset"][index])
+    return np.where(covered, values[index], values.dtype.type(0))
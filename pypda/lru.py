@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Bounded, thread-safe least-recently-used mapping with hit/miss/eviction counters
+
+    The bound is a number of entries and optionally a total of the values' ``nbytes``, values without it count as 0.
+    """
+
+    def __init__(self, maxsize=128, max_bytes=None):
+        """
+
+        :param maxsize: number of entries kept, None for unbounded
+        :param max_bytes: total nbytes of the values kept, None for unbounded. The most recent value is kept even if
+                          it alone exceeds this.
+        """
+        assert maxsize is None or maxsize > 0, f"maxsize={maxsize} must be positive or None (unbounded)"
+        assert max_bytes is None or max_bytes > 0, f"max_bytes={max_bytes} must be positive or None (unbounded)"
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, factory):
+        """Return the cached value for key, calling factory() to create it on a miss"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return value
+        value = factory()
+        with self._lock:
+            if key in self._data:  # created concurrently by another thread
+                self.bytes -= getattr(self._data[key], "nbytes", 0)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self.bytes += getattr(value, "nbytes", 0)
+            while len(self._data) > 1 and ((self.maxsize is not None and len(self._data) > self.maxsize) or
+                                           (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                self.bytes -= getattr(self._data.popitem(last=False)[1], "nbytes", 0)
+                self.evictions += 1
+        return value
+
+    def keys(self) -> list:
+        """Cached keys, least recently used first"""
+        with self._lock:
+            return list(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._data),
+                "maxsize": self.maxsize, "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({', '.join(f'{k}={v}' for k, v in self.info().items())})"
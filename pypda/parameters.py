@@ -2,12 +2,90 @@ import numpy as np
 
 
 class ParameterMeanScale:
+    """Mean and scale of one feature
+
+    Created standalone it owns its values; obtained from a :class:`PulseParameters` it reads and writes one element of
+    that object's mean/scale arrays.
+    """
+
     def __init__(self, mean=0.0, scale=1.0):
-        self.mean = mean
-        self.scale = scale
+        self._means = np.array([mean], dtype=float)
+        self._scales = np.array([scale], dtype=float)
+        self._index = 0
+
+    @classmethod
+    def view(cls, means: np.ndarray, scales: np.ndarray, index: int) -> "ParameterMeanScale":
+        p = cls.__new__(cls)
+        p._means, p._scales, p._index = means, scales, index
+        return p
+
+    @property
+    def mean(self) -> float:
+        return float(self._means[self._index])
+
+    @mean.setter
+    def mean(self, value):
+        self._means[self._index] = value
+
+    @property
+    def scale(self) -> float:
+        return float(self._scales[self._index])
+
+    @scale.setter
+    def scale(self, value):
+        self._scales[self._index] = value
+
+
+class ParameterGroup:
+    """Named slice of a PulseParameters, e.g. ``pulse_amplitudes``
+
+    Items are :class:`ParameterMeanScale` views, and ``mean``/``scale`` are writable views of the underlying arrays.
+    """
+
+    def __init__(self, means: np.ndarray, scales: np.ndarray, index: slice):
+        self._means = means
+        self._scales = scales
+        self._index = index
+
+    def __len__(self):
+        return self._index.stop - self._index.start
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(len(self))[item]]
+        i = range(self._index.start, self._index.stop)[item]
+        return ParameterMeanScale.view(self._means, self._scales, i)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self._means[self._index]
+
+    @mean.setter
+    def mean(self, value):
+        self._means[self._index] = value
+
+    @property
+    def scale(self) -> np.ndarray:
+        return self._scales[self._index]
+
+    @scale.setter
+    def scale(self, value):
+        self._scales[self._index] = value
 
 
 class PulseParameters:
+    """Means and scales of the per-beat features, stored as two contiguous arrays
+
+    ``beat_length`` and ``diastolic_baseline`` are :class:`ParameterMeanScale` views, the per-component features
+    (``pulse_amplitudes``, ``delta_time``, ...) are :class:`ParameterGroup` views. ``slices`` maps every name to its
+    position in the arrays.
+    """
+    SCALARS = ("beat_length", "diastolic_baseline")
+    GROUPS = ("pulse_amplitudes", "delta_time", "triangle_m", "gaussian_m", "gaussian_std")
+
     def __init__(self, beat_length=100,
                  diastolic_baseline=80,
                  pulse_amplitudes=(8, 3, 4, 2, 1),
@@ -15,57 +93,123 @@ class PulseParameters:
                  triangle_m=(20, 20, 20, 20, 20),
                  gaussian_m=(16, 16, 16, 16, 16),
                  gaussian_std=(2, 2, 2, 2, 2)):
-        self.beat_length = ParameterMeanScale(beat_length, 10)
-        self.diastolic_baseline = ParameterMeanScale(diastolic_baseline, 5)
-        self.pulse_amplitudes = [ParameterMeanScale(p, 0.2) for p in pulse_amplitudes]
-        self.delta_time = [ParameterMeanScale(p, 0.2) for p in delta_time]
-        self.triangle_m = [ParameterMeanScale(p, 0.2) for p in triangle_m]
-        self.gaussian_m = [ParameterMeanScale(p, 0.2) for p in gaussian_m]
-        self.gaussian_std = [ParameterMeanScale(p, 0.2) for p in gaussian_std]
+        means = [(beat_length,), (diastolic_baseline,), pulse_amplitudes, delta_time, triangle_m, gaussian_m,
+                 gaussian_std]
+        scales = [(10,), (5,)] + [(0.2,) * len(m) for m in means[2:]]
+        self._mean = np.concatenate(means).astype(float)
+        self._scale = np.concatenate(scales).astype(float)
+
+        self.slices = {}
+        start = 0
+        for name, m in zip(self.SCALARS + self.GROUPS, means):
+            self.slices[name] = slice(start, start + len(m))
+            start += len(m)
+        self._features = [ParameterMeanScale.view(self._mean, self._scale, i) for i in range(len(self._mean))]
 
     def __len__(self):
-        return len(self.features)
+        return len(self._mean)
+
+    def _group(self, name) -> ParameterGroup:
+        return ParameterGroup(self._mean, self._scale, self.slices[name])
+
+    def _assign(self, name, value):
+        group = self._group(name)
+        assert len(value) == len(group), f"{name} must have length {len(group)}"
+        for target, source in zip(group, value):
+            target.mean, target.scale = source.mean, source.scale
 
     @property
-    def features(self):
-        _features = [self.beat_length, self.diastolic_baseline]
-        _features.extend(self.pulse_amplitudes)
-        _features.extend(self.delta_time)
-        _features.extend(self.triangle_m)
-        _features.extend(self.gaussian_m)
-        _features.extend(self.gaussian_std)
+    def beat_length(self) -> ParameterMeanScale:
+        return self._features[self.slices["beat_length"].start]
+
+    @beat_length.setter
+    def beat_length(self, value: ParameterMeanScale):
+        self._assign("beat_length", [value])
+
+    @property
+    def diastolic_baseline(self) -> ParameterMeanScale:
+        return self._features[self.slices["diastolic_baseline"].start]
+
+    @diastolic_baseline.setter
+    def diastolic_baseline(self, value: ParameterMeanScale):
+        self._assign("diastolic_baseline", [value])
+
+    @property
+    def pulse_amplitudes(self) -> ParameterGroup:
+        return self._group("pulse_amplitudes")
+
+    @pulse_amplitudes.setter
+    def pulse_amplitudes(self, value):
+        self._assign("pulse_amplitudes", value)
+
+    @property
+    def delta_time(self) -> ParameterGroup:
+        return self._group("delta_time")
 
-        return _features
+    @delta_time.setter
+    def delta_time(self, value):
+        self._assign("delta_time", value)
+
+    @property
+    def triangle_m(self) -> ParameterGroup:
+        return self._group("triangle_m")
+
+    @triangle_m.setter
+    def triangle_m(self, value):
+        self._assign("triangle_m", value)
+
+    @property
+    def gaussian_m(self) -> ParameterGroup:
+        return self._group("gaussian_m")
+
+    @gaussian_m.setter
+    def gaussian_m(self, value):
+        self._assign("gaussian_m", value)
+
+    @property
+    def gaussian_std(self) -> ParameterGroup:
+        return self._group("gaussian_std")
+
+    @gaussian_std.setter
+    def gaussian_std(self, value):
+        self._assign("gaussian_std", value)
+
+    @property
+    def features(self):
+        return list(self._features)
 
     @property
     def scale(self) -> np.ndarray:
-        return np.array(list(map(lambda x: getattr(x, "scale"), self.features)))
+        """Copy of the scales, assign to the property to change them"""
+        return self._scale.copy()
 
     @scale.setter
     def scale(self, value):
         assert len(value) == len(self), f"{value} must have length = {self.__len__()}"
-        for i, v in enumerate(value):
-            self.features[i].scale = v
+        self._scale[:] = value
 
     @property
     def mean(self) -> np.ndarray:
-        return np.array(list(map(lambda x: getattr(x, "mean"), self.features)))
+        """Copy of the means, assign to the property to change them"""
+        return self._mean.copy()
 
     @mean.setter
     def mean(self, value):
         assert len(value) == len(self), f"{value} must have length = {self.__len__()}"
-        for i, v in enumerate(value):
-            self.features[i].mean = v
+        self._mean[:] = value
+
+    def denormalize(self, z: np.ndarray, mean: np.ndarray = None) -> np.ndarray:
+        """Map standard normal draws of shape (..., len(self)) to features: ``z * scale + mean``
+
+        :param mean: means to use instead of this object's
+        """
+        return np.asarray(z) * self._scale + (self._mean if mean is None else mean)
 
     @property
     def feature_names(self):
-        _feature_names = ["beat_length", "diastolic_baseline"]
-
-        _feature_names.extend([f"pulse_amplitudes[{i}]" for i in range(len(self.pulse_amplitudes))])
-        _feature_names.extend([f"delta_time[{i}]" for i in range(len(self.delta_time))])
-        _feature_names.extend([f"triangle_m[{i}]" for i in range(len(self.triangle_m))])
-        _feature_names.extend([f"gaussian_m[{i}]" for i in range(len(self.gaussian_m))])
-        _feature_names.extend([f"gaussian_std[{i}]" for i in range(len(self.gaussian_std))])
+        _feature_names = list(self.SCALARS)
+        for name in self.GROUPS:
+            _feature_names.extend([f"{name}[{i}]" for i in range(len(self._group(name)))])
         return _feature_names
 
     def __repr__(self):
@@ -76,10 +220,9 @@ class PulseParameters:
 
 
 class PulseWaveParameters:
-    def __init__(self, normal: "PulseParameters" = PulseParameters(),
-                 abnormal: "PulseParameters" = PulseParameters()):
-        self.normal = normal
-        self.abnormal = abnormal
+    def __init__(self, normal: "PulseParameters" = None, abnormal: "PulseParameters" = None):
+        self.normal = PulseParameters() if normal is None else normal
+        self.abnormal = PulseParameters() if abnormal is None else abnormal
 
         assert len(self.normal) == len(self.abnormal), \
             f"#parameters for normal={len(self.normal)} must be equal to #parameters for abnormal={len(self.abnormal)}"
@@ -0,0 +1,209 @@
+"""Worker processes generating records into a shared-memory ring buffer, consumed as zero-copy numpy views.
+
+The ring has ``depth`` slots of ``batch_size`` records each. Every slot has an ``empty`` and a ``full`` semaphore: a
+producer claims the next write position, waits for that slot to be empty, copies its batch in and marks it full; the
+consumer takes positions in order, waits for the slot to be full and hands out views of it until the lease is
+released. Only the batch copy into the slot crosses the process boundary, nothing is pickled.
+"""
+import multiprocessing
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+ALIGNMENT = 64
+_STATS = 3  # per worker: batches, synthesis seconds, stall seconds
+
+
+def _layout(batch_size: int, samples: int):
+    """Offsets of x, y and t within a slot and the slot size, every array 64 byte aligned"""
+    layout, offset = {}, 0
+    for name, dtype in (("x", np.dtype("f8")), ("y", np.dtype(bool)), ("t", np.dtype("f8"))):
+        layout[name] = (offset, dtype)
+        offset += -(-batch_size * samples * dtype.itemsize // ALIGNMENT) * ALIGNMENT
+    return layout, offset
+
+
+def _slot(buf, layout, slot_bytes, slot, shape):
+    return {name: np.ndarray(shape, dtype=dtype, buffer=buf, offset=slot * slot_bytes + offset)
+            for name, (offset, dtype) in layout.items()}
+
+
+def _produce(wave, worker, seed_sequence, name, batch_size, depth, lock, write_position, empty, full, stop, stats):
+    wave.rng = seed_sequence
+    samples = int(wave.length * wave.sampling_rate)
+    layout, slot_bytes = _layout(batch_size, samples)
+    shm = SharedMemory(name=name)
+    stat = np.frombuffer(stats.get_obj(), dtype="f8").reshape(-1, _STATS)[worker]
+    try:
+        while not stop.is_set():
+            tic = time.perf_counter()
+            x, y, t = wave.sample_batch(batch_size)
+            stat[1] += time.perf_counter() - tic
+            with lock:
+                position = write_position.value
+                write_position.value += 1
+            slot = position % depth
+            tic = time.perf_counter()
+            while not empty[slot].acquire(timeout=0.1):
+                stat[2] += time.perf_counter() - tic  # count a stall while it lasts
+                tic = time.perf_counter()
+                if stop.is_set():
+                    return
+            stat[2] += time.perf_counter() - tic
+            arrays = _slot(shm.buf, layout, slot_bytes, slot, (batch_size, samples))
+            arrays["x"][:], arrays["y"][:], arrays["t"][:] = x, y, t
+            del arrays
+            full[slot].release()
+            stat[0] += 1
+    finally:
+        shm.close()
+
+
+class Batch:
+    """Lease on one ring slot: x, y, t of shape (batch_size, samples) are views valid until :meth:`release`"""
+
+    def __init__(self, pool, slot, arrays):
+        self._pool = pool
+        self.slot = slot
+        self.x, self.y, self.t = arrays["x"], arrays["y"], arrays["t"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.t))
+
+    def release(self):
+        """Hand the slot back to the producers"""
+        if self._pool is not None:
+            self.x = self.y = self.t = None
+            self._pool._release(self.slot)
+            self._pool = None
+
+
+class ProducerPool:
+    """Generate batches of records in worker processes into a shared-memory ring buffer
+
+    Worker ``i`` seeds its RNG from ``SeedSequence(seed).spawn(workers)[i]``, so each worker's stream is reproducible;
+    the order in which workers' batches arrive is not. ``pool.get()`` returns a :class:`Batch` lease, iterating the
+    pool yields ``(x, y, t)`` views and releases each batch when the next one is requested::
+
+        with ProducerPool(wave, workers=4, batch_size=64) as pool:
+            for x, y, t in islice(pool, 1000):
+                train_step(x, y)
+    """
+
+    def __init__(self, wave, workers=2, batch_size=32, depth=8, seed=0, context=None):
+        """
+
+        :param wave: PulseWave generating the records, sent to every worker
+        :param workers: number of producer processes
+        :param batch_size: records per slot
+        :param depth: number of slots, how many batches producers can run ahead of the consumer
+        :param seed: root seed of the per-worker seeds
+        :param context: multiprocessing context or start method name, None for the default one
+        """
+        self.workers = workers
+        self.batch_size = batch_size
+        self.depth = depth
+        self.samples = int(wave.length * wave.sampling_rate)
+        self._layout, self._slot_bytes = _layout(batch_size, self.samples)
+        self._shm = SharedMemory(create=True, size=depth * self._slot_bytes)
+
+        context = context if hasattr(context, "Process") else multiprocessing.get_context(context)
+        self._lock = context.Lock()
+        self._write_position = context.RawValue("q", 0)
+        self._empty = [context.Semaphore(1) for _ in range(depth)]
+        self._full = [context.Semaphore(0) for _ in range(depth)]
+        self._stop = context.Event()
+        self._stats = context.Array("d", workers * _STATS)
+        self._read_position = 0
+        self.consumed = 0
+        self.consumer_stall = 0.0
+        self._started = time.perf_counter()
+
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        self._processes = [context.Process(target=_produce, daemon=True,
+                                           args=(wave, i, seeds[i], self._shm.name, batch_size, depth, self._lock,
+                                                 self._write_position, self._empty, self._full, self._stop,
+                                                 self._stats))
+                           for i in range(workers)]
+        try:
+            for p in self._processes:
+                p.start()
+        except BaseException:  # e.g. wave cannot be pickled for a spawned process
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, timeout=None) -> Batch:
+        """Lease the next batch, waiting for the producers if none is ready
+
+        :param timeout: seconds to wait before raising TimeoutError, None waits as long as producers are alive
+        """
+        slot = self._read_position % self.depth
+        tic = time.perf_counter()
+        while not self._full[slot].acquire(timeout=0.1):
+            waited = time.perf_counter() - tic
+            if not any(p.is_alive() for p in self._processes):
+                raise RuntimeError("all producer processes have exited")
+            if timeout is not None and waited > timeout:
+                self.consumer_stall += waited
+                raise TimeoutError(f"no batch ready after {waited:.1f} s")
+        self.consumer_stall += time.perf_counter() - tic
+        self._read_position += 1
+        self.consumed += 1
+        return Batch(self, slot, _slot(self._shm.buf, self._layout, self._slot_bytes, slot,
+                                       (self.batch_size, self.samples)))
+
+    def _release(self, slot):
+        self._empty[slot].release()
+
+    def __iter__(self):
+        while True:
+            batch = self.get()
+            try:
+                yield batch.x, batch.y, batch.t
+            finally:
+                batch.release()
+
+    def metrics(self) -> dict:
+        """Throughput and stalls so far
+
+        ``producer_stall`` is the time workers spent waiting for a free slot (the consumer is the bottleneck),
+        ``consumer_stall`` the time :meth:`get` spent waiting for a full one (synthesis is the bottleneck).
+        """
+        stats = np.frombuffer(self._stats.get_obj(), dtype="f8").reshape(-1, _STATS)
+        elapsed = time.perf_counter() - self._started
+        return {"batches_produced": int(stats[:, 0].sum()),
+                "batches_consumed": self.consumed,
+                "records_per_second": self.consumed * self.batch_size / elapsed,
+                "synthesis_seconds": float(stats[:, 1].sum()),
+                "producer_stall": float(stats[:, 2].sum()),
+                "consumer_stall": self.consumer_stall}
+
+    def close(self):
+        """Stop the workers and free the shared memory, outstanding batches must not be used afterwards"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        for p in self._processes:
+            if p.pid is None:  # never started
+                continue
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        try:
+            self._shm.close()
+        except BufferError:  # views still referenced, the mapping goes away with them
+            pass
+        self._shm.unlink()
@@ -4,7 +4,8 @@ from typing import Tuple
 
 import numpy as np
 
-from pypda.wavelets import Waveform, TriangGaussian
+from pypda.resampling import resample_cache
+from pypda.wavelets import Waveform, TriangGaussian, overlap_add
 
 
 class PulseModelRaw(Waveform):
@@ -24,9 +25,8 @@ class PulseModelRaw(Waveform):
         deque(map(lambda w, delta: w.shift(delta), self.wavelets[1:], itertools.accumulate(delta_time)))
 
     @property
-    def waveform(self) -> np.ndarray:
-        from scipy import signal
+    def data(self) -> np.ndarray:
         if self._waveform is None:
-            self._waveform = sum(self.wavelets).waveform + self.baseline
-            self._waveform = signal.resample(self._waveform, self.samples)
+            self._waveform = overlap_add(self.wavelets, start=0).data + self.baseline
+            self._waveform = resample_cache.resample(self._waveform, self.samples)
         return self._waveform
@@ -2,13 +2,15 @@ from collections import deque
 from itertools import accumulate
 
 import numpy as np
-from scipy.interpolate import interp1d
-from scipy.signal import cheby2, sosfiltfilt
 
-from pypda.hmm import HMM
+from pypda.hmm import HMM, BeatParameters
+from pypda.labels import beat_events, dense_labels
 from pypda.parameters import PulseWaveParameters
+from pypda.profiling import stage
 from pypda.pulse_model import PulseModelRaw
-from pypda.wavelets import ArbitraryWaveform
+from pypda.stream import PulseStream
+from pypda.synthesis import render_direct, render_trains, resample_beats
+from pypda.wavelets import KernelCache, overlap_add
 
 
 class PulseWave:
@@ -20,39 +22,232 @@ class PulseWave:
     def beat_period(self):
         return 1 / (self.bpm / 60)  # in seconds
 
-    def __init__(self, parameters: "PulseWaveParameters", bpm=65, length=10, sampling_rate=90):
+    ENGINES = ("object", "direct", "fft")
+
+    def __init__(self, parameters: "PulseWaveParameters", bpm=65, length=10, sampling_rate=90, engine="object",
+                 rng=None, std_decimals=None, cache=None):
+        """
+
+        :param parameters:
+        :param bpm:
+        :param length: in seconds
+        :param sampling_rate: in Hz
+        :param engine: "object" builds PulseModelRaw beats, resamples them and cubic-interpolates the record,
+                       "direct" evaluates the beats on the output time grid with band-limited interpolation,
+                       "fft" renders the beats as impulse trains convolved with shared kernels, then as "object";
+                       it is slower than "object", see :func:`pypda.synthesis.render_trains`
+        :param rng: seed or np.random.Generator of all draws, None draws from the global numpy RNG, see :mod:`pypda.rng`
+        :param std_decimals: "fft" engine only, round gaussian_std to this many decimals so that more wavelets share a
+                             kernel, None keeps it exact
+        :param cache: optional :class:`pypda.disk_cache.DiskCache` of :meth:`sample` results
+        """
+        assert engine in self.ENGINES, f"engine={engine} must be one of {self.ENGINES}"
         self.bpm = bpm
         self.length = length
         self.sampling_rate = sampling_rate
+        self.engine = engine
+        self.kernels = KernelCache(maxsize=4096, std_decimals=std_decimals) if engine == "fft" else None
+        self.cache = cache
         self.CUTOFF = 20
         self.STOP_ATTEN = 20
 
-        self.hmm = HMM(time_steps=self.beats, parameters=parameters)
+        self.hmm = HMM(time_steps=self.beats, parameters=parameters, rng=rng)
+
+    @property
+    def rng(self):
+        return self.hmm.rng
+
+    @rng.setter
+    def rng(self, rng):
+        self.hmm.rng = rng
+
+    LABELS = ("dense", "events")
 
-    def sample(self):
-        state, parameters = self.hmm.sample()
-        wave = [PulseModelRaw(**p) for s, p in zip(state, parameters)]
+    def _events(self, samples: np.ndarray, state: np.ndarray, severity: np.ndarray, t_start: float) -> np.ndarray:
+        """Event table of one record, see :mod:`pypda.labels`
 
-        indicator = [ArbitraryWaveform(waveform=s * np.ones_like(w.waveform)) for s, w in zip(state, wave)]
-        shift = list(accumulate(map(len, wave[:-1])))
+        The resampled record spans ``beats * beat_period`` seconds and beat ``j`` owns resampled samples
+        ``starts[j] - 0.5 ... starts[j + 1] - 0.5``, the boundary thresholding the interpolated indicator used to give.
+        """
+        starts = np.concatenate(([0], np.cumsum(samples)))
+        boundaries = (starts - 0.5) * (self.beats * self.beat_period) / (starts[-1] - 1)
+        return beat_events(boundaries, state, severity, start=t_start, end=t_start + self.length)
 
-        deque(map(lambda xx, delta: xx.shift(delta), wave[1:], shift))
-        deque(map(lambda xx, delta: xx.shift(delta), indicator[1:], shift))
+    def sample(self, labels="dense"):
+        """Sample one record
 
-        x = sum(wave).waveform
-        t_raw = np.linspace(0, self.beats * self.beat_period, len(x))
+        :param labels: "dense" for a boolean abnormal label per sample, "events" for the run-length encoded event
+                       table of :mod:`pypda.labels`
+        :return: x, y, t where y depends on labels
+        """
+        assert labels in self.LABELS, f"labels={labels} must be one of {self.LABELS}"
+        if self.cache is None:
+            return self._sample(labels)
+        return self._cached_sample(labels)
 
-        fx = interp1d(t_raw, x, kind="cubic")
-        t_start = np.random.random() * (max(t_raw) - self.length)
-        t = np.linspace(t_start, self.length + t_start, int(self.length * self.sampling_rate))
+    def _cached_sample(self, labels):
+        """:meth:`sample` through the disk cache
 
-        x = fx(t)
-        sos = cheby2(2, self.STOP_ATTEN, self.CUTOFF / (self.sampling_rate / 2), output="sos")
-        x = sosfiltfilt(sos, x)
+        The key covers everything the record depends on, including the RNG state before sampling, and the entry stores
+        the RNG state after it. A hit restores that state, so a sequence of cached calls draws the same records an
+        uncached one would.
+        """
+        import json
+        from pypda.rng import get_state, set_state
+        hmm, p = self.hmm, self.hmm.p
+        std_decimals = None if self.kernels is None else self.kernels.std_decimals
+        key = self.cache.key("PulseWave.sample", labels, p.normal.mean, p.normal.scale, p.abnormal.mean,
+                             p.abnormal.scale, hmm.initial_distribution, hmm.transition_matrix, self.bpm, self.length,
+                             self.sampling_rate, self.engine, std_decimals, self.CUTOFF, self.STOP_ATTEN,
+                             get_state(self.rng))
 
-        y = sum(indicator).waveform
-        fy = interp1d(t_raw, y, kind="cubic")
-        y = fy(t) > 0.5
+        def sample():
+            return self._sample(labels) + (np.array(json.dumps(get_state(self.rng))),)
+
+        x, y, t, state = self.cache.get(key, sample)
+        set_state(self.rng, json.loads(str(state)))
+        return x, y, t
+
+    def _sample(self, labels):
+        from scipy.interpolate import interp1d
+        from scipy.signal import cheby2, sosfiltfilt
+        if self.engine != "object":
+            x, y, t = self.sample_batch(1, labels=labels)
+            return x[0], y[0], t[0]
+        with stage("hmm"):
+            state, severity = self.hmm.sample_states()
+            p = BeatParameters.from_features(self.hmm.sample_features(state, severity)).reshape(-1)
+            state, severity = state[0], severity[0]
+        with stage("beats"):
+            wave = [PulseModelRaw(*beat) for beat in zip(*(getattr(p, k) for k in BeatParameters.FIELDS))]
+
+        with stage("assemble"):
+            shift = list(accumulate(map(len, wave[:-1])))
+            deque(map(lambda xx, delta: xx.shift(delta), wave[1:], shift))
+            x = overlap_add(wave, start=0).data
+
+        with stage("interpolate"):
+            t_raw = np.linspace(0, self.beats * self.beat_period, len(x))
+            fx = interp1d(t_raw, x, kind="cubic")
+            t_start = self.rng.random() * (max(t_raw) - self.length)
+            t = np.linspace(t_start, self.length + t_start, int(self.length * self.sampling_rate))
+            x = fx(t)
+
+        with stage("filter"):
+            sos = cheby2(2, self.STOP_ATTEN, self.CUTOFF / (self.sampling_rate / 2), output="sos")
+            x = sosfiltfilt(sos, x)
 
         t = t - min(t)
+        with stage("labels"):
+            y = self._events(p.samples, state, severity, t_start)
+            if labels == "dense":
+                y = dense_labels(y, t)
         return x, y, t
+
+    def sample_batch(self, n=1, labels="dense", threads=None):
+        """Sample n records at once
+
+        All HMM chains are sampled together, beats of all records are synthesized as one stacked block and the
+        anti-aliasing filter runs on the (n, length * sampling_rate) array. With the "object" engine the beats are
+        resampled in groups and each record is cubic-interpolated; the "direct" engine evaluates every output sample
+        straight from the raw beats with a windowed-sinc table, skipping both steps. The "fft" engine only differs from
+        "object" in how the raw beats are synthesized, see :func:`pypda.synthesis.render_trains`.
+
+        With threads, all random draws still happen up front in the calling thread and only the deterministic
+        rendering is split into groups of records rendered concurrently. The result matches threads=None up to
+        floating point rounding, and the FFTs, matrix products and filters of different groups overlap wherever numpy
+        and scipy release the GIL. An active :class:`pypda.profiling.Profiler` records the threaded rendering as one
+        "render" stage.
+
+        :param n: number of records
+        :param labels: "dense" or "events", see :meth:`sample`
+        :param threads: number of threads rendering groups of records, None renders in the calling thread
+        :return: x, t of shape (n, int(length * sampling_rate)) and y, either of that shape or a list of n event tables
+        """
+        state, severity, p, t_start = self.draw(n)
+        if threads is None or threads < 2 or n < 2:
+            return self.render(state, severity, p, t_start, labels=labels)
+
+        from concurrent.futures import ThreadPoolExecutor
+        groups = np.array_split(np.arange(n), min(threads, n))
+
+        def render(g):
+            beats = p[g[0] * self.beats:(g[-1] + 1) * self.beats]
+            return self.render(state[g], severity[g], beats, t_start[g], labels=labels)
+
+        with stage("render"), ThreadPoolExecutor(max_workers=len(groups)) as pool:  # worker stages are not profiled
+            parts = list(pool.map(render, groups))
+        x, y, t = zip(*parts)
+        y = np.concatenate(y) if labels == "dense" else [e for events in y for e in events]
+        return np.concatenate(x), y, np.concatenate(t)
+
+    def draw(self, n=1):
+        """Draw the random part of n records: HMM states, beat parameters and start times
+
+        :return: (state, severity, p, t_start) as taken by :meth:`render`
+        """
+        with stage("hmm"):
+            state, severity = self.hmm.sample_states(n_chains=n)
+            p = BeatParameters.from_features(self.hmm.sample_features(state, severity)).reshape(-1)
+        t_start = self.rng.random(n) * (self.beats * self.beat_period - self.length)
+        return state, severity, p, t_start
+
+    def render(self, state: np.ndarray, severity: np.ndarray, p: "BeatParameters", t_start: np.ndarray,
+               labels="dense"):
+        """Synthesize records from drawn beats, the deterministic part of :meth:`sample_batch`
+
+        :param state: (n, beats) normal states
+        :param severity: (n, beats) severities
+        :param p: parameters of the n * beats beats, record after record
+        :param t_start: (n,) start of every record within its beats in seconds
+        :param labels: "dense" or "events", see :meth:`sample`
+        """
+        from scipy.interpolate import interp1d
+        from scipy.signal import cheby2, sosfiltfilt
+        assert labels in self.LABELS, f"labels={labels} must be one of {self.LABELS}"
+        n = len(state)
+        with stage("beats"):
+            if self.engine == "fft":
+                raw, raw_length = render_trains(p.baseline, p.pulse_amplitudes, p.delta_time, p.triangle_m,
+                                                p.gaussian_m, p.gaussian_std, self.kernels)
+            else:
+                raw, raw_length = p.render()
+        bounds = np.concatenate(([0], np.cumsum(p.samples.reshape(n, self.beats).sum(axis=1))))
+        samples = int(self.length * self.sampling_rate)
+        duration = self.beats * self.beat_period
+
+        t_start = np.asarray(t_start, dtype=float).reshape(n, 1)
+        t = t_start + np.linspace(0, self.length, samples)[None, :]
+        if self.engine == "direct":
+            with stage("render"):
+                position = bounds[:-1, None] + t / duration * (np.diff(bounds)[:, None] - 1)
+                x = render_direct(raw, raw_length, p.samples, position.ravel()).reshape(n, samples)
+        else:
+            with stage("resample"):
+                flat = resample_beats(raw, raw_length, p.samples)
+            with stage("interpolate"):
+                x = np.empty((n, samples))
+                for i in range(n):
+                    t_raw = np.linspace(0, duration, bounds[i + 1] - bounds[i])
+                    x[i] = interp1d(t_raw, flat[bounds[i]:bounds[i + 1]], kind="cubic")(t[i])
+
+        with stage("filter"):
+            sos = cheby2(2, self.STOP_ATTEN, self.CUTOFF / (self.sampling_rate / 2), output="sos")
+            x = sosfiltfilt(sos, x, axis=-1)
+
+        t = t - t.min(axis=1, keepdims=True)
+        with stage("labels"):
+            y = [self._events(b, s, k, ts) for b, s, k, ts in
+                 zip(p.samples.reshape(n, self.beats), state, severity, t_start[:, 0])]
+            if labels == "dense":
+                y = np.stack([dense_labels(e, ti) for e, ti in zip(y, t)])
+        return x, y, t
+
+    def stream(self, chunk_seconds=1.0):
+        """Generate an endless waveform in chunks of chunk_seconds, see :class:`pypda.stream.PulseStream`
+
+        :param chunk_seconds: length of each chunk in seconds
+        :return: generator of (x, y, t) chunks, t continuing across chunks
+        """
+        for x, y, t in PulseStream(self, chunk_seconds=chunk_seconds):
+            yield x[0], y[0], t
@@ -0,0 +1,49 @@
+import numpy as np
+
+from pypda.lru import LRUCache
+
+
+class ResampleCache(LRUCache):
+    """Dense ``scipy.signal.resample`` operators keyed by (source_length, target_length)
+
+    ``signal.resample`` is linear, so resampling from n to m samples equals multiplying by the (m, n) matrix obtained by
+    resampling the identity. Beat lengths come from a narrow integer distribution, so a handful of matrices serve a
+    whole record and many beats of the same lengths resample in one matmul. Lengths above max_dense fall back to the
+    FFT without caching.
+
+    A matrix takes 8 * source_length * target_length bytes, up to 8 MB at max_dense=1024, so the cache is bounded by
+    max_bytes rather than by its number of entries. Typical beats of 50 to 100 samples take 20 to 80 kB each.
+    """
+
+    def __init__(self, maxsize=None, max_dense=1024, max_bytes=64 << 20):
+        """
+
+        :param maxsize: number of matrices kept, None for only bounding their bytes
+        :param max_dense: longest source or target length resampled with a cached matrix
+        :param max_bytes: total size of the matrices kept, None for unbounded
+        """
+        super().__init__(maxsize=maxsize, max_bytes=max_bytes)
+        self.max_dense = max_dense
+
+    def operator(self, source_length, target_length) -> np.ndarray:
+        """Read-only (target_length, source_length) resampling matrix"""
+        key = int(source_length), int(target_length)
+        return self.get(key, lambda: self._make_operator(*key))
+
+    @staticmethod
+    def _make_operator(source_length, target_length):
+        from scipy import signal
+        operator = signal.resample(np.eye(source_length), target_length, axis=0)
+        operator.setflags(write=False)
+        return operator
+
+    def resample(self, x: np.ndarray, target_length) -> np.ndarray:
+        """Resample x along its last axis to target_length samples"""
+        source_length = x.shape[-1]
+        if max(source_length, target_length) > self.max_dense:
+            from scipy import signal
+            return signal.resample(x, target_length, axis=-1)
+        return x @ self.operator(source_length, target_length).T
+
+
+resample_cache = ResampleCache()
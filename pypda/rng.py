@@ -0,0 +1,54 @@
+"""Random number generator arguments
+
+Every class drawing random numbers takes ``rng``: None keeps drawing from numpy's global RNG, so ``np.random.seed``
+applies as it always did, anything else goes through ``np.random.default_rng``, i.e. a seed or ``SeedSequence`` makes
+a new ``Generator`` and a ``Generator`` is used as is. Instances with their own Generators can run in concurrent
+threads and stay reproducible.
+"""
+import numpy as np
+
+
+class _GlobalRNG:
+    """Draws from numpy's global RNG, unlike the ``np.random`` module it stands for it can be pickled"""
+
+    def random(self, *args, **kwargs):
+        return np.random.random(*args, **kwargs)
+
+    def standard_normal(self, *args, **kwargs):
+        return np.random.standard_normal(*args, **kwargs)
+
+    def __reduce__(self):
+        return "GLOBAL"  # unpickles to the module attribute, so identity checks keep working
+
+    def __repr__(self):
+        return "pypda.rng.GLOBAL"
+
+
+GLOBAL = _GlobalRNG()
+
+
+def generator(rng=None):
+    """:data:`GLOBAL`, drawing from numpy's global RNG, for None, else ``np.random.default_rng(rng)``
+
+    Only ``random`` and ``standard_normal``, which both provide, are used on the result.
+    """
+    if rng is None or rng is np.random or rng is GLOBAL:
+        return GLOBAL
+    return np.random.default_rng(rng)
+
+
+def get_state(rng) -> dict:
+    """JSON serializable state of a :func:`generator` result, restored by :func:`set_state`"""
+    if rng is GLOBAL:
+        state = np.random.get_state(legacy=False)
+        state["state"]["key"] = state["state"]["key"].tolist()
+        return state
+    return rng.bit_generator.state
+
+
+def set_state(rng, state: dict):
+    if rng is GLOBAL:
+        state = dict(state, state=dict(state["state"], key=np.asarray(state["state"]["key"], dtype=np.uint32)))
+        np.random.set_state(state)
+    else:
+        rng.bit_generator.state = state
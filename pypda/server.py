@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import time
+
+import numpy as np
+
+from pypda.stream import PulseStream
+
+logger = logging.getLogger("pypda")
+
+
+class _Client:
+    """Bounded queue of frames waiting to be written to one connection"""
+
+    def __init__(self, channels: np.ndarray, queue_chunks: int):
+        self.channels = channels
+        self.queue = asyncio.Queue(queue_chunks)
+        self.frames = 0
+        self.dropped = 0
+        self.closed = asyncio.Event()
+
+    def offer(self, frame):
+        """Queue a frame without blocking the producer, dropping the oldest one if the client fell behind"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+
+class PulseServer:
+    """Serve many independent pulse waveform channels over TCP in real time
+
+    One :class:`PulseStream` synthesizes all channels chunk by chunk in a worker thread and every chunk is published
+    once its last sample is due. A client sends one line naming the channels it wants (comma separated indices, empty
+    for all), receives a JSON header line and then one frame per chunk: little-endian float32 rows of
+    ``(t, x[c] for c in channels, y[c] for c in channels)``.
+
+    Each client has a queue of at most ``queue_chunks`` frames and writes honor TCP flow control, so a slow client
+    loses its oldest frames instead of stalling synthesis or growing memory.
+    """
+
+    def __init__(self, wave, n_channels=100, chunk_seconds=1.0, host="127.0.0.1", port=0, queue_chunks=8,
+                 realtime=True):
+        """
+
+        :param wave: PulseWave providing the HMM, bpm, sampling rate and filter settings
+        :param n_channels: number of independent patient channels
+        :param chunk_seconds: length of each chunk in seconds
+        :param host:
+        :param port: TCP port, 0 picks a free one, see :attr:`port` after :meth:`start`
+        :param queue_chunks: frames buffered per client before the oldest is dropped
+        :param realtime: publish chunks at the sampling rate, otherwise as fast as they are synthesized
+        """
+        self.stream = PulseStream(wave, chunk_seconds=chunk_seconds, n_channels=n_channels)
+        self.n_channels = n_channels
+        self.chunk_seconds = chunk_seconds
+        self.host = host
+        self.port = port
+        self.queue_chunks = queue_chunks
+        self.realtime = realtime
+        self.clients = set()
+
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.synthesis_seconds = 0.0
+        self.dropped = 0  # frames dropped by clients that have disconnected
+        self._started = None
+        self._server = None
+        self._producer = None
+
+    @property
+    def header(self) -> dict:
+        return {"sampling_rate": self.stream.wave.sampling_rate, "chunk_samples": self.stream.chunk_samples,
+                "n_channels": self.n_channels, "dtype": "<f4"}
+
+    def metrics(self) -> dict:
+        """Throughput and health of the server
+
+        ``load`` is synthesis time per second of waveform (above 1 the server cannot keep up), ``lag`` is how late the
+        last chunk was published relative to its due time.
+        """
+        elapsed = time.perf_counter() - self._started if self._started is not None else 0.0
+        streamed = self.stream.chunks * self.chunk_seconds
+        samples = self.stream.chunks * self.stream.chunk_samples * self.n_channels
+        return {"chunks": self.stream.chunks,
+                "clients": len(self.clients),
+                "samples_per_second": samples / elapsed if elapsed else 0.0,
+                "load": self.synthesis_seconds / streamed if streamed else 0.0,
+                "lag": self.lag,
+                "max_lag": self.max_lag,
+                "dropped": self.dropped + sum(c.dropped for c in self.clients)}
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._started = time.perf_counter()
+        self._producer = asyncio.ensure_future(self._produce())
+        logger.debug(f"serving {self.n_channels} channels on {self.host}:{self.port}")
+
+    async def close(self, timeout=1.0):
+        """Stop producing, let clients flush their queues for up to timeout seconds and stop listening"""
+        self._producer.cancel()
+        self._server.close()
+        clients = list(self.clients)
+        for client in clients:
+            client.offer(None)
+        if clients:
+            await asyncio.wait([asyncio.ensure_future(c.closed.wait()) for c in clients], timeout=timeout)
+        await self._server.wait_closed()
+
+    async def run(self, duration=None, report=None, report_seconds=5.0):
+        """Start, serve for duration seconds (forever if None) and close
+
+        :param report: optional callable(metrics) called every report_seconds
+        """
+        await self.start()
+        deadline = None if duration is None else time.perf_counter() + duration
+        try:
+            while deadline is None or time.perf_counter() < deadline:
+                wait = report_seconds if deadline is None else min(report_seconds, deadline - time.perf_counter())
+                await asyncio.sleep(max(wait, 0))
+                if report is not None:
+                    report(self.metrics())
+                if self._producer.done():
+                    self._producer.result()  # re-raise synthesis errors
+        finally:
+            await self.close()
+
+    async def _produce(self):
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        while True:
+            tic = time.perf_counter()
+            x, y, t = await loop.run_in_executor(None, self.stream.read)
+            self.synthesis_seconds += time.perf_counter() - tic
+            due = start + self.stream.chunks * self.chunk_seconds
+            if self.realtime and due > loop.time():
+                await asyncio.sleep(due - loop.time())
+            self.lag = max(loop.time() - due, 0.0)
+            self.max_lag = max(self.max_lag, self.lag)
+            self._publish(x, y, t)
+
+    def _publish(self, x: np.ndarray, y: np.ndarray, t: np.ndarray):
+        rows = np.concatenate((t[None, :], x, y), axis=0).T.astype("<f4")
+        for client in self.clients:
+            columns = np.concatenate(([0], 1 + client.channels, 1 + self.n_channels + client.channels))
+            client.offer(np.ascontiguousarray(rows[:, columns]).tobytes())
+
+    def _channels(self, line: bytes) -> np.ndarray:
+        text = line.decode("ascii").strip()
+        if not text:
+            return np.arange(self.n_channels)
+        channels = np.array([int(c) for c in text.split(",")], dtype=int)
+        if np.any((channels < 0) | (channels >= self.n_channels)):
+            raise ValueError(f"channels must be in [0, {self.n_channels})")
+        return channels
+
+    async def _handle(self, reader, writer):
+        try:
+            channels = self._channels(await reader.readline())
+        except ValueError as e:
+            writer.write((json.dumps({"error": str(e)}) + "\n").encode())
+            writer.close()
+            return
+        client = _Client(channels, self.queue_chunks)
+        writer.write((json.dumps(dict(self.header, channels=channels.tolist())) + "\n").encode())
+        self.clients.add(client)
+        try:
+            while True:
+                frame = await client.queue.get()
+                if frame is None:
+                    break
+                writer.write(frame)
+                await writer.drain()
+                client.frames += 1
+        except ConnectionError:
+            logger.debug("client went away")
+        finally:
+            self.clients.discard(client)
+            self.dropped += client.dropped
+            writer.close()
+            client.closed.set()
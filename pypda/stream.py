@@ -0,0 +1,115 @@
+import numpy as np
+
+from pypda.hmm import BeatParameters
+from pypda.synthesis import resample_beats
+
+
+class PulseStream:
+    """Endless pulse waveforms of one or more independent channels, produced in fixed size chunks
+
+    Beats are synthesized on demand, with the HMM of every channel continuing from its last state. Each chunk is
+    interpolated from a short window of beat samples and low-pass filtered by a causal ``sosfilt`` whose state carries
+    over, so consecutive chunks join without discontinuities and memory stays constant however long the stream runs.
+    Unlike the zero-phase ``sosfiltfilt`` of :meth:`PulseWave.sample`, the causal filter adds a small phase delay.
+
+    One beat sample lasts ``beat_period / normal.beat_length.mean`` seconds, the nominal value of the scaling
+    :meth:`PulseWave.sample` applies to a whole record.
+    """
+    MARGIN = 16  # beat samples kept on both sides of the interpolated span
+
+    def __init__(self, wave, chunk_seconds=1.0, n_channels=1, block_beats=8):
+        """
+
+        :param wave: PulseWave providing the HMM, bpm, sampling rate and filter settings
+        :param chunk_seconds: length of each chunk in seconds
+        :param n_channels: number of independent channels
+        :param block_beats: number of beats synthesized at a time for a channel that runs short
+        """
+        from scipy.signal import cheby2
+        self.wave = wave
+        self.n_channels = n_channels
+        self.block_beats = block_beats
+        self.chunk_samples = int(round(chunk_seconds * wave.sampling_rate))
+        assert self.chunk_samples > 0, f"chunk_seconds={chunk_seconds} is shorter than one sample"
+        beat_length = wave.hmm.p.normal.beat_length.mean
+        self.raw_period = wave.beat_period / beat_length
+        self.sos = cheby2(2, wave.STOP_ATTEN, wave.CUTOFF / (wave.sampling_rate / 2), output="sos")
+
+        self.chunks = 0
+        self._origin = self.MARGIN + wave.rng.random(n_channels) * beat_length  # beat sample index at t = 0
+        self._buffer = [np.empty(0) for _ in range(n_channels)]
+        self._buffer_start = np.zeros(n_channels, dtype=int)
+        self._onsets = [np.empty(0, dtype=int) for _ in range(n_channels)]
+        self._states = [np.empty(0, dtype=int) for _ in range(n_channels)]
+        self._last = None
+        self._zi = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.read()
+
+    def read(self):
+        """Produce the next chunk
+
+        :return: x, y of shape (n_channels, chunk_samples) and the shared time axis t in seconds
+        """
+        from scipy.interpolate import interp1d
+        from scipy.signal import sosfilt, sosfilt_zi
+        t = (self.chunks * self.chunk_samples + np.arange(self.chunk_samples)) / self.wave.sampling_rate
+        self.chunks += 1
+        position = self._origin[:, None] + t[None, :] / self.raw_period
+        self._extend(np.floor(position[:, -1]).astype(int) + self.MARGIN)
+
+        x = np.empty((self.n_channels, self.chunk_samples))
+        y = np.empty((self.n_channels, self.chunk_samples), dtype=bool)
+        for c in range(self.n_channels):
+            index = self._buffer_start[c] + np.arange(len(self._buffer[c]))
+            x[c] = interp1d(index, self._buffer[c], kind="cubic", assume_sorted=True)(position[c])
+            beat = np.searchsorted(self._onsets[c] - 0.5, position[c], side="right") - 1
+            y[c] = self._states[c][beat] > 0
+            self._trim(c, int(np.floor(position[c, -1])) - self.MARGIN)
+
+        if self._zi is None:
+            self._zi = sosfilt_zi(self.sos)[:, None, :] * x[None, :, :1]
+        x, self._zi = sosfilt(self.sos, x, axis=-1, zi=self._zi)
+        return x, y, t
+
+    def _extend(self, end: np.ndarray):
+        """Synthesize beats until the buffer of every channel c reaches beat sample index end[c]"""
+        while True:
+            channels = np.flatnonzero(self._buffer_start + np.array(list(map(len, self._buffer))) <= end)
+            if not channels.size:
+                return
+            self._synthesize(channels)
+
+    def _synthesize(self, channels: np.ndarray):
+        hmm = self.wave.hmm
+        initial = None if self._last is None else (self._last[0][channels], self._last[1][channels])
+        x, s = hmm.sample_states(n_chains=len(channels), initial=initial, time_steps=self.block_beats)
+        if self._last is None:
+            self._last = x[:, -1], s[:, -1]
+        else:
+            self._last[0][channels], self._last[1][channels] = x[:, -1], s[:, -1]
+
+        p = BeatParameters.from_features(hmm.sample_features(x, s)).reshape(-1)
+        raw, raw_length = p.render()
+        flat = resample_beats(raw, raw_length, p.samples)
+        samples = p.samples.reshape(len(channels), self.block_beats)
+        bounds = np.concatenate(([0], np.cumsum(samples.sum(axis=1))))
+        for i, c in enumerate(channels):
+            end = self._buffer_start[c] + len(self._buffer[c])
+            self._onsets[c] = np.concatenate((self._onsets[c], end + np.cumsum(samples[i]) - samples[i]))
+            self._states[c] = np.concatenate((self._states[c], x[i]))
+            self._buffer[c] = np.concatenate((self._buffer[c], flat[bounds[i]:bounds[i + 1]]))
+
+    def _trim(self, c: int, start: int):
+        """Drop beat samples of channel c before index start, and the beats that end before it"""
+        drop = start - self._buffer_start[c]
+        if drop > 0:
+            self._buffer[c] = self._buffer[c][drop:]
+            self._buffer_start[c] = start
+        first = max(np.searchsorted(self._onsets[c], start, side="right") - 1, 0)
+        self._onsets[c] = self._onsets[c][first:]
+        self._states[c] = self._states[c][first:]
@@ -0,0 +1,222 @@
+"""Vectorized beat synthesis on stacked per-beat parameter arrays.
+
+Every function here works on a block of beats at once: row ``i`` of each argument describes beat ``i``. The results
+match the object based :class:`pypda.pulse_model.PulseModelRaw` path up to floating point rounding.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+
+def triang_windows(m: np.ndarray, length: int) -> np.ndarray:
+    """``scipy.signal.windows.triang(m[i])`` for every ``i``, zero padded to ``length`` columns."""
+    m = np.maximum(np.asarray(m, dtype=int), 1)[:, None]
+    k = np.arange(length)[None, :]
+    k_sym = np.minimum(k, m - 1 - k)
+    w = np.where(m % 2 == 0, (2 * k_sym + 1) / m, (2 * k_sym + 2) / (m + 1))
+    return np.where(k < m, w, 0.0)
+
+
+def gaussian_windows(m: np.ndarray, std: np.ndarray, length: int) -> np.ndarray:
+    """``scipy.signal.windows.gaussian(m[i], std[i])`` for every ``i``, zero padded to ``length`` columns."""
+    m = np.asarray(m, dtype=int)[:, None]
+    std = np.asarray(std, dtype=float)[:, None]
+    k = np.arange(length)[None, :]
+    n = k - (m - 1) / 2.0
+    return np.where(k < m, np.exp(-n ** 2 / (2 * std ** 2)), 0.0)
+
+
+def triang_gaussian_kernels(triang_m, gaussian_m, gaussian_std):
+    """Unit amplitude smoothed triangular kernels, one row per wavelet
+
+    :return: (kernels, lengths) where kernels is zero padded beyond lengths = triang_m + gaussian_m - 1
+    """
+    from scipy import fft
+
+    triang_m = np.asarray(triang_m, dtype=int).ravel()
+    gaussian_m = np.asarray(gaussian_m, dtype=int).ravel()
+    gaussian_std = np.asarray(gaussian_std, dtype=float).ravel()
+    lengths = triang_m + gaussian_m - 1
+    width = int(lengths.max())
+    n_fft = fft.next_fast_len(width, real=True)
+    triangle = fft.rfft(triang_windows(triang_m, int(triang_m.max())), n_fft, axis=-1)
+    gaussian = fft.rfft(gaussian_windows(gaussian_m, gaussian_std, int(gaussian_m.max())), n_fft, axis=-1)
+    kernels = fft.irfft(triangle * gaussian, n_fft, axis=-1)[:, :width]
+    kernels[np.arange(width)[None, :] >= lengths[:, None]] = 0
+    return kernels, lengths
+
+
+def render_beats(baseline, pulse_amplitudes, delta_time, triangle_m, gaussian_m, gaussian_std):
+    """Render raw (not yet resampled) beats, equivalent to ``PulseModelRaw`` before ``signal.resample``
+
+    :param baseline: (B,)
+    :param pulse_amplitudes: (B, C)
+    :param delta_time: (B, C - 1)
+    :param triangle_m: (B, C)
+    :param gaussian_m: (B, C)
+    :param gaussian_std: (B, C)
+    :return: (raw, raw_length) where raw is (B, max(raw_length)) and zero padded beyond raw_length
+    """
+    pulse_amplitudes = np.atleast_2d(pulse_amplitudes)
+    beats, components = pulse_amplitudes.shape
+    delta_time = np.asarray(delta_time, dtype=int).reshape(beats, components - 1)
+    offsets = np.concatenate((np.zeros((beats, 1), dtype=int), np.cumsum(delta_time, axis=1)), axis=1)
+
+    kernels, kernel_length = triang_gaussian_kernels(triangle_m, gaussian_m, gaussian_std)
+    kernels = kernels.reshape(beats, components, -1) * pulse_amplitudes[:, :, None]
+    kernel_length = kernel_length.reshape(beats, components)
+    raw_length = (offsets + kernel_length).max(axis=1)
+
+    width = kernels.shape[-1]
+    raw = np.zeros((beats, int(raw_length.max()) + width))
+    rows = np.arange(beats)[:, None]
+    for c in range(components):
+        raw[rows, offsets[:, c, None] + np.arange(width)[None, :]] += kernels[:, c, :]
+    raw = raw[:, :raw_length.max()]
+    raw += np.asarray(baseline, dtype=float)[:, None] * (np.arange(raw.shape[1])[None, :] < raw_length[:, None])
+    return raw, raw_length
+
+
+def render_trains(baseline, pulse_amplitudes, delta_time, triangle_m, gaussian_m, gaussian_std, kernels,
+                  block=256):
+    """Render raw beats as impulse trains convolved with shared kernels, a drop-in for :func:`render_beats`
+
+    The beats are laid out back to back and every wavelet becomes an impulse of its amplitude at its position in
+    that record. Wavelets whose kernels share a key of ``kernels`` form one impulse train, so the number of
+    convolutions is the number of distinct kernels; ``kernels.std_decimals`` trades exactness for fewer of them. The
+    record is rendered in blocks of ``block`` samples, convolving the trains present in a block with one batched
+    ``oaconvolve`` and overlap-adding the kernel tails into the next block.
+
+    This only pays off when few distinct kernels serve many wavelets. ``gaussian_std`` is continuous, so exact kernels
+    hardly repeat, and :func:`render_beats` already needs just one small FFT per wavelet. Rendering 2112 beats (32
+    records of 60 s) took 0.75 s here with exact kernels and 0.17 s with ``std_decimals=2``, against 0.03 s for
+    :func:`render_beats`; rounding to 2 decimals changes the beats by up to ~0.1 mmHg. Convolving each kernel's train
+    over the whole batch at once is slower still (1.3 s with stds rounded to integers).
+
+    :param kernels: :class:`pypda.wavelets.KernelCache` providing the kernels
+    :return: (raw, raw_length) as :func:`render_beats`
+    """
+    from scipy.signal import oaconvolve
+
+    pulse_amplitudes = np.atleast_2d(pulse_amplitudes)
+    beats, components = pulse_amplitudes.shape
+    delta_time = np.asarray(delta_time, dtype=int).reshape(beats, components - 1)
+    offsets = np.concatenate((np.zeros((beats, 1), dtype=int), np.cumsum(delta_time, axis=1)), axis=1)
+    triangle_m = np.asarray(triangle_m, dtype=int).reshape(beats, components)
+    gaussian_m = np.asarray(gaussian_m, dtype=int).reshape(beats, components)
+    gaussian_std = np.asarray(gaussian_std, dtype=float).reshape(beats, components)
+    if kernels.std_decimals is not None:
+        gaussian_std = np.round(gaussian_std, kernels.std_decimals)
+    raw_length = (offsets + triangle_m + gaussian_m - 1).max(axis=1)
+    beat_start = np.cumsum(raw_length) - raw_length
+
+    keys, group = np.unique(np.stack((triangle_m.ravel(), gaussian_m.ravel(), gaussian_std.ravel()), axis=1), axis=0,
+                            return_inverse=True)
+    group = group.ravel()
+    width = int((keys[:, 0] + keys[:, 1]).max()) - 1
+    kernel = np.zeros((len(keys), width))
+    for g, (tm, gm, std) in enumerate(keys):
+        k = kernels.kernel(tm, gm, std)
+        kernel[g, :len(k)] = k
+
+    position = (beat_start[:, None] + offsets).ravel()
+    order = np.argsort(position, kind="stable")
+    position, group, amplitude = position[order], group[order], pulse_amplitudes.ravel()[order]
+    total = int(raw_length.sum())
+    record = np.zeros(-(-total // block) * block + width)
+    for lo in range(0, total, block):
+        first, last = np.searchsorted(position, (lo, lo + block))
+        if first == last:
+            continue
+        present, local = np.unique(group[first:last], return_inverse=True)
+        trains = np.zeros((len(present), block))
+        np.add.at(trains, (local.ravel(), position[first:last] - lo), amplitude[first:last])
+        record[lo:lo + block + width - 1] += oaconvolve(trains, kernel[present], axes=-1).sum(axis=0)
+
+    columns = np.arange(raw_length.max())[None, :]
+    inside = columns < raw_length[:, None]
+    raw = np.where(inside, record[np.minimum(beat_start[:, None] + columns, len(record) - 1)], 0.0)
+    raw += np.asarray(baseline, dtype=float)[:, None] * inside
+    return raw, raw_length
+
+
+def resample_beats(raw: np.ndarray, raw_length: np.ndarray, samples: np.ndarray) -> np.ndarray:
+    """FFT resample beat ``i`` from ``raw_length[i]`` to ``samples[i]`` and concatenate the results
+
+    Beats sharing the same (raw_length, samples) pair are resampled together with one cached operator.
+    """
+    from pypda.resampling import resample_cache
+
+    samples = np.asarray(samples, dtype=int)
+    starts = np.concatenate(([0], np.cumsum(samples)[:-1]))
+    out = np.empty(samples.sum())
+    pairs, group = np.unique(np.stack((raw_length, samples), axis=1), axis=0, return_inverse=True)
+    for g, (n_in, n_out) in enumerate(pairs):
+        idx = np.flatnonzero(group.ravel() == g)
+        out[starts[idx, None] + np.arange(n_out)[None, :]] = resample_cache.resample(raw[idx, :n_in], n_out)
+    return out
+
+
+@lru_cache(maxsize=8)
+def sinc_table(taps=4, phases=256, beta=8.0) -> np.ndarray:
+    """Kaiser windowed sinc interpolation weights
+
+    Row ``p`` holds the weights of samples ``floor(r) - taps + 1 ... floor(r) + taps`` for a fractional position
+    ``r - floor(r) = p / phases``.
+
+    :return: (phases + 1, 2 * taps) read-only array
+    """
+    frac = np.arange(phases + 1)[:, None] / phases
+    distance = np.arange(-taps + 1, taps + 1)[None, :] - frac
+    window = np.i0(beta * np.sqrt(np.clip(1 - (distance / taps) ** 2, 0, None))) / np.i0(beta)
+    table = np.sinc(distance) * window
+    table /= table.sum(axis=1, keepdims=True)
+    table.setflags(write=False)
+    return table
+
+
+def interpolate_beats(raw: np.ndarray, raw_length: np.ndarray, beat: np.ndarray, position: np.ndarray,
+                      taps=4, phases=256) -> np.ndarray:
+    """Band-limited value of raw beat ``beat[i]`` at fractional sample ``position[i]``
+
+    Each beat is treated as periodic, like the FFT based ``signal.resample`` does.
+    """
+    table = sinc_table(taps, phases)
+    base = np.floor(position)
+    phase = (position - base) * phases
+    lower = np.minimum(phase.astype(int), phases - 1)
+    alpha = (phase - lower)[:, None]
+    weights = (1 - alpha) * table[lower] + alpha * table[lower + 1]
+    index = (base.astype(int)[:, None] + np.arange(-taps + 1, taps + 1)[None, :]) % raw_length[beat][:, None]
+    return (raw[beat[:, None], index] * weights).sum(axis=1)
+
+
+def render_direct(raw: np.ndarray, raw_length: np.ndarray, samples: np.ndarray, position: np.ndarray,
+                  block=1 << 16) -> np.ndarray:
+    """Evaluate the concatenated, resampled beats at fractional positions without forming the resampled record
+
+    Position ``g`` refers to the record ``resample_beats(raw, raw_length, samples)`` would return: it falls in beat
+    ``j`` with ``starts[j] <= g < starts[j + 1]`` and maps to raw sample
+    ``(g - starts[j]) * raw_length[j] / samples[j]``.
+    Within the last sample interval of a beat the value fades linearly into the next beat, so baseline steps between
+    beats are bridged the way interpolating the resampled record would.
+
+    :param block: number of positions evaluated at a time, bounding the size of the interpolation temporaries
+    """
+    samples = np.asarray(samples, dtype=int)
+    starts = np.cumsum(samples) - samples
+    last = len(samples) - 1
+    out = np.empty(len(position))
+    for lo in range(0, len(position), block):
+        g = position[lo:lo + block]
+        beat = np.clip(np.searchsorted(starts, g, side="right") - 1, 0, last)
+        value = interpolate_beats(raw, raw_length, beat, (g - starts[beat]) * raw_length[beat] / samples[beat])
+        fade = np.flatnonzero((g > starts[beat] + samples[beat] - 1) & (beat < last))
+        if fade.size:
+            following = beat[fade] + 1
+            alpha = g[fade] - (starts[following] - 1)
+            edge = interpolate_beats(raw, raw_length, following,
+                                     (g[fade] - starts[following]) * raw_length[following] / samples[following])
+            value[fade] = (1 - alpha) * value[fade] + alpha * edge
+        out[lo:lo + block] = value
+    return out
@@ -1,2 +1,3 @@
+from .kernel_cache import KernelCache, kernel_cache
 from .triang_gaussian import TriangGaussian
-from .waveform import Waveform, ArbitraryWaveform
+from .waveform import Waveform, ArbitraryWaveform, overlap_add
@@ -0,0 +1,36 @@
+import numpy as np
+
+from pypda.lru import LRUCache
+
+
+class KernelCache(LRUCache):
+    """Unit amplitude smoothed triangular kernels keyed by (triang_m, gaussian_m, gaussian_std)
+
+    ``gaussian_std`` is usually a continuous HMM output, so exact keys rarely repeat across beats. Set std_decimals to
+    round it before the lookup and trade a little exactness for a much higher hit rate.
+    """
+
+    def __init__(self, maxsize=1024, std_decimals=None):
+        super().__init__(maxsize=maxsize)
+        self.std_decimals = std_decimals
+
+    def key(self, triang_m, gaussian_m, gaussian_std):
+        gaussian_std = float(gaussian_std)
+        if self.std_decimals is not None:
+            gaussian_std = round(gaussian_std, self.std_decimals)
+        return int(triang_m), int(gaussian_m), gaussian_std
+
+    def kernel(self, triang_m=20, gaussian_m=16, gaussian_std=2) -> np.ndarray:
+        """Read-only ``convolve(triang(triang_m), gaussian(gaussian_m, gaussian_std))``"""
+        key = self.key(triang_m, gaussian_m, gaussian_std)
+        return self.get(key, lambda: self._make_kernel(*key))
+
+    @staticmethod
+    def _make_kernel(triang_m, gaussian_m, gaussian_std):
+        from scipy import signal
+        kernel = signal.convolve(signal.windows.triang(triang_m), signal.windows.gaussian(gaussian_m, std=gaussian_std))
+        kernel.setflags(write=False)
+        return kernel
+
+
+kernel_cache = KernelCache()
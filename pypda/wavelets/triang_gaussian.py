@@ -1,6 +1,6 @@
 import numpy as np
-from scipy import signal
 
+from .kernel_cache import kernel_cache
 from .waveform import Waveform
 
 
@@ -14,14 +14,19 @@ class TriangGaussian(Waveform):
         self.gaussian_m = gaussian_m
         self.gaussian_std = gaussian_std
 
-        self.triangle = signal.triang(triang_m)
-        self.gaussian = signal.gaussian(gaussian_m, std=gaussian_std)
+    @property
+    def triangle(self) -> np.ndarray:
+        from scipy import signal
+        return signal.windows.triang(self.triang_m)
+
+    @property
+    def gaussian(self) -> np.ndarray:
+        from scipy import signal
+        return signal.windows.gaussian(self.gaussian_m, std=self.gaussian_std)
 
     @property
-    def waveform(self) -> np.ndarray:
+    def data(self) -> np.ndarray:
         if self._waveform is None:
-            self._waveform = self.baseline + self.amplitude * signal.convolve(self.triangle, self.gaussian)
+            kernel = kernel_cache.kernel(self.triang_m, self.gaussian_m, self.gaussian_std)
+            self._waveform = self.baseline + self.amplitude * kernel
         return self._waveform
-
-    def __len__(self):
-        return len(self.waveform)
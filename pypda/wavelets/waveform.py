@@ -1,18 +1,28 @@
 import abc
+from typing import Iterable
 
 import numpy as np
 
 
 class Waveform(abc.ABC):
+    """A compact block of samples (``data``) placed ``offset`` samples after the origin"""
     _waveform = None
+    offset = 0
 
     @property
     @abc.abstractmethod
-    def waveform(self) -> np.ndarray:
+    def data(self) -> np.ndarray:
         raise NotImplementedError
 
+    @property
+    def waveform(self) -> np.ndarray:
+        """Samples from the origin on, i.e. ``data`` preceded by ``offset`` zeros"""
+        if self.offset >= 0:
+            return np.concatenate((np.zeros(self.offset), self.data))
+        return self.data[-self.offset:]
+
     def __len__(self):
-        return len(self.waveform)
+        return max(self.offset + len(self.data), 0)
 
     def shift(self, shift=0):
         """
@@ -20,18 +30,11 @@ class Waveform(abc.ABC):
         :param shift: shift > 0 means shifting right. e.g., shift = 3: [1 2 3 4] => [0 0 0 1 2 3 4]
         :return:
         """
-        assert isinstance(self.waveform, np.ndarray)
-        if shift > 0:
-            self._waveform = np.concatenate((np.zeros(shift), self._waveform))
-        if shift < 0:
-            self._waveform = np.concatenate((self._waveform, np.zeros(shift)))
+        self.offset += int(shift)
 
     def __add__(self, other: "Waveform"):
         assert isinstance(other, Waveform), f"{other} is not a Waveform"
-        w = ArbitraryWaveform(length=max(len(self), len(other)))
-        w.waveform[:len(self)] = self.waveform
-        w.waveform[:len(other)] += other.waveform
-        return w
+        return overlap_add((self, other))
 
     def __radd__(self, other):
         if other == 0:
@@ -48,9 +51,41 @@ class ArbitraryWaveform(Waveform):
             self._waveform = np.zeros(length)
 
     @property
-    def waveform(self) -> np.ndarray:
+    def data(self) -> np.ndarray:
         return self._waveform
 
-    @waveform.setter
-    def waveform(self, value):
+    @data.setter
+    def data(self, value):
         self._waveform[:len(value)] = value
+
+    @Waveform.waveform.setter
+    def waveform(self, value):
+        self.data = value
+
+
+def overlap_add(waveforms: Iterable[Waveform], start=None, length=None) -> ArbitraryWaveform:
+    """Sum waveforms by writing each compact segment into one preallocated buffer
+
+    Unlike chaining ``+`` (or ``sum``), which allocates a new waveform per addition, this costs one allocation and is
+    linear in the total number of samples.
+
+    :param waveforms: waveforms to sum, placed according to their offsets
+    :param start: offset of the result, defaults to the smallest offset
+    :param length: length of the result, defaults to reaching the end of the last segment
+    :return: the sum, whose offset is start
+    """
+    waveforms = list(waveforms)
+    if start is None:
+        start = min(w.offset for w in waveforms)
+    if length is None:
+        length = max(w.offset + len(w.data) for w in waveforms) - start
+    buffer = np.zeros(max(length, 0))
+    for w in waveforms:
+        data = w.data
+        lo = w.offset - start
+        begin, end = max(lo, 0), min(lo + len(data), len(buffer))
+        if begin < end:
+            buffer[begin:end] += data[begin - lo:end - lo]
+    result = ArbitraryWaveform(waveform=buffer)
+    result.offset = start
+    return result
@@ -10,7 +10,7 @@ with open('README.rst') as readme_file:
 with open('HISTORY.rst') as history_file:
     history = history_file.read()
 
-requirements = ['Click>=7.0', 'matplotlib==3.1.3', 'numpy==1.18.1', 'scipy==1.4.1', 'scikit-learn==0.22.1']
+requirements = ['Click>=7.0', 'matplotlib==3.1.3', 'numpy==1.18.1', 'scipy==1.4.1']
 
 setup_requirements = []
 
@@ -19,16 +19,13 @@ test_requirements = []
 setup(
     author="Tao-Yi Lee",
     author_email='taoyil@uci.edu',
-    python_requires='>=3.5',
+    python_requires='>=3.8',
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
         'Natural Language :: English',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
-        'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
     ],
     description="A Pythonic toolkit to generate synthetic blood pressure waveforms based on principle of pulse decomposition analysis (PDA).",
@@ -0,0 +1,51 @@
+"""Tests for `pypda.dataset`."""
+
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from pypda.dataset import generate_dataset
+from pypda.indexed import IndexedDataset
+
+
+class TestGenerateDataset(unittest.TestCase):
+
+    def test_independent_of_workers(self):
+        with tempfile.TemporaryDirectory() as one, tempfile.TemporaryDirectory() as two:
+            generate_dataset(one, 7, workers=1, shard_size=3, seed=11, length=5)
+            manifest = generate_dataset(two, 7, workers=2, shard_size=3, seed=11, length=5)
+            self.assertEqual([s["records"] for s in manifest["shards"]], [3, 3, 1])
+            with open(os.path.join(two, "manifest.json")) as f:
+                self.assertEqual(json.load(f), manifest)
+            for shard in manifest["shards"]:
+                a, b = np.load(os.path.join(one, shard["file"])), np.load(os.path.join(two, shard["file"]))
+                self.assertEqual(a["x"].shape, (shard["records"], 249))
+                for k in "xyt":
+                    np.testing.assert_array_equal(a[k], b[k])
+
+    def test_indexed_format(self):
+        with tempfile.TemporaryDirectory() as npz, tempfile.TemporaryDirectory() as indexed, \
+                tempfile.TemporaryDirectory() as serial:
+            generate_dataset(npz, 7, shard_size=3, seed=11, length=5)
+            generate_dataset(indexed, 7, workers=2, shard_size=3, seed=11, length=5, format="indexed", beats=True)
+            generate_dataset(serial, 7, shard_size=3, seed=11, length=5, format="indexed", beats=True)
+            self.assertFalse([f for f in os.listdir(indexed) if f.startswith(".shard")])
+            dataset = IndexedDataset(indexed)
+            for name in dataset.meta["arrays"]:  # merged worker shards match writing in this process
+                with open(os.path.join(indexed, f"{name}.bin"), "rb") as a, \
+                        open(os.path.join(serial, f"{name}.bin"), "rb") as b:
+                    self.assertEqual(a.read(), b.read(), name)
+            self.assertEqual(len(dataset), 7)
+            self.assertEqual(dataset.attrs["format"], "indexed")
+            x = np.concatenate([np.load(os.path.join(npz, f"shard_{i:05d}.npz"))["x"] for i in range(3)])
+            for i in range(7):
+                np.testing.assert_array_equal(dataset[i][0], x[i])
+            self.assertEqual(len(dataset.beats(6)[0]), dataset.attrs["length"] * 65 // 60 + 2)
+            del dataset
+
+
+if __name__ == '__main__':
+    unittest.main()
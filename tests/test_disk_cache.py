@@ -0,0 +1,107 @@
+"""Tests for `pypda.disk_cache`."""
+
+import os
+import pickle
+import tempfile
+import unittest
+import unittest.mock
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from pypda.api.sample_test import sample_parameters
+from pypda.disk_cache import DiskCache
+from pypda.pulse_wave import PulseWave
+
+
+def _fill(directory, key):
+    return DiskCache(directory).get(key, lambda: (np.full(1000, 7.0),))[0].sum()
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key(self):
+        a = np.arange(4.0)
+        self.assertEqual(DiskCache.key("f", a, {"b": 1, "a": None}), DiskCache.key("f", a.copy(), {"a": None, "b": 1}))
+        self.assertNotEqual(DiskCache.key("f", a), DiskCache.key("f", a.astype(np.float32)))
+        self.assertNotEqual(DiskCache.key("f", a), DiskCache.key("f", a.reshape(2, 2)))
+        self.assertNotEqual(DiskCache.key("f", 1), DiskCache.key("f", 1.0))
+        self.assertNotEqual(DiskCache.key("f", 1), DiskCache.key("f", "1"))
+        self.assertNotEqual(DiskCache.key("f", [1, 2], 3), DiskCache.key("f", [1], 2, 3))
+        with self.assertRaises(TypeError):
+            DiskCache.key(object())
+
+    def test_hit_and_miss(self):
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return np.arange(3), np.ones((2, 2))
+
+        key = DiskCache.key("test")
+        first = self.cache.get(key, factory)
+        second = self.cache.get(key, factory)
+        self.assertEqual(len(calls), 1)
+        for a, b in zip(first, second):
+            np.testing.assert_array_equal(a, b)
+        info = self.cache.info()
+        self.assertEqual((info["hits"], info["misses"], info["entries"]), (1, 1, 1))
+        self.assertEqual([f for _, _, files in os.walk(self.tmp.name) for f in files if f.endswith(".tmp")], [])
+
+        self.cache.clear()
+        self.assertEqual(self.cache.info()["entries"], 0)
+
+    def test_eviction(self):
+        keys = [DiskCache.key(i) for i in range(3)]
+        for i, key in enumerate(keys):
+            self.cache.get(key, lambda: (np.zeros(1000),))
+            os.utime(self.cache._path(key), (i, i))
+        os.utime(self.cache._path(keys[0]), (10, 10))  # most recently used
+        size = self.cache.info()["bytes"] // 3
+        self.cache.evict(2 * size)
+        self.assertTrue(os.path.exists(self.cache._path(keys[0])))
+        self.assertFalse(os.path.exists(self.cache._path(keys[1])))
+        self.assertTrue(os.path.exists(self.cache._path(keys[2])))
+        self.assertEqual(self.cache.evictions, 1)
+
+        bounded = DiskCache(self.tmp.name, max_bytes=size + size // 2)
+        bounded.get(DiskCache.key(3), lambda: (np.zeros(1000),))
+        self.assertEqual(bounded.info()["entries"], 1)
+
+    def test_processes(self):
+        key = DiskCache.key("shared")
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            totals = list(pool.map(_fill, [self.tmp.name] * 4, [key] * 4))
+        self.assertEqual(totals, [7000.0] * 4)
+        self.assertEqual(self.cache.info()["entries"], 1)
+        self.assertEqual(pickle.loads(pickle.dumps(self.cache)).directory, self.tmp.name)
+
+    def test_pulse_wave(self):
+        reference = PulseWave(sample_parameters(), length=20, rng=3)
+        expected = [reference.sample() for _ in range(2)]
+        for _ in range(2):  # the second pass reads every record from the cache
+            wave = PulseWave(sample_parameters(), length=20, rng=3, cache=self.cache)
+            for record in expected:
+                for a, b in zip(record, wave.sample()):
+                    np.testing.assert_array_equal(a, b)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+        PulseWave(sample_parameters(), length=20, rng=4, cache=self.cache).sample()
+        self.assertEqual(self.cache.misses, 3)
+
+    def test_running_total(self):
+        bounded = DiskCache(self.tmp.name, max_bytes=1 << 20)
+        for i in range(5):
+            bounded.get(DiskCache.key(i), lambda: (np.zeros(1000),))
+        self.assertEqual(bounded._bytes, self.cache.info()["bytes"])
+        path = bounded._path(DiskCache.key(0))
+        os.remove(path)  # evicted by another process between np.load and os.utime, still a hit
+        with unittest.mock.patch("numpy.load", return_value=np.load(bounded._path(DiskCache.key(1)))):
+            bounded.get(DiskCache.key(0), lambda: self.fail("regenerated"))
+        self.assertEqual(bounded.hits, 1)
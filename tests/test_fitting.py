@@ -0,0 +1,71 @@
+"""Tests for `pypda.fitting`."""
+
+import unittest
+
+import numpy as np
+
+from pypda.api.sample_test import sample_parameters
+from pypda.fitting import fit_beats, fit_records, split_beats, wavelet_model
+from pypda.pulse_wave import PulseWave
+from pypda.synthesis import resample_beats
+from pypda.wavelets import TriangGaussian
+
+
+class TestFitting(unittest.TestCase):
+
+    def test_wavelet_model(self):
+        for tm, gm, std in ((20, 16, 2), (12, 20, 1.5)):
+            kernel = TriangGaussian(triang_m=tm, gaussian_m=gm, gaussian_std=std).data
+            model = wavelet_model(np.arange(len(kernel)), 1, (tm + gm - 2) / 2, tm / 2, std)
+            np.testing.assert_allclose(model, kernel, atol=5e-3 * kernel.max())
+
+    def test_jacobian(self):
+        x, p = np.arange(60.), np.array([2., 30, 9, 2.2])
+        _, jacobian = wavelet_model(x, *p, jac=True)
+        for i in range(4):
+            e = np.zeros(4)
+            e[i] = 1e-6
+            numeric = (wavelet_model(x, *(p + e)) - wavelet_model(x, *(p - e))) / 2e-6
+            np.testing.assert_allclose(jacobian[i], numeric, atol=1e-6)
+
+    def test_fit_beats(self):
+        wave = PulseWave(parameters=sample_parameters(), rng=1, length=30)
+        _, _, p, _ = wave.draw(1)
+        raw, raw_length = p.render()
+        beats = [r[:n] for r, n in zip(raw, raw_length)]
+        fit = fit_beats(beats, block_beats=16)
+        self.assertEqual(len(fit), len(beats))
+        self.assertGreater(fit.continuous_r2.min(), 0.999)
+        # overlapping wavelets can trade places and the amplitudes are refitted to the rounded geometry, so only most
+        # beats recover their parameters
+        self.assertLess(np.median(np.abs(fit.parameters.pulse_amplitudes - p.pulse_amplitudes)), 0.2)
+        self.assertLessEqual(np.median(np.abs(fit.parameters.triangle_m - p.triangle_m)), 1)
+        np.testing.assert_array_equal(fit.parameters.samples, raw_length)
+        self.assertGreater(fit.beats_per_second, 0)
+
+        # the returned integer parameters render back to the beats, and r2/rmse describe them
+        self.assertTrue(np.all(fit.parameters.delta_time >= 0))
+        refit, refit_length = fit.parameters.render()
+        np.testing.assert_array_equal(refit_length, raw_length)
+        rendered = np.split(resample_beats(refit, refit_length, raw_length), np.cumsum(raw_length)[:-1])
+        rmse = np.array([np.sqrt(np.mean((r - b) ** 2)) for r, b in zip(rendered, beats)])
+        np.testing.assert_allclose(fit.rmse, rmse)
+        self.assertLess(np.median(rmse), 0.5)
+        self.assertLess(rmse.max(), 2)
+        self.assertGreater(np.median(fit.r2), 0.998)
+        self.assertGreater(fit.r2.min(), 0.95)
+
+    def test_fit_records(self):
+        x = np.arange(10.)
+        records = [[wavelet_model(np.arange(60.), 5, 30, 10, 2) + 80] * 3, [wavelet_model(np.arange(50.), 3, 20, 8, 3)]]
+        fits = fit_records(records)
+        self.assertEqual([len(f) for f in fits], [3, 1])
+        self.assertGreater(min(f.r2.min() for f in fits), 0.99)
+        for serial, parallel in zip(fits, fit_records(records, workers=2)):
+            np.testing.assert_allclose(parallel.parameters.pulse_amplitudes, serial.parameters.pulse_amplitudes)
+            np.testing.assert_array_equal(parallel.parameters.delta_time, serial.parameters.delta_time)
+        self.assertEqual(split_beats(x, [0, 4, 10])[1].tolist(), [4, 5, 6, 7, 8, 9])
+
+
+if __name__ == '__main__':
+    unittest.main()
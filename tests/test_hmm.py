@@ -0,0 +1,87 @@
+"""Tests for `pypda.hmm`."""
+
+import unittest
+
+import numpy as np
+
+from pypda.hmm import CPT, HMM, BeatParameters
+from pypda.parameters import PulseWaveParameters
+
+
+class TestCPT(unittest.TestCase):
+
+    def test_normalized_sampling(self):
+        cpt = CPT(n_variables=2, cardinality=(3, 2))
+        cpt[0, 0], cpt[1, 0], cpt[2, 0] = 0.6, 0.3, 0.
+        cpt[0, 1], cpt[1, 1], cpt[2, 1] = 0., 0., 5.
+        np.testing.assert_allclose(cpt.probabilities[:, 0], [2 / 3, 1 / 3, 0])
+        np.random.seed(0)
+        draws = cpt.sample(np.zeros(20000, dtype=int))
+        self.assertAlmostEqual(np.mean(draws == 0), 2 / 3, places=2)
+        self.assertFalse(np.any(draws == 2))
+        self.assertEqual(cpt.sample_conditioned(1), 2)
+
+
+class TestHMM(unittest.TestCase):
+
+    def test_transition_matrix(self):
+        hmm = HMM(PulseWaveParameters(), time_steps=10)
+        a = hmm.transition_matrix
+        np.testing.assert_allclose(a.sum(axis=1), 1)
+        # z = n * 3 + s; from (n=0, s=1) to (n=1, s=2): P(n=1|0,1) * P(s=2|n=1)
+        self.assertAlmostEqual(a[1, 5], 0.15 * 0.15 / 0.95)
+        np.testing.assert_allclose(hmm.initial_distribution.sum(), 1)
+
+    def test_sample_states(self):
+        np.random.seed(1)
+        hmm = HMM(PulseWaveParameters(), time_steps=400)
+        x, s = hmm.sample_states(n_chains=50)
+        self.assertEqual(x.shape, (50, 400))
+        self.assertEqual(s.shape, (50, 400))
+        z = (x * hmm.SEVERITY_STEPS + s).ravel()
+        counts = np.zeros((6, 6))
+        np.add.at(counts, (z.reshape(50, 400)[:, :-1].ravel(), z.reshape(50, 400)[:, 1:].ravel()), 1)
+        empirical = counts / counts.sum(axis=1, keepdims=True)
+        np.testing.assert_allclose(empirical[:3], hmm.transition_matrix[:3], atol=0.02)
+
+    def test_severity_features(self):
+        from scipy.stats import chi2
+        np.random.seed(2)
+        hmm = HMM(PulseWaveParameters(), time_steps=10)
+        s = np.repeat(np.arange(3), 5000)
+        z = hmm.sample_severity_features(s)
+        self.assertEqual(z.shape, (15000, 26))
+        edges = chi2.ppf([0, 1 / 3, 2 / 3, 1], df=26)
+        r2 = (z ** 2).sum(axis=1)
+        self.assertTrue(np.all((edges[s] <= r2 + 1e-9) & (r2 <= edges[s + 1] + 1e-9)))
+        np.testing.assert_allclose(z.mean(axis=0), 0, atol=0.05)
+        np.testing.assert_allclose(z.var(axis=0), 1, atol=0.05)
+
+    def test_sample(self):
+        hmm = HMM(PulseWaveParameters(), time_steps=7)
+        x, y = hmm.sample()
+        self.assertEqual(len(x), 7)
+        self.assertEqual(len(y), 7)
+        self.assertEqual(y[0]['delta_time'].shape, (4,))
+        self.assertEqual(y[0]['pulse_amplitudes'].shape, (5,))
+
+    def test_sample_columnar(self):
+        hmm = HMM(PulseWaveParameters(), time_steps=7)
+        np.random.seed(3)
+        x, beats = hmm.sample()
+        np.random.seed(3)
+        x_columnar, columnar = hmm.sample(columnar=True)
+        np.testing.assert_array_equal(x_columnar, x)
+        self.assertIsInstance(columnar, BeatParameters)
+        self.assertEqual(len(columnar), 7)
+        self.assertEqual(columnar.pulse_amplitudes.shape, (7, 5))
+        self.assertEqual(columnar.delta_time.shape, (7, 4))
+        for k in BeatParameters.FIELDS:
+            np.testing.assert_array_equal(columnar[3][k], beats[3][k])
+        self.assertEqual(len(columnar[2:5]), 3)
+        self.assertEqual(columnar.reshape(7, 1).samples.shape, (7, 1))
+        self.assertEqual(columnar.reshape(7, 1).gaussian_std.shape, (7, 1, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,19 @@
+"""Guard against heavy imports on the pyPDA startup path."""
+
+import os
+import subprocess
+import sys
+import unittest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "importtime.py")
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_no_heavy_imports(self):
+        result = subprocess.run([sys.executable, SCRIPT], stdout=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(result.returncode, 0, result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Tests for `pypda.indexed`."""
+
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from pypda.api.sample_test import sample_parameters
+from pypda.indexed import IndexedDataset, IndexedWriter
+from pypda.pulse_wave import PulseWave
+
+
+class TestIndexedDataset(unittest.TestCase):
+
+    def test_round_trip(self):
+        records = []
+        with tempfile.TemporaryDirectory() as directory:
+            with IndexedWriter(directory, attrs={"preset": "sample"}) as writer:
+                for length in (5, 8, 3):
+                    wave = PulseWave(parameters=sample_parameters(), length=length)
+                    state, severity, p, t_start = wave.draw(2)
+                    x, y, t = wave.render(state, severity, p, t_start)
+                    writer.extend(x, y, t, state, severity, p)
+                    records += [(x[i], y[i], t[i], state[i], p.samples.reshape(2, -1)[i]) for i in range(2)]
+
+            dataset = IndexedDataset(directory)
+            self.assertEqual(len(dataset), 6)
+            self.assertEqual(dataset.attrs, {"preset": "sample"})
+            for i, (x, y, t, state, samples) in enumerate(records):
+                x_read, y_read, t_read = dataset[i]
+                np.testing.assert_array_equal(x_read, x)
+                np.testing.assert_array_equal(y_read, y)
+                np.testing.assert_allclose(t_read, t, atol=1e-9)
+                state_read, _, beats = dataset.beats(i)
+                np.testing.assert_array_equal(state_read, state)
+                np.testing.assert_array_equal(beats.samples, samples)
+                self.assertEqual(beats.pulse_amplitudes.shape, (len(samples), 5))
+            self.assertFalse(dataset[0][0].flags.writeable)
+
+            subset = dataset[1:6:2][::-1]
+            self.assertEqual(len(subset), 3)
+            np.testing.assert_array_equal(subset[0][0], records[5][0])
+            np.testing.assert_array_equal(subset.index["length"], [len(records[i][0]) for i in (5, 3, 1)])
+            picked = pickle.loads(pickle.dumps(dataset[[4, 0]]))
+            np.testing.assert_array_equal(picked[1][0], records[0][0])
+            del dataset, subset, picked, x_read, y_read, state_read, beats
+
+    def test_merge(self):
+        wave = PulseWave(parameters=sample_parameters(), length=5)
+        batches = [wave.render(*wave.draw(n)) for n in (2, 3)]
+        with tempfile.TemporaryDirectory() as directory:
+            for i, (x, y, t) in enumerate(batches):
+                with IndexedWriter(os.path.join(directory, str(i))) as part:
+                    part.extend(x, y, t)
+            with IndexedWriter(os.path.join(directory, "merged")) as writer:
+                writer.extend(*batches[0])
+                writer.merge(os.path.join(directory, "1"))
+            dataset = IndexedDataset(os.path.join(directory, "merged"))
+            self.assertEqual(len(dataset), 5)
+            x = np.concatenate([batch[0] for batch in batches])
+            for i in range(5):
+                np.testing.assert_array_equal(dataset[i][0], x[i])
+            np.testing.assert_array_equal(dataset.index["offset"], np.arange(5) * x.shape[1])
+            del dataset
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Tests for `pypda.inference` and HMM decoding."""
+
+import itertools
+import unittest
+
+import numpy as np
+from scipy.special import logsumexp
+
+from pypda.api.sample_test import sample_parameters
+from pypda.hmm import HMM
+from pypda.inference import backward, forward, forward_backward, viterbi
+
+
+class TestInference(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.k = 4
+        self.log_initial = np.log(rng.dirichlet(np.ones(self.k)))
+        self.log_transition = np.log(rng.dirichlet(np.ones(self.k), size=self.k))
+        self.rng = rng
+
+    def brute_force(self, log_emission):
+        """Log probability of every path of a short chain"""
+        paths = np.array(list(itertools.product(range(self.k), repeat=len(log_emission))))
+        score = self.log_initial[paths[:, 0]] + log_emission[np.arange(len(log_emission)), paths].sum(axis=1)
+        score += self.log_transition[paths[:, :-1], paths[:, 1:]].sum(axis=1)
+        return paths, score
+
+    def test_matches_brute_force(self):
+        log_emission = np.log(self.rng.random((3, 5, self.k)))
+        for block in (None, 1, 2, 3, 8):
+            log_likelihood, log_posterior = forward_backward(self.log_initial, self.log_transition, log_emission, block)
+            path, log_probability = viterbi(self.log_initial, self.log_transition, log_emission, block)
+            for i, e in enumerate(log_emission):
+                paths, score = self.brute_force(e)
+                self.assertAlmostEqual(log_likelihood[i], logsumexp(score))
+                marginal = [[logsumexp(score[paths[:, t] == k]) for k in range(self.k)] for t in range(len(e))]
+                np.testing.assert_allclose(log_posterior[i], np.array(marginal) - logsumexp(score), atol=1e-10)
+                np.testing.assert_array_equal(path[i], paths[np.argmax(score)])
+                self.assertAlmostEqual(log_probability[i], score.max())
+
+    def test_long_chain(self):
+        log_emission = np.log(self.rng.random((2, 1000, self.k)))
+        alpha = np.empty_like(log_emission)
+        alpha[:, 0] = self.log_initial + log_emission[:, 0]
+        for t in range(1, 1000):
+            alpha[:, t] = logsumexp(alpha[:, t - 1, :, None] + self.log_transition, axis=1) + log_emission[:, t]
+        np.testing.assert_allclose(forward(self.log_initial, self.log_transition, log_emission), alpha)
+        beta = backward(self.log_transition, log_emission, block=7)
+        np.testing.assert_allclose(logsumexp(alpha + beta, axis=-1), logsumexp(alpha[:, -1:], axis=-1).repeat(1000, 1))
+
+    def test_impossible_emissions(self):
+        log_emission = np.where(np.arange(self.k) == 1, 0, -np.inf) * np.ones((1, 6, 1))
+        _, log_posterior = forward_backward(self.log_initial, self.log_transition, log_emission)
+        np.testing.assert_allclose(np.exp(log_posterior)[..., 1], 1)
+        self.assertTrue(np.all(viterbi(self.log_initial, self.log_transition, log_emission)[0] == 1))
+
+
+class TestHMMDecoding(unittest.TestCase):
+
+    def test_decode_features(self):
+        hmm = HMM(parameters=sample_parameters(), time_steps=500, rng=3)
+        x, s = hmm.sample_states(n_chains=2)
+        log_emission = hmm.log_emissions(features=hmm.sample_features(x, s))
+        self.assertEqual(log_emission.shape, (2, 500, 6))
+        log_likelihood, posterior = hmm.forward_backward(log_emission)
+        self.assertEqual(posterior.shape, (2, 500, 2, 3))
+        np.testing.assert_allclose(posterior.sum(axis=(-1, -2)), 1)
+        self.assertTrue(np.all(np.isfinite(log_likelihood)))
+        x_hat, s_hat, _ = hmm.viterbi(log_emission)
+        self.assertGreater(np.mean(x_hat == x), 0.95)
+        self.assertGreater(np.mean(s_hat == s), 0.95)
+
+    def test_decode_severity(self):
+        hmm = HMM(parameters=sample_parameters(), time_steps=500, rng=4)
+        x, s = hmm.sample_states()
+        _, s_hat, _ = hmm.viterbi(hmm.log_emissions(severity=s))
+        np.testing.assert_array_equal(s_hat, s)
+        with self.assertRaises(AssertionError):
+            hmm.log_emissions()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""Tests for `pypda.labels`."""
+
+import unittest
+
+import numpy as np
+
+from pypda.api.sample_test import sample_test_parameters
+from pypda.labels import EVENT_DTYPE, beat_events, dense_labels
+from pypda.pulse_wave import PulseWave
+
+
+class TestLabels(unittest.TestCase):
+
+    def test_run_length(self):
+        boundaries = np.arange(7.)
+        events = beat_events(boundaries, [0, 0, 1, 1, 1, 0], [0, 0, 2, 2, 1, 0], start=0.5, end=5.5)
+        self.assertEqual(events.dtype, EVENT_DTYPE)
+        np.testing.assert_allclose(events["onset"], [0, 1.5, 3.5, 4.5])
+        np.testing.assert_allclose(events["offset"], [1.5, 3.5, 4.5, 5])
+        np.testing.assert_array_equal(events["state"], [0, 1, 1, 0])
+        np.testing.assert_array_equal(events["severity"], [0, 2, 1, 0])
+
+        t = np.array([-1, 0, 1.4, 1.5, 4.9, 5, 5.1])
+        np.testing.assert_array_equal(dense_labels(events, t), [False, False, False, True, False, False, False])
+        np.testing.assert_array_equal(dense_labels(events, t, field="severity"), [0, 0, 0, 2, 0, 0, 0])
+
+    def test_events_match_dense(self):
+        for engine in PulseWave.ENGINES:
+            wave = PulseWave(parameters=sample_test_parameters(), length=30, engine=engine)
+            np.random.seed(4)
+            x, y, t = wave.sample()
+            np.random.seed(4)
+            x_events, events, t_events = wave.sample(labels="events")
+            np.testing.assert_array_equal(x_events, x)
+            np.testing.assert_allclose(events["onset"][0], 0)
+            np.testing.assert_allclose(events["offset"][-1], 30)
+            np.testing.assert_allclose(events["offset"][:-1], events["onset"][1:])
+            np.testing.assert_array_equal(dense_labels(events, t_events), y)
+
+        np.random.seed(4)
+        _, events, t = wave.sample_batch(3, labels="events")
+        self.assertEqual(len(events), 3)
+        self.assertTrue(all(e.dtype == EVENT_DTYPE for e in events))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""Tests for `pypda.parameters`."""
+
+import unittest
+
+import numpy as np
+
+from pypda.parameters import ParameterMeanScale, PulseParameters
+
+
+class TestPulseParameters(unittest.TestCase):
+
+    def test_attribute_api_writes_through(self):
+        p = PulseParameters()
+        p.beat_length.mean = 120
+        p.pulse_amplitudes[1].mean = 3.5
+        p.delta_time[-1].scale = 1
+        self.assertEqual(p.mean[0], 120)
+        self.assertEqual(p.mean[p.slices["pulse_amplitudes"]][1], 3.5)
+        self.assertEqual(p.scale[p.slices["delta_time"]][-1], 1)
+        self.assertEqual(p.features[0].mean, 120)
+        self.assertEqual(len(p), 26)
+        self.assertEqual(p.feature_names[2], "pulse_amplitudes[0]")
+
+    def test_vector_setters(self):
+        p = PulseParameters()
+        p.scale = np.arange(26)
+        self.assertEqual(p.gaussian_std[4].scale, 25)
+        p.triangle_m.mean = [21, 22, 23, 24, 25]
+        np.testing.assert_array_equal(p.mean[11:16], [21, 22, 23, 24, 25])
+        p.diastolic_baseline = ParameterMeanScale(90, 3)
+        self.assertEqual((p.diastolic_baseline.mean, p.diastolic_baseline.scale), (90, 3))
+
+    def test_vectors_are_copies(self):
+        p = PulseParameters()
+        saved = p.mean
+        saved[0] = -1
+        p.mean = np.zeros(26)
+        self.assertEqual(saved[1], PulseParameters().mean[1])
+        self.assertEqual(p.beat_length.mean, 0)
+
+    def test_denormalize(self):
+        p = PulseParameters()
+        z = np.random.standard_normal((7, 26))
+        np.testing.assert_allclose(p.denormalize(z), z * p.scale + p.mean)
+        np.testing.assert_allclose(p.denormalize(z, mean=np.ones(26)), z * p.scale + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""Tests for `pypda.api.plot`."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from pypda.api.plot import envelope, plot_dataset, plot_record
+from pypda.dataset import generate_dataset
+
+
+class TestPlot(unittest.TestCase):
+
+    def test_envelope(self):
+        x = np.random.default_rng(0).standard_normal(100_003)
+        t, low, high = envelope((0, 10), x, 1000)
+        starts = np.unique(np.linspace(0, len(x), 1000, endpoint=False).astype(int))
+        np.testing.assert_array_equal(low, np.minimum.reduceat(x, starts))
+        np.testing.assert_array_equal(high, np.maximum.reduceat(x, starts))
+        np.testing.assert_allclose(t, starts * 10 / (len(x) - 1))
+
+        t, low, high = envelope(np.arange(50.), x[:50], 1000)
+        np.testing.assert_array_equal(low, x[:50])
+        self.assertIs(low, high)
+
+    def test_plot_record(self):
+        from matplotlib.image import imread
+        with tempfile.TemporaryDirectory() as plot_dir:
+            path = os.path.join(plot_dir, "record.png")
+            x = np.sin(np.arange(1_000_000) / 100)
+            plot_record(path, (0, 3600), x, x > 0.5, width=8, height=3, dpi=50)
+            self.assertEqual(imread(path).shape[:2], (150, 400))
+
+    def test_plot_dataset(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for format in ("npz", "indexed"):
+                generate_dataset(os.path.join(directory, format), 5, shard_size=3, length=5, format=format)
+                paths = plot_dataset(os.path.join(directory, format), os.path.join(directory, f"plot_{format}"), n=4,
+                                     width=4, height=2, dpi=30, chunk=3)
+                self.assertEqual([os.path.basename(p) for p in paths], [f"record_{i:06d}.png" for i in range(4)])
+                self.assertTrue(all(os.path.exists(p) for p in paths))
+                self.assertEqual(len(os.listdir(os.path.join(directory, f"plot_{format}"))), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Tests for `pypda.producer`."""
+
+import os
+import time
+import unittest
+from itertools import islice
+
+import numpy as np
+
+from pypda.api.sample_test import sample_parameters
+from pypda.producer import ProducerPool
+from pypda.pulse_wave import PulseWave
+
+
+class TestProducerPool(unittest.TestCase):
+
+    def test_batches(self):
+        wave = PulseWave(parameters=sample_parameters(), length=4, sampling_rate=50)
+        with ProducerPool(wave, workers=2, batch_size=3, depth=2, seed=1) as pool:
+            firsts = []
+            for x, y, t in islice(pool, 6):
+                self.assertEqual(x.shape, (3, 200))
+                self.assertEqual(y.dtype, bool)
+                self.assertFalse(x.flags.owndata)
+                np.testing.assert_allclose(t[:, -1], 4)
+                firsts.append(x[:, 0].copy())
+            self.assertEqual(len(np.unique(np.concatenate(firsts))), 18)
+
+            with pool.get() as batch:
+                x, y, t = batch
+                self.assertTrue(np.all(np.isfinite(x)))
+            self.assertIsNone(batch.x)
+
+            time.sleep(0.5)  # producers fill the ring and stall
+            metrics = pool.metrics()
+        self.assertEqual(metrics["batches_consumed"], 7)
+        self.assertLessEqual(metrics["batches_produced"], 7 + 2)
+        self.assertGreater(metrics["producer_stall"], 0)
+
+    def test_spawn(self):
+        wave = PulseWave(parameters=sample_parameters(), length=4, sampling_rate=50)
+        with ProducerPool(wave, workers=1, batch_size=2, depth=2, context="spawn") as pool:
+            for _ in range(3):
+                with pool.get(timeout=60) as batch:
+                    self.assertEqual(batch.x.shape, (2, 200))
+
+    @unittest.skipUnless(os.path.isdir("/dev/shm"), "needs /dev/shm to list shared memory segments")
+    def test_start_failure_unlinks(self):
+        wave = PulseWave(parameters=sample_parameters(), length=4, sampling_rate=50)
+        wave.callback = lambda: None  # cannot be pickled for a spawned process
+        before = set(os.listdir("/dev/shm"))
+        with self.assertRaises(Exception):
+            ProducerPool(wave, workers=1, batch_size=2, context="spawn")
+        self.assertEqual(set(os.listdir("/dev/shm")) - before, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""Tests for `pypda.profiling`."""
+
+import threading
+import unittest
+
+import numpy as np
+
+from pypda import profiling
+from pypda.api.sample_test import sample_parameters
+from pypda.profiling import Profiler, stage
+from pypda.pulse_wave import PulseWave
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_disabled_is_noop(self):
+        self.assertIs(stage("a"), stage("b"))
+
+    def test_stages(self):
+        calls = []
+        wave = PulseWave(parameters=sample_parameters())
+        with Profiler(callback=lambda *args: calls.append(args)) as profiler:
+            wave.sample()
+            wave.sample()
+        self.assertIsNone(profiling._active.get())
+        self.assertEqual(list(profiler.stats), ["hmm", "beats", "assemble", "interpolate", "filter", "labels"])
+        self.assertEqual({calls for calls, _, _ in profiler.stats.values()}, {2})
+        self.assertEqual(len(calls), 12)
+        self.assertGreater(profiler.stats["beats"][2], 0)
+        self.assertIn("interpolate", profiler.table())
+
+    def test_nested(self):
+        with Profiler(trace_memory=False) as outer:
+            with Profiler(trace_memory=False) as inner:
+                with stage("x"):
+                    pass
+            with stage("y"):
+                pass
+        self.assertEqual(list(inner.stats), ["x"])
+        self.assertEqual(list(outer.stats), ["y"])
+
+    def test_thread_local(self):
+        with Profiler(trace_memory=False) as profiler:
+            thread = threading.Thread(target=lambda: stage("other").__enter__())
+            thread.start()
+            thread.join()
+            with stage("mine"):
+                pass
+        self.assertEqual(list(profiler.stats), ["mine"])
+
+    def test_nested_peaks(self):
+        with Profiler() as profiler:
+            with stage("outer"):
+                block = np.ones(1 << 20)  # 8 MB
+                del block
+                with stage("inner"):
+                    small = np.ones(1000)
+                    del small
+        self.assertGreaterEqual(profiler.stats["outer"][2], 8 << 20)
+        self.assertLess(profiler.stats["inner"][2], 1 << 20)
+
+    def test_threaded_batch(self):
+        wave = PulseWave(parameters=sample_parameters(), length=20)
+        with Profiler(trace_memory=False) as profiler:
+            wave.sample_batch(4, threads=2)
+        self.assertIn("render", profiler.stats)
+        self.assertNotIn("beats", profiler.stats)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,6 @@
 import unittest
 from click.testing import CliRunner
 
-from pypda import pypda
 from pypda import cli
 
 
@@ -25,9 +24,11 @@ class TestPypda(unittest.TestCase):
     def test_command_line_interface(self):
         """Test the CLI."""
         runner = CliRunner()
-        result = runner.invoke(cli.main)
-        assert result.exit_code == 0
-        assert 'pypda.cli.main' in result.output
-        help_result = runner.invoke(cli.main, ['--help'])
+        help_result = runner.invoke(cli.cli, ['--help'])
         assert help_result.exit_code == 0
-        assert '--help  Show this message and exit.' in help_result.output
+        assert '--help' in help_result.output
+        for command in ('sample', 'sample-test', 'stream', 'serve', 'dataset', 'record', 'plot'):
+            assert command in help_result.output
+        with runner.isolated_filesystem():
+            result = runner.invoke(cli.cli, ['sample', '--length', '5', '--plot-dir', 'plot'])
+        assert result.exit_code == 0, result.output
@@ -0,0 +1,30 @@
+"""Tests for `pypda.recording`."""
+
+import tempfile
+import unittest
+
+import numpy as np
+
+from pypda.api.sample_test import sample_test_parameters
+from pypda.pulse_wave import PulseWave
+from pypda.recording import generate_recording, load_recording
+
+
+class TestRecording(unittest.TestCase):
+
+    def test_matches_in_memory(self):
+        wave = PulseWave(parameters=sample_test_parameters(), length=60, sampling_rate=100, rng=3)
+        with tempfile.TemporaryDirectory() as directory:
+            settings = generate_recording(wave, directory, chunk_seconds=7, block_beats=16)
+            recording = load_recording(directory)
+            self.assertEqual(recording["x"].shape, (6000,))
+            self.assertEqual(settings["beats"], wave.beats)
+            x, y, t = wave.render(recording["state"][None].astype(int), recording["severity"][None].astype(int),
+                                  recording["beats"], [recording["t_start"]])
+            np.testing.assert_allclose(recording["x"], x[0], atol=1e-8)
+            np.testing.assert_array_equal(recording["y"], y[0])
+            del recording
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+"""Tests for `pypda.resampling`."""
+
+import unittest
+
+import numpy as np
+from scipy import signal
+
+from pypda.resampling import ResampleCache
+
+
+class TestResampleCache(unittest.TestCase):
+
+    def test_matches_fft_resample(self):
+        cache = ResampleCache(maxsize=2, max_dense=100)
+        x = np.random.random((3, 75))
+        for target in (100, 60, 100):
+            np.testing.assert_allclose(cache.resample(x, target), signal.resample(x, target, axis=-1), atol=1e-12)
+        self.assertEqual(cache.info()["hits"], 1)
+        self.assertEqual(cache.keys(), [(75, 60), (75, 100)])
+        np.testing.assert_allclose(cache.resample(x, 120), signal.resample(x, 120, axis=-1))
+        self.assertEqual(len(cache), 2)
+
+    def test_byte_budget(self):
+        cache = ResampleCache(max_dense=100, max_bytes=2 * 8 * 60 * 75)
+        x = np.random.random(75)
+        for target in (60, 50, 40):
+            cache.resample(x, target)
+        self.assertEqual(cache.keys(), [(75, 50), (75, 40)])
+        self.assertEqual(cache.bytes, 8 * 75 * 90)
+        self.assertEqual(cache.evictions, 1)
+        cache.clear()
+        self.assertEqual(cache.bytes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
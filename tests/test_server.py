@@ -0,0 +1,74 @@
+"""Tests for `pypda.server`."""
+
+import asyncio
+import json
+import unittest
+
+import numpy as np
+
+from pypda.api.sample_test import sample_parameters
+from pypda.pulse_wave import PulseWave
+from pypda.server import PulseServer, _Client
+
+
+class TestPulseServer(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.wave = PulseWave(parameters=sample_parameters(), bpm=65, sampling_rate=50)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_subscribe(self):
+        server = PulseServer(self.wave, n_channels=6, chunk_seconds=0.1)
+
+        async def client():
+            await server.start()
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            writer.write(b"1,4\n")
+            header = json.loads(await reader.readline())
+            frames = [await reader.readexactly(header["chunk_samples"] * 5 * 4) for _ in range(4)]
+            writer.close()
+            await server.close()
+            return header, frames
+
+        header, frames = self.loop.run_until_complete(client())
+        self.assertEqual(header["channels"], [1, 4])
+        self.assertEqual(header["chunk_samples"], 5)
+        rows = np.frombuffer(b"".join(frames), dtype="<f4").reshape(-1, 5)
+        np.testing.assert_allclose(np.diff(rows[:, 0]), 1 / 50, atol=1e-5)
+        self.assertTrue(np.all(np.isin(rows[:, 3:], (0, 1))))
+        self.assertTrue(np.all((rows[:, 1:3] > 20) & (rows[:, 1:3] < 300)))
+        metrics = server.metrics()
+        self.assertGreaterEqual(metrics["chunks"], 4)
+        self.assertLess(metrics["max_lag"], 0.1)
+
+    def test_invalid_channels(self):
+        server = PulseServer(self.wave, n_channels=2, chunk_seconds=0.1)
+
+        async def client():
+            await server.start()
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            writer.write(b"5\n")
+            reply = json.loads(await reader.readline())
+            writer.close()
+            await server.close()
+            return reply
+
+        self.assertIn("error", self.loop.run_until_complete(client()))
+
+    def test_slow_client_drops_oldest(self):
+        async def offer():
+            client = _Client(np.arange(1), queue_chunks=2)
+            for frame in (b"a", b"b", b"c"):
+                client.offer(frame)
+            return client, [client.queue.get_nowait() for _ in range(client.queue.qsize())]
+
+        client, frames = self.loop.run_until_complete(offer())
+        self.assertEqual(frames, [b"b", b"c"])
+        self.assertEqual(client.dropped, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+"""Tests for `pypda.stream`."""
+
+import unittest
+from itertools import islice
+
+import numpy as np
+
+from pypda.api.sample_test import sample_parameters
+from pypda.pulse_wave import PulseWave
+from pypda.stream import PulseStream
+
+
+class TestPulseStream(unittest.TestCase):
+
+    def setUp(self):
+        self.wave = PulseWave(parameters=sample_parameters(), bpm=65, sampling_rate=50)
+
+    def chunks(self, chunk_seconds, n):
+        np.random.seed(7)
+        return [np.concatenate(c) for c in zip(*islice(self.wave.stream(chunk_seconds=chunk_seconds), n))]
+
+    def test_chunk_size_invariant(self):
+        x_short, y_short, t_short = self.chunks(0.5, 12)
+        x_long, y_long, t_long = self.chunks(2, 3)
+        np.testing.assert_allclose(t_short, t_long)
+        np.testing.assert_allclose(x_short, x_long, atol=1e-6)
+        np.testing.assert_array_equal(y_short, y_long)
+        np.testing.assert_allclose(np.diff(t_short), 1 / 50)
+
+    def test_bounded_buffers(self):
+        stream = PulseStream(self.wave, chunk_seconds=1, n_channels=3)
+        for _ in range(5):
+            x, y, t = stream.read()
+        sizes = [len(b) for b in stream._buffer]
+        for _ in range(200):
+            x, y, t = stream.read()
+        self.assertEqual(x.shape, (3, 50))
+        self.assertLess(max(len(b) for b in stream._buffer), 2 * max(sizes) + 1000)
+        self.assertTrue(np.all(np.isfinite(x)))
+        self.assertAlmostEqual(t[-1], 205 - 1 / 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""Tests for `pypda.synthesis` and `PulseWave.sample_batch`."""
+
+import unittest
+
+import numpy as np
+from scipy import signal
+
+from pypda.api.sample_test import sample_parameters
+from pypda.pulse_model import PulseModelRaw
+from pypda.pulse_wave import PulseWave
+from pypda.synthesis import triang_windows, gaussian_windows, render_beats, render_direct, render_trains, \
+    resample_beats
+from pypda.wavelets import KernelCache
+
+
+class TestSynthesis(unittest.TestCase):
+
+    def test_windows(self):
+        for m in (1, 2, 15, 20):
+            np.testing.assert_allclose(triang_windows([m], m)[0], signal.windows.triang(m))
+            np.testing.assert_allclose(gaussian_windows([m], [2.3], m)[0], signal.windows.gaussian(m, std=2.3))
+
+    def test_render_beat(self):
+        amplitudes, delta = np.array([8, 3, 4, 2, 1.]), np.array([10, 12, 9, 10])
+        tm, gm, std = np.array([20, 21, 20, 19, 20]), np.full(5, 16), np.array([2, 2.1, 1.9, 2, 2])
+        raw, raw_length = render_beats([80.], amplitudes[None], delta[None], tm[None], gm[None], std[None])
+
+        offsets = np.concatenate(([0], np.cumsum(delta)))
+        expected = np.zeros(raw_length[0])
+        for a, o, t, g, s in zip(amplitudes, offsets, tm, gm, std):
+            kernel = a * signal.convolve(signal.windows.triang(t), signal.windows.gaussian(g, std=s))
+            expected[o:o + len(kernel)] += kernel
+        np.testing.assert_allclose(raw[0], expected + 80)
+
+        flat = resample_beats(raw, raw_length, [100])
+        np.testing.assert_allclose(flat, signal.resample(expected + 80, 100))
+
+    def test_matches_pulse_model(self):
+        wave = PulseWave(parameters=sample_parameters())
+        _, beats = wave.hmm.sample()
+        p = {k: np.array([b[k] for b in beats]) for k in beats[0]}
+        raw, raw_length = render_beats(p["baseline"], p["pulse_amplitudes"], p["delta_time"], p["triangle_m"],
+                                       p["gaussian_m"], p["gaussian_std"])
+        np.testing.assert_allclose(resample_beats(raw, raw_length, p["samples"]),
+                                   np.concatenate([PulseModelRaw(**b).waveform for b in beats]))
+
+    def test_sample_batch(self):
+        wave = PulseWave(parameters=sample_parameters(), bpm=65, length=10, sampling_rate=49.8)
+        x, y, t = wave.sample_batch(3)
+        self.assertEqual(x.shape, (3, 498))
+        self.assertEqual(y.shape, (3, 498))
+        self.assertEqual(y.dtype, bool)
+        np.testing.assert_allclose(t[:, 0], 0)
+        np.testing.assert_allclose(t[:, -1], 10)
+        self.assertTrue(np.all(np.isfinite(x)))
+
+    def test_render_direct(self):
+        beats = 6
+        raw, raw_length = render_beats(np.full(beats, 80.), np.tile([8, 3, 4, 2, 1.], (beats, 1)),
+                                       np.full((beats, 4), 10), np.full((beats, 5), 20), np.full((beats, 5), 16),
+                                       np.full((beats, 5), 2.))
+        samples = np.array([100, 96, 104, 100, 99, 101])
+        flat = resample_beats(raw, raw_length, samples)
+        direct = render_direct(raw, raw_length, samples, np.arange(len(flat), dtype=float), block=64)
+        np.testing.assert_allclose(direct, flat, atol=1e-2)
+
+    def test_direct_engine_agrees(self):
+        waves = [PulseWave(parameters=sample_parameters(), engine=engine) for engine in ("object", "direct")]
+        outputs = []
+        for wave in waves:
+            np.random.seed(5)
+            outputs.append(wave.sample_batch(4))
+        (x_object, y_object, t_object), (x_direct, y_direct, t_direct) = outputs
+        np.testing.assert_allclose(t_direct, t_object)
+        np.testing.assert_array_equal(y_direct, y_object)
+        self.assertLess(np.abs(x_direct - x_object).mean(), 0.05)
+        self.assertEqual(len(waves[1].sample()[0]), 900)
+
+    def test_render_trains(self):
+        wave = PulseWave(parameters=sample_parameters(), rng=0)
+        _, _, p, _ = wave.draw(2)
+        raw, raw_length = p.render()
+        args = p.baseline, p.pulse_amplitudes, p.delta_time, p.triangle_m, p.gaussian_m, p.gaussian_std
+        trains, trains_length = render_trains(*args, KernelCache(), block=100)
+        np.testing.assert_array_equal(trains_length, raw_length)
+        np.testing.assert_allclose(trains, raw, atol=1e-9)
+        rounded, _ = render_trains(*args, KernelCache(std_decimals=2))
+        self.assertLess(np.abs(rounded - raw).max(), 0.5)
+
+    def test_fft_engine_agrees(self):
+        x_object, y_object, _ = PulseWave(parameters=sample_parameters(), rng=5).sample_batch(3)
+        x_fft, y_fft, _ = PulseWave(parameters=sample_parameters(), engine="fft", rng=5).sample_batch(3)
+        np.testing.assert_array_equal(y_fft, y_object)
+        np.testing.assert_allclose(x_fft, x_object, atol=1e-8)
+
+
+class TestGenerators(unittest.TestCase):
+
+    def test_reproducible_in_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+        waves = [PulseWave(parameters=sample_parameters(), rng=seed) for seed in (1, 2, 1, 2)]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            outputs = list(pool.map(lambda w: w.sample_batch(3)[0], waves))
+        np.testing.assert_array_equal(outputs[0], outputs[2])
+        np.testing.assert_array_equal(outputs[1], outputs[3])
+        self.assertFalse(np.allclose(outputs[0], outputs[1]))
+        np.testing.assert_array_equal(PulseWave(parameters=sample_parameters(), rng=1).sample_batch(3)[0], outputs[0])
+
+    def test_threaded_batch(self):
+        x, y, t = PulseWave(parameters=sample_parameters(), rng=5).sample_batch(7)
+        x_threads, y_threads, t_threads = PulseWave(parameters=sample_parameters(), rng=5).sample_batch(7, threads=3)
+        np.testing.assert_allclose(x_threads, x, atol=1e-9)
+        np.testing.assert_array_equal(y_threads, y)
+        np.testing.assert_allclose(t_threads, t)
+        events = PulseWave(parameters=sample_parameters(), rng=5).sample_batch(7, labels="events", threads=3)[1]
+        self.assertEqual(len(events), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
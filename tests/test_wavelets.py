@@ -0,0 +1,64 @@
+"""Tests for `pypda.wavelets`."""
+
+import unittest
+
+import numpy as np
+from scipy import signal
+
+from pypda.wavelets import ArbitraryWaveform, KernelCache, TriangGaussian, overlap_add
+
+
+class TestKernelCache(unittest.TestCase):
+
+    def test_counters_and_eviction(self):
+        cache = KernelCache(maxsize=2)
+        a = cache.kernel(20, 16, 2)
+        self.assertIs(cache.kernel(20, 16, 2.0), a)
+        kept = cache.kernel(21, 16, 2).nbytes + cache.kernel(22, 16, 2).nbytes
+        self.assertEqual(cache.info(), {"hits": 1, "misses": 3, "evictions": 1, "size": 2, "maxsize": 2,
+                                        "bytes": kept, "max_bytes": None})
+        self.assertNotIn(cache.key(20, 16, 2), cache)
+        self.assertFalse(a.flags.writeable)
+
+    def test_std_decimals(self):
+        cache = KernelCache(std_decimals=1)
+        self.assertIs(cache.kernel(20, 16, 2.01), cache.kernel(20, 16, 1.99))
+
+
+class TestTriangGaussian(unittest.TestCase):
+
+    def test_waveform(self):
+        w = TriangGaussian(baseline=1, amplitude=3, triang_m=19, gaussian_m=15, gaussian_std=1.7)
+        expected = 1 + 3 * signal.convolve(signal.windows.triang(19), signal.windows.gaussian(15, std=1.7))
+        np.testing.assert_allclose(w.waveform, expected)
+        w.shift(4)
+        np.testing.assert_allclose(w.waveform, np.concatenate((np.zeros(4), expected)))
+        np.testing.assert_allclose(TriangGaussian(amplitude=2, triang_m=19, gaussian_m=15, gaussian_std=1.7).waveform,
+                                   2 * (expected - 1) / 3)
+
+
+class TestOverlapAdd(unittest.TestCase):
+
+    def test_matches_padded_sum(self):
+        waves = [ArbitraryWaveform(waveform=np.arange(1., 4.) * (i + 1)) for i in range(4)]
+        for w, shift in zip(waves, (0, 2, 7, 3)):
+            w.shift(shift)
+        expected = np.zeros(10)
+        for w in waves:
+            expected[:len(w)] += w.waveform
+        total = overlap_add(waves)
+        self.assertEqual(total.offset, 0)
+        np.testing.assert_allclose(total.waveform, expected)
+        np.testing.assert_allclose(sum(waves).waveform, expected)
+
+    def test_compact_offset(self):
+        a, b = ArbitraryWaveform(waveform=np.ones(3)), ArbitraryWaveform(waveform=np.ones(2))
+        a.shift(100)
+        b.shift(101)
+        total = a + b
+        self.assertEqual((total.offset, len(total)), (100, 103))
+        np.testing.assert_allclose(total.data, [1, 2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()